@@ -4,9 +4,17 @@ import asyncio
 # Install uvloop and ensure an event loop exists before importing pyrogram
 # uvloop.install()
 
+from app.startup import PROFILE_ENABLED, profiler
 
-from app.client import client
-from app.main import main
+if PROFILE_ENABLED:
+    profiler.start()
+
+with profiler.phase("config"):
+    import app.config
+
+with profiler.phase("imports"):
+    from app.client import client
+    from app.main import main
 
 
 if __name__ == "__main__":
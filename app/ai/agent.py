@@ -1,21 +1,34 @@
-import asyncio
 import logging
-from datetime import datetime, timedelta
+import os
+from dataclasses import dataclass, field
 
-from agents import Agent, Runner, SQLiteSession, function_tool, mcp
-from agents.extensions.models.litellm_model import LitellmModel
+from agents import Agent, ModelSettings, Runner, SQLiteSession, mcp
 from pyrogram import Client, types
 
-from app.ai.base import list_models, models, set_model
+from app.ai import spans
+from app.ai.base import models
+from app.ai.router import DEFAULT_TIMEOUT, Route, get_routes, router
+from app.ai.tools import CHAT_TOOLS, ChatContext
+from app.database.cloud import cloud_db
 from app.database.local import local_db
+from app.metrics import LLM_TOKENS
+from app.tracing import tracer
+from app.workers import workers
 
 logger = logging.getLogger(__name__)
 
+spans.install()
+
+# Remote tools for the agent, empty disables them (offline benchmarks)
+MCP_TOOLS_URL = os.environ.get(
+    "MCP_TOOLS_URL", "https://nymbo-tools.hf.space/gradio_api/mcp/sse"
+)
+
 
 async def get_default_provider_and_model():
     """Get default provider and model for chat from local database"""
-    default_model = await local_db.get_default_model("chat")
-    provider = await local_db.get_default_provider()
+    default_model = await local_db.get_default_model_info("chat")
+    provider = await local_db.get_default_provider_info()
     
     model_id = ""
     if default_model and default_model.model:
@@ -23,7 +36,7 @@ async def get_default_provider_and_model():
 
     # Only override provider if default_model has provider_name and provider exists
     if default_model and default_model.provider_name:
-        new_provider = await local_db.get_provider_by_name(default_model.provider_name)
+        new_provider = await local_db.get_provider_info(default_model.provider_name)
         if new_provider:
             provider = new_provider
     
@@ -32,61 +45,66 @@ async def get_default_provider_and_model():
 
 class AIAgent:
     """Simplified AIAgent without complex instance management"""
-    
-    def __init__(self, provider, model_id):
-        """Initialize AIAgent with provider and model"""
-        self.model_id = model_id
-        self.litellm_model = LitellmModel(
-            model="openai/" + model_id,
-            base_url=provider.base_url,
-            api_key=provider.api_key,
-        )
+
+    def __init__(self, routes: list[Route], config: dict | None = None):
+        """Initialize AIAgent with routes (provider + model) in preference order"""
+        config = config or {}
+        self.routes = routes
+        self.timeout = config.get("timeout", DEFAULT_TIMEOUT)
+        self.hedge_after = config.get("hedge_after")
 
     @classmethod
     async def create(cls):
         """Factory method to create AIAgent"""
-        provider, model_id = await get_default_provider_and_model()
-        
+        with tracer.span("ai.routes"):
+            routes, config = await get_routes("chat")
+            if routes:
+                return cls(routes, config)
+
+            provider, model_id = await get_default_provider_and_model()
+
         # If no model is set, get first model from provider
         if not model_id and provider:
             models_list = await models()
             if models_list:
                 model_id = models_list[0]
-        
+
         if provider and model_id:
-            return cls(provider, model_id)
+            return cls([Route(provider, model_id)], config)
         else:
             raise ValueError("No AI provider configured. Use /add_provider to add one.")
 
+    @staticmethod
+    def litellm_model(route: Route):
+        # litellm alone takes seconds to import
+        from agents.extensions.models.litellm_model import LitellmModel
+
+        return LitellmModel(
+            model="openai/" + route.model,
+            base_url=route.provider.base_url,
+            api_key=route.provider.api_key,
+        )
+
+    @staticmethod
     def star_chatter(
-        self,
+        route: Route,
         mcp_server: list,
-        message: types.Message,
+        request: "ChatRequest",
         functions: list | None = None,
     ):
         if functions is None:
             functions = []
-        full_name = (
-            (
-                f"{message.sender_chat.title} (Group/Anonymous Admin)"
-                if message.sender_chat.title == message.chat.title
-                else f"{message.sender_chat.title} (Channel/Anonymous User)"
-            )
-            if message.sender_chat
-            else message.from_user.full_name
-        )
-        user_id = (
-            message.sender_chat.id if message.sender_chat else message.from_user.id
-        )
         return Agent(
             "StarChatter",
-            instructions=f"""You are **StarChatter**. You are powered by model `{self.model_id}`. Change model if you can't help the user. To mention a user, use `[user_fullname](tg://user?id=[user_id]).
-            - user_fullname: {full_name}
-            - user_id: {user_id}
-            - message_id: {message.id}
+            instructions=f"""You are **StarChatter**. You are powered by model `{route.model}`. Change model if you can't help the user. To mention a user, use `[user_fullname](tg://user?id=[user_id]).
+            - user_fullname: {request.full_name}
+            - user_id: {request.user_id}
+            - message_id: {request.message_id}
             - previous_message_id: user_message_id - i (i = user_message_id - len(messages_until_target))""",
             tools=functions,
-            model=self.litellm_model,
+            model=AIAgent.litellm_model(route),
+            # Tool calls of one turn are awaited concurrently by the runner
+            model_settings=ModelSettings(parallel_tool_calls=True),
             mcp_servers=mcp_server,
         )
 
@@ -97,102 +115,132 @@ class AIAgent:
         chat_id = message.chat.id
         session = SQLiteSession(f"chat_{chat_id}", "conversations.sqlite")
 
-        @function_tool
-        def clear_your_memory():
-            loop = asyncio.get_event_loop()
-            asyncio.run_coroutine_threadsafe(session.clear_session(), loop)
-            return "History cleared."
-
-        @function_tool
-        def mute_user(
-            user_id: int,
-            duration_seconds: int = 0,
-        ):
-            """
-            Mute the user for a specified duration (in seconds).
-            If duration less than 30s, mute permanently.
-
-            Args:
-                reason (str): Reason for muting the user.
-                duration_seconds (int): Duration in seconds to mute the user. Default is 0 (permanent mute).
-
-            Returns:
-                str: Success message or error message if muting fails.
-            """
-            loop = asyncio.get_event_loop()
-            asyncio.run_coroutine_threadsafe(
-                message.chat.restrict_member(
-                    user_id,
-                    permissions=types.ChatPermissions(
-                        all_perms=False,
-                    ),
-                    until_date=(datetime.now() + timedelta(seconds=duration_seconds)),
-                ),
-                loop,
-            )
-            return "Action completed."
-
-        @function_tool
-        def unmute_user(
-            group_id: int,
-            user_id: int,
-        ):
-            loop = asyncio.get_event_loop()
-            asyncio.run_coroutine_threadsafe(
-                client.restrict_chat_member(
-                    group_id, user_id, permissions=types.ChatPermissions(all_perms=True)
-                ),
-                loop,
-            )
-
-            return "Action completed."
-
-        @function_tool
-        def delete_message(message_ids: int | list[int] | None = None):
-            """Delete message with id if provided, otherwise delete the message that triggered the command.
+        try:
+            request = ChatRequest.from_message(message, prompt)
+            # History is loaded once and saved only for the winning attempt,
+            # so failed or hedged attempts don't leave partial turns behind
+            with tracer.span("ai.history_load"):
+                history = await session.get_items()
+
+            async def attempt(route: Route) -> ChatResult:
+                if workers.enabled:
+                    return await workers.run(
+                        "app.ai.agent:run_attempt", request, route, history
+                    )
+                return await run_attempt(request, route, history, in_process=True)
+
+            with tracer.span("ai.route"):
+                res = await router.run(
+                    self.routes,
+                    attempt,
+                    timeout=self.timeout,
+                    hedge_after=self.hedge_after,
+                )
+            # Every attempt records its tool actions, only the winner's are applied
+            for method, args, kwargs in res.actions:
+                try:
+                    with tracer.span(f"tool_action.{method}"):
+                        await getattr(client, method)(*args, **kwargs)
+                except Exception as e:
+                    logger.warning(f"Tool action {method} failed in chat {chat_id}: {e}")
+            if res.default_model:
+                # Write via cloud, mirrors to local
+                await cloud_db.set_default_model("chat", *res.default_model)
+            LLM_TOKENS.labels(res.provider, "input").inc(res.input_tokens)
+            LLM_TOKENS.labels(res.provider, "output").inc(res.output_tokens)
+            with tracer.span("ai.history_save"):
+                if res.clear_history:
+                    await session.clear_session()
+                else:
+                    await session.add_items(res.new_items)
+            return res.output
+        except Exception as e:
+            logger.error(f"Error processing chat request for chat {chat_id}: {e}")
+            raise e
 
-            Args:
-                message_ids (int | list[int], optional): Message ID or list of message IDs to delete. Defaults to None and deletes the message that triggered the command.
 
-            Returns:
-                str: Success message
+@dataclass
+class ChatRequest:
+    """What an agent run needs from the message, picklable for worker processes"""
 
-            """
-            loop = asyncio.get_event_loop()
-            if message_ids:
-                asyncio.run_coroutine_threadsafe(
-                    client.delete_messages(message.chat.id, message_ids), loop
-                )
-            else:
-                asyncio.run_coroutine_threadsafe(message.delete(), loop)
-            return "Action completed."
+    chat_id: int
+    message_id: int
+    text: str
+    full_name: str
+    user_id: int
 
-        try:
-            async with mcp.MCPServerSse(
+    @classmethod
+    def from_message(cls, message: types.Message, prompt: str | None = None):
+        full_name = (
+            (
+                f"{message.sender_chat.title} (Group/Anonymous Admin)"
+                if message.sender_chat.title == message.chat.title
+                else f"{message.sender_chat.title} (Channel/Anonymous User)"
+            )
+            if message.sender_chat
+            else message.from_user.full_name
+        )
+        user_id = (
+            message.sender_chat.id if message.sender_chat else message.from_user.id
+        )
+        text = prompt or (message.text or message.caption or "") + f"\n[{message.id}]"
+        return cls(message.chat.id, message.id, text, full_name, user_id)
+
+
+@dataclass
+class ChatResult:
+    output: str
+    new_items: list
+    provider: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    actions: list[tuple[str, tuple, dict]] = field(default_factory=list)
+    clear_history: bool = False
+    default_model: tuple[str, str] | None = None
+
+
+async def run_attempt(
+    request: ChatRequest,
+    route: Route,
+    history: list,
+    in_process: bool = False,
+) -> ChatResult:
+    """One agent run on one route, in the bot process or in a worker"""
+    context = ChatContext(request.chat_id, request.message_id, in_process)
+    with tracer.span("ai.attempt", provider=route.provider.name, model=route.model):
+        mcp_servers = []
+        if MCP_TOOLS_URL:
+            mcp_server = mcp.MCPServerSse(
                 name="Tools",
-                params={"url": "https://nymbo-tools.hf.space/gradio_api/mcp/sse"},
+                params={"url": MCP_TOOLS_URL},
                 cache_tools_list=True,
-            ) as mcp_server:
-                text = (
-                    prompt or (message.text or message.caption or "") + f"\n[{message.id}]"
-                )
+            )
+            with tracer.span("ai.mcp_connect"):
+                await mcp_server.connect()
+            mcp_servers.append(mcp_server)
+        try:
+            # Model turns and tool calls are added by app.ai.spans
+            with tracer.span("ai.runner"):
                 res = await Runner.run(
-                    self.star_chatter(
-                        mcp_server=[mcp_server],
-                        message=message,
-                        functions=[
-                            mute_user,
-                            unmute_user,
-                            delete_message,
-                            clear_your_memory,
-                            list_models,
-                            set_model,
-                        ],
+                    AIAgent.star_chatter(
+                        route,
+                        mcp_server=mcp_servers,
+                        request=request,
+                        functions=CHAT_TOOLS,
                     ),
-                    text,
-                    session=session,
+                    history + [{"role": "user", "content": request.text}],
+                    context=context,
                 )
-                return res.final_output
-        except Exception as e:
-            logger.error(f"Error processing chat request for chat {chat_id}: {e}")
-            raise e
+        finally:
+            for mcp_server in mcp_servers:
+                await mcp_server.cleanup()
+    return ChatResult(
+        output=res.final_output,
+        new_items=res.to_input_list()[len(history) :],
+        provider=route.provider.name,
+        input_tokens=res.context_wrapper.usage.input_tokens,
+        output_tokens=res.context_wrapper.usage.output_tokens,
+        actions=context.actions,
+        clear_history=context.clear_history,
+        default_model=context.default_model,
+    )
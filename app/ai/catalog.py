@@ -0,0 +1,257 @@
+"""Model catalog: provider models with metadata, kept in local.db and searched in memory.
+
+Each provider's /models list is fetched at most once per CATALOG_TTL and
+stored as ProviderModel rows. Searches run against an in-memory index of
+all providers: exact and prefix matches come from a sorted token list
+(bisect), with a subsequence fuzzy match as fallback, so "gpt4o mini"
+finds "openai/gpt-4o-mini" in one step.
+"""
+
+import bisect
+import logging
+import re
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import select
+
+from app.cache import SingleFlight
+from app.database.local import local_db
+from app.database.dto import ProviderInfo
+from app.database.models import AIProvider
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TTL = 60 * 60  # Seconds before a provider's models are fetched again
+SEARCH_LIMIT = 20
+
+_SPLIT = re.compile(r"[/\-_:.\s]+")
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogEntry:
+    provider_id: int
+    provider_name: str
+    model_id: str
+    context_length: int | None = None
+    modality: str | None = None
+
+    @property
+    def details(self) -> str:
+        """Short metadata line, e.g. "128k ctx · text+image->text" """
+        parts = []
+        if self.context_length:
+            if self.context_length >= 1000:
+                parts.append(f"{self.context_length // 1000}k ctx")
+            else:
+                parts.append(f"{self.context_length} ctx")
+        if self.modality:
+            parts.append(self.modality)
+        return " · ".join(parts)
+
+
+def _tokens(text: str) -> list[str]:
+    return [t for t in _SPLIT.split(text.lower()) if t]
+
+
+def _metadata(data: dict) -> dict:
+    """Pull context length and modality out of a /models item.
+
+    Providers disagree on field names: OpenRouter has context_length and
+    architecture.modality, Groq context_window, vLLM max_model_len.
+    """
+    context_length = None
+    for key in ("context_length", "context_window", "max_context_length", "max_model_len"):
+        if isinstance(data.get(key), int):
+            context_length = data[key]
+            break
+    if context_length is None:
+        top_provider = data.get("top_provider") or {}
+        if isinstance(top_provider.get("context_length"), int):
+            context_length = top_provider["context_length"]
+
+    architecture = data.get("architecture") or {}
+    modality = architecture.get("modality")
+    if not modality and architecture.get("input_modalities"):
+        modality = "+".join(architecture["input_modalities"])
+    return {
+        "context_length": context_length,
+        "modality": modality[:50] if isinstance(modality, str) else None,
+    }
+
+
+def _fuzzy_score(query: str, key: str) -> float | None:
+    """Subsequence match of query in key, higher when characters are closer together"""
+    pos, gaps = -1, 0
+    for ch in query:
+        found = key.find(ch, pos + 1)
+        if found < 0:
+            return None
+        if pos >= 0:
+            gaps += found - pos - 1
+        pos = found
+    return 1 / (1 + gaps)
+
+
+class ModelCatalog:
+    def __init__(self):
+        self._entries: dict[int, list[CatalogEntry]] = {}
+        self._refreshed: dict[int, float] = {}
+        self._flight = SingleFlight()
+        self._loaded = False
+        # Search index, rebuilt lazily after any change
+        self._index: list[CatalogEntry] | None = None
+        self._keys: list[str] = []
+        self._token_index: list[tuple[str, int]] = []
+
+    async def load(self):
+        """Fill the index from local.db once, without calling any provider"""
+        if self._loaded:
+            return
+        await self._flight.do("load", self._load)
+
+    async def _load(self):
+        if self._loaded:
+            return
+        result = await local_db.execute(select(AIProvider), op="catalog_load")
+        providers = result.scalars().all()
+        names = {p.id: p.name for p in providers}
+        entries: dict[int, list[CatalogEntry]] = {}
+        for row in await local_db.get_provider_models():
+            if row.provider_id not in names:
+                continue  # Provider was deleted
+            entries.setdefault(row.provider_id, []).append(
+                CatalogEntry(
+                    row.provider_id,
+                    names[row.provider_id],
+                    row.model_id,
+                    row.context_length,
+                    row.modality,
+                )
+            )
+        for provider in providers:
+            if provider.id not in entries and provider.models:
+                entries[provider.id] = [
+                    CatalogEntry(provider.id, provider.name, m) for m in provider.models
+                ]
+        # Stored rows serve searches until the provider is fetched again
+        for provider_id, items in entries.items():
+            self._entries.setdefault(provider_id, items)
+        self._index = None
+        self._loaded = True
+
+    async def refresh(self, provider: AIProvider | ProviderInfo, store: bool = True) -> list[CatalogEntry]:
+        """Fetch provider's models from its API and store them in local.db unless store is False"""
+        return await self._flight.do(
+            ("refresh", provider.id, store), lambda: self._refresh(provider, store)
+        )
+
+    async def _refresh(self, provider: AIProvider | ProviderInfo, store: bool) -> list[CatalogEntry]:
+        from openai import AsyncClient
+
+        # Closed after the call, each client holds its own connection pool
+        async with AsyncClient(base_url=provider.base_url, api_key=provider.api_key) as client:
+            models_list = await client.models.list()
+
+        rows: dict[str, dict] = {}
+        for m in models_list.data:
+            rows.setdefault(m.id[:200], {"model_id": m.id[:200], **_metadata(m.model_dump())})
+        if store:
+            await local_db.replace_provider_models(provider.id, list(rows.values()))
+
+        entries = [CatalogEntry(provider.id, provider.name, **row) for row in rows.values()]
+        self._entries[provider.id] = entries
+        self._refreshed[provider.id] = time.monotonic()
+        self._index = None
+        return entries
+
+    def forget(self, provider_id: int):
+        """Drop a deleted provider from the index"""
+        self._entries.pop(provider_id, None)
+        self._refreshed.pop(provider_id, None)
+        self._index = None
+
+    async def entries(self, provider: AIProvider | ProviderInfo, store: bool = True) -> list[CatalogEntry]:
+        """Provider's models, fetched when stale, stored ones if the API is down.
+        With store=False (worker processes) a fetch is kept in memory only."""
+        await self.load()
+        refreshed = self._refreshed.get(provider.id)
+        if refreshed is None or time.monotonic() - refreshed > CATALOG_TTL:
+            try:
+                return await self.refresh(provider, store)
+            except Exception as e:
+                logger.warning(f"Listing models of {provider.name} failed: {e!r}")
+        entries = self._entries.get(provider.id)
+        if entries:
+            return entries
+        # Never fetched successfully, fall back to models added by hand
+        return [CatalogEntry(provider.id, provider.name, m) for m in provider.models or []]
+
+    def _build_index(self):
+        self._index = [e for items in self._entries.values() for e in items]
+        self._keys = [e.model_id.lower() for e in self._index]
+        token_index = []
+        for i, key in enumerate(self._keys):
+            for token in set(_tokens(key)):
+                token_index.append((token, i))
+        token_index.sort()
+        self._token_index = token_index
+
+    def _prefix(self, term: str) -> set[int]:
+        """Entries having a token that starts with term"""
+        found = set()
+        i = bisect.bisect_left(self._token_index, (term,))
+        while i < len(self._token_index) and self._token_index[i][0].startswith(term):
+            found.add(self._token_index[i][1])
+            i += 1
+        return found
+
+    async def search(
+        self, query: str, provider_id: int | None = None, limit: int = SEARCH_LIMIT
+    ) -> list[CatalogEntry]:
+        """Ranked matches of query over model ids: exact, prefix, all terms, then fuzzy"""
+        await self.load()
+        if self._index is None:
+            self._build_index()
+
+        q = query.strip().lower()
+        terms = _tokens(q)
+        if not terms:
+            return []
+
+        candidates = self._prefix(terms[0])
+        for term in terms[1:]:
+            candidates &= self._prefix(term)
+        if provider_id is not None:
+            candidates = {i for i in candidates if self._index[i].provider_id == provider_id}
+
+        scored: dict[int, float] = {}
+        for i in candidates:
+            key = self._keys[i]
+            name = key.rsplit("/", 1)[-1]
+            if key == q or name == q:
+                score = 4.0
+            elif key.startswith(q) or name.startswith(q):
+                score = 3.0
+            else:
+                score = 2.0
+            scored[i] = score
+
+        if len(scored) < limit:
+            compact = "".join(terms)
+            for i, key in enumerate(self._keys):
+                if i in scored:
+                    continue
+                if provider_id is not None and self._index[i].provider_id != provider_id:
+                    continue
+                if q in key:
+                    scored[i] = 1.5
+                elif (fuzzy := _fuzzy_score(compact, key)) is not None and fuzzy > 0.05:
+                    scored[i] = fuzzy
+
+        ranked = sorted(scored, key=lambda i: (-scored[i], len(self._keys[i]), self._keys[i]))
+        return [self._index[i] for i in ranked[:limit]]
+
+
+# Global instance
+catalog = ModelCatalog()
@@ -1,17 +1,16 @@
-from gradio_client import Client
-from langdetect import detect
-from PIL import Image
+import asyncio
 
 from app.ai.base import get_client
 from app.database.local import local_db
+from app.workers import workers
 
 
 async def translate(text: str):
     client = get_client()
     try:
-        default_model = await local_db.get_default_model("translate")
+        default_model = await local_db.get_default_model_info("translate")
     except Exception as e:
-        default_model = await local_db.get_default_model("chat")
+        default_model = await local_db.get_default_model_info("chat")
     result = await client.chat(
         model=default_model.model,
         messages=[
@@ -35,19 +34,39 @@ async def translate(text: str):
     return result.message.content
 
 
+NEGATIVE_PROMPT = "nsfw, (low quality, worst quality:1.2), very displeasing, 3d, watermark, signature, ugly, poorly drawn"
+
+
+def to_jpeg(path: str) -> str:
+    """Re-encode the generated image as JPEG, CPU-bound"""
+    from PIL import Image
+
+    jpeg_path = path.split(".")[0] + ".jpg"
+    Image.open(path).convert("RGB").save(jpeg_path)
+    return jpeg_path
+
+
 async def gen_img(
     prompt,
-    negative_prompt="nsfw, (low quality, worst quality:1.2), very displeasing, 3d, watermark, signature, ugly, poorly drawn",
+    negative_prompt=NEGATIVE_PROMPT,
+    seed: int | None = None,
 ):
+    """Generate image and return local path. Fixed seed gives deterministic result."""
+    # Heavy, only loaded once an image is requested
+    from gradio_client import Client
+    from langdetect import detect
+
     if detect(prompt) != "en":
         prompt = await translate(prompt)
 
-    client = Client("aiqtech/NSFW-Real")
-    result = client.predict(
+    # Blocking HTTP and polling, kept off the event loop
+    client = await asyncio.to_thread(Client, "aiqtech/NSFW-Real")
+    result = await asyncio.to_thread(
+        client.predict,
         prompt=prompt,
         negative_prompt=negative_prompt,
-        seed=0,
-        randomize_seed=True,
+        seed=seed or 0,
+        randomize_seed=seed is None,
         width=1024,
         height=1024,
         guidance_scale=0,
@@ -56,8 +75,4 @@ async def gen_img(
     )
 
     # result can be a path or list of paths
-
-    img = Image.open(result).convert("RGB")
-    img.save(result.split(".")[0] + ".jpg")  # hoặc .jpg
-
-    return result.split(".")[0] + ".jpg"
+    return await workers.run("app.ai.nsfw:to_jpeg", result)
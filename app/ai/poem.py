@@ -1,31 +1,71 @@
-from aiohttp import ClientSession
-from langdetect import detect
+import asyncio
+import logging
 import re
+from functools import lru_cache
+
+from aiohttp import ClientError, ClientResponseError
+
+from app.cache import SingleFlight, TTLCache
+from app.http import get_session
+
+logger = logging.getLogger(__name__)
+
+POEM_API_URL = "https://typegpt.io/api/openAI"
+POEM_RETRIES = 2  # Extra attempts after the first one
+POEM_RETRY_BACKOFF = 0.5  # Seconds, doubled on each retry
+
+# Popular prompts are answered from cache
+_poem_cache = TTLCache(maxsize=512, ttl=60 * 60)
+_poem_flight = SingleFlight()
+
+
+@lru_cache(maxsize=512)
+def _highlight_pattern(hint: str) -> re.Pattern:
+    return re.compile(re.escape(hint), re.IGNORECASE)
+
+
+def _highlight(poem: str, hint: str) -> str:
+    """Make every occurrence of hint bold"""
+    return _highlight_pattern(hint).sub(lambda m: f"**{m.group(0)}**", poem)
+
+
+async def _fetch_poem(hint: str, locale: str) -> str:
+    session = get_session()
+    for attempt in range(POEM_RETRIES + 1):
+        try:
+            async with session.get(
+                POEM_API_URL, json={"input": hint, "locale": locale}
+            ) as r:
+                r.raise_for_status()
+                resp = await r.json()
+                return resp["result"]
+        except (ClientError, asyncio.TimeoutError) as e:
+            # Client errors (4xx) won't get better by retrying
+            if isinstance(e, ClientResponseError) and e.status < 500:
+                raise
+            if attempt == POEM_RETRIES:
+                raise
+            logger.warning(f"Poem request failed ({e!r}), retrying")
+            await asyncio.sleep(POEM_RETRY_BACKOFF * 2**attempt)
 
 
 async def get_poem(hint: str, locale: str | None = None):
     if not locale:
+        from langdetect import detect
+
         locale = detect(hint)
         if len(locale) > 2:
             locale = "en"
 
-    async with ClientSession() as s:
-        async with s.get(
-            "https://typegpt.io/api/openAI", json={"input": hint, "locale": locale}
-        ) as r:
-            resp = await r.json()
-            poem: str = resp["result"]
-            poem = poem.split("\n", 2)[-1]
-
-            if re.search(re.escape(hint), poem, re.IGNORECASE):
-                poem = re.sub(
-                    re.escape(hint),
-                    lambda m: f"**{m.group(0)}**",
-                    poem,
-                    flags=re.IGNORECASE,
-                )
-
-            return poem
+    key = (hint, locale)
+    poem = _poem_cache.get(key)
+    if poem is None:
+        # Identical concurrent requests share one upstream call
+        poem = await _poem_flight.do(key, lambda: _fetch_poem(hint, locale))
+        _poem_cache.set(key, poem)
+
+    poem = poem.split("\n", 2)[-1]
+    return _highlight(poem, hint)
 
 
 """
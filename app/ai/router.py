@@ -0,0 +1,208 @@
+"""Latency-aware provider routing with failover and optional hedging.
+
+Routes for a feature are read from `DefaultModel.config`, e.g. for "chat":
+
+    {
+        "providers": [
+            {"name": "oai", "model": "gpt-4o-mini", "weight": 2},
+            {"name": "groq", "model": "llama-3.3-70b-versatile"}
+        ],
+        "timeout": 60,
+        "hedge_after": 15
+    }
+
+Without "providers" the feature's provider_name/model (or the default
+provider) is the only route, as before.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+from app.database.local import local_db
+from app.database.dto import ProviderInfo
+from app.metrics import LLM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+WINDOW = 50  # Calls kept per provider for percentiles and error rate
+MAX_ERROR_RATE = 0.5  # Above this a provider is unhealthy
+COOLDOWN = 30.0  # Seconds an unhealthy provider is only tried as a last resort
+DEFAULT_TIMEOUT = 120.0
+
+
+@dataclass
+class Route:
+    provider: ProviderInfo
+    model: str
+    weight: float = 1.0
+
+
+class NoRouteError(ValueError):
+    pass
+
+
+class ProviderStats:
+    """Rolling latency and error rate of one provider"""
+
+    def __init__(self):
+        self.latencies: deque[float] = deque(maxlen=WINDOW)
+        self.outcomes: deque[bool] = deque(maxlen=WINDOW)
+        self.unhealthy_until = 0.0
+
+    def record(self, latency: float | None, ok: bool):
+        self.outcomes.append(ok)
+        if ok and latency is not None:
+            self.latencies.append(latency)
+        if not ok and self.error_rate > MAX_ERROR_RATE:
+            self.unhealthy_until = time.monotonic() + COOLDOWN
+
+    def percentile(self, p: float) -> float | None:
+        if not self.latencies:
+            return None
+        values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(p * len(values)))]
+
+    @property
+    def p50(self) -> float | None:
+        return self.percentile(0.5)
+
+    @property
+    def p95(self) -> float | None:
+        return self.percentile(0.95)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+
+class ProviderRouter:
+    """Send to the fastest healthy provider, fail over on errors or timeouts"""
+
+    def __init__(self):
+        self.stats: dict[str, ProviderStats] = {}
+
+    def _stats(self, route: Route) -> ProviderStats:
+        return self.stats.setdefault(route.provider.name, ProviderStats())
+
+    def order(self, routes: list[Route]) -> list[Route]:
+        """Healthy routes by weighted p50 (untried first), unhealthy ones last"""
+
+        def key(route: Route):
+            stats = self._stats(route)
+            p50 = stats.p50
+            score = 0.0 if p50 is None else p50 / max(route.weight, 0.01)
+            return (not stats.healthy, score)
+
+        return sorted(routes, key=key)
+
+    async def _timed(
+        self,
+        route: Route,
+        attempt: Callable[[Route], Awaitable[T]],
+        timeout: float | None,
+    ) -> T:
+        stats = self._stats(route)
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(attempt(route), timeout)
+        except asyncio.CancelledError:
+            # Lost a hedge race or caller gave up, says nothing about the provider
+            LLM_SECONDS.labels(route.provider.name, "cancelled").observe(time.monotonic() - start)
+            raise
+        except Exception:
+            stats.record(None, ok=False)
+            LLM_SECONDS.labels(route.provider.name, "error").observe(time.monotonic() - start)
+            raise
+        elapsed = time.monotonic() - start
+        stats.record(elapsed, ok=True)
+        LLM_SECONDS.labels(route.provider.name, "ok").observe(elapsed)
+        return result
+
+    async def run(
+        self,
+        routes: list[Route],
+        attempt: Callable[[Route], Awaitable[T]],
+        timeout: float | None = DEFAULT_TIMEOUT,
+        hedge_after: float | None = None,
+    ) -> T:
+        """Run attempt on routes in order until one succeeds.
+
+        Args:
+            attempt: Coroutine function doing the request for a route.
+            timeout: Per-attempt timeout in seconds.
+            hedge_after: If set, start the next route when the current one
+                takes longer than this, and keep whichever finishes first.
+        """
+        if not routes:
+            raise NoRouteError("No AI provider configured. Use /add_provider to add one.")
+
+        remaining = deque(self.order(routes))
+        pending: dict[asyncio.Task, Route] = {}
+        last_error: Exception | None = None
+
+        def launch():
+            route = remaining.popleft()
+            task = asyncio.create_task(self._timed(route, attempt, timeout))
+            pending[task] = route
+
+        try:
+            launch()
+            while pending:
+                can_hedge = hedge_after is not None and remaining
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    logger.info("Provider slow, hedging with next route")
+                    launch()
+                    continue
+                for task in done:
+                    route = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning(
+                        f"Provider {route.provider.name} ({route.model}) failed: {last_error!r}"
+                    )
+                if remaining:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error
+
+
+async def get_routes(feature: str) -> tuple[list[Route], dict]:
+    """Resolve routes and routing config of a feature from DefaultModel"""
+    default_model = await local_db.get_default_model_info(feature)
+    config = (default_model.config if default_model else None) or {}
+
+    routes = []
+    for entry in config.get("providers", []):
+        provider = await local_db.get_provider_info(entry.get("name", ""))
+        if provider and entry.get("model"):
+            routes.append(
+                Route(provider, entry["model"], float(entry.get("weight", 1.0)))
+            )
+        else:
+            logger.warning(f"Skipping invalid route for {feature}: {entry}")
+    return routes, config
+
+
+# Global instance, stats live for the whole process
+router = ProviderRouter()
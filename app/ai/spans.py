@@ -0,0 +1,56 @@
+"""Model turns and tool calls of agent runs as app.tracing spans.
+
+openai-agents reports its own spans to trace processors. This one adds
+each finished span under the current app span (`ai.runner`): the
+runner calls processors from the run's tasks, which carry our context.
+"""
+
+from datetime import datetime
+
+from agents import add_trace_processor
+from agents.tracing import TracingProcessor
+
+from app.tracing import tracer
+
+
+def _name(span_data) -> tuple[str, dict]:
+    kind = span_data.type
+    if kind == "generation":
+        return "agent.generation", {"model": span_data.model, "usage": span_data.usage}
+    if kind == "function":
+        return f"agent.tool.{span_data.name}", {}
+    if kind == "mcp_tools":
+        return "agent.mcp_list_tools", {"server": span_data.server}
+    return f"agent.{kind}", {}
+
+
+class AgentSpans(TracingProcessor):
+    def on_trace_start(self, trace):
+        pass
+
+    def on_trace_end(self, trace):
+        pass
+
+    def on_span_start(self, span):
+        pass
+
+    def on_span_end(self, span):
+        if not span.started_at or not span.ended_at:
+            return
+        seconds = (
+            datetime.fromisoformat(span.ended_at) - datetime.fromisoformat(span.started_at)
+        ).total_seconds()
+        name, attrs = _name(span.span_data)
+        if span.error:
+            attrs["error"] = span.error.get("message")
+        tracer.record(name, seconds, **attrs)
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self):
+        pass
+
+
+def install():
+    add_trace_processor(AgentSpans())
@@ -2,7 +2,6 @@
 
 import logging
 from app.database.local import local_db
-from openai import AsyncOpenAI
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +18,7 @@ async def generate_localized_text(original_text: str, user_language: str = "en")
         AI-generated text in the user's language, or original English text on failure
     """
     # Check if provider is configured (đọc từ local)
-    provider = await local_db.get_default_provider()
+    provider = await local_db.get_default_provider_info()
     if not provider:
         logger.debug(
             f"No AI provider configured, using original text: {original_text[:50]}..."
@@ -27,12 +26,14 @@ async def generate_localized_text(original_text: str, user_language: str = "en")
         return original_text
 
     # Lấy model từ DefaultModel cho translate
-    default_model = await local_db.get_default_model("translate")
+    default_model = await local_db.get_default_model_info("translate")
     model_id = ""  # Default model
     if default_model and default_model.model:
         model_id = default_model.model
 
     try:
+        from openai import AsyncOpenAI
+
         client = AsyncOpenAI(
             base_url=provider.base_url,
             api_key=provider.api_key,
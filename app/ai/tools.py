@@ -0,0 +1,146 @@
+"""Agent tools, built once at import.
+
+Per-run state comes from the run context passed to
+`Runner.run(..., context=ChatContext(...))`. Telegram actions
+(`ChatContext.call`) and database changes (set_model, clear_your_memory)
+are recorded and applied only for the winning run, in the bot process,
+so hedged or failed-over attempts leave no trace, in the bot process or
+in a worker.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from agents import RunContextWrapper, function_tool
+from pyrogram import types
+
+from app.ai.base import models
+from app.database.local import local_db
+
+
+@dataclass
+class ChatContext:
+    """State of one chat run, available to tools"""
+
+    chat_id: int
+    message_id: int
+    in_process: bool = False  # Run by the bot process, not a worker
+    # (Client method name, args, kwargs) applied after the run
+    actions: list[tuple[str, tuple, dict]] = field(default_factory=list)
+    clear_history: bool = False
+    # (provider name, model id) to save as the chat default after the run
+    default_model: tuple[str, str] | None = None
+
+    async def call(self, method: str, *args, **kwargs):
+        self.actions.append((method, args, kwargs))
+
+
+@function_tool
+async def clear_your_memory(ctx: RunContextWrapper[ChatContext]):
+    # Applied with the session save, after the run
+    ctx.context.clear_history = True
+    return "History cleared."
+
+
+@function_tool
+async def mute_user(
+    ctx: RunContextWrapper[ChatContext],
+    user_id: int,
+    duration_seconds: int = 0,
+):
+    """
+    Mute the user for a specified duration (in seconds).
+    If duration less than 30s, mute permanently.
+
+    Args:
+        user_id (int): ID of the user to mute.
+        duration_seconds (int): Duration in seconds to mute the user. Default is 0 (permanent mute).
+
+    Returns:
+        str: Success message or error message if muting fails.
+    """
+    try:
+        await ctx.context.call(
+            "restrict_chat_member",
+            ctx.context.chat_id,
+            user_id,
+            permissions=types.ChatPermissions(
+                all_perms=False,
+            ),
+            until_date=(datetime.now() + timedelta(seconds=duration_seconds)),
+        )
+    except Exception as e:
+        return f"Failed to mute user: {e}"
+    return "Action completed."
+
+
+@function_tool
+async def unmute_user(
+    ctx: RunContextWrapper[ChatContext],
+    group_id: int,
+    user_id: int,
+):
+    try:
+        await ctx.context.call(
+            "restrict_chat_member",
+            group_id,
+            user_id,
+            permissions=types.ChatPermissions(all_perms=True),
+        )
+    except Exception as e:
+        return f"Failed to unmute user: {e}"
+    return "Action completed."
+
+
+@function_tool
+async def delete_message(
+    ctx: RunContextWrapper[ChatContext],
+    message_ids: int | list[int] | None = None,
+):
+    """Delete message with id if provided, otherwise delete the message that triggered the command.
+
+    Args:
+        message_ids (int | list[int], optional): Message ID or list of message IDs to delete. Defaults to None and deletes the message that triggered the command.
+
+    Returns:
+        str: Success message
+
+    """
+    context = ctx.context
+    try:
+        # A list is deleted in one batched request
+        await context.call(
+            "delete_messages", context.chat_id, message_ids or context.message_id
+        )
+    except Exception as e:
+        return f"Failed to delete message: {e}"
+    return "Action completed."
+
+
+@function_tool
+async def list_models(ctx: RunContextWrapper[ChatContext]):
+    """List models available from the default provider"""
+    # A worker lists models without storing the fetched catalog
+    return await models(store=ctx.context.in_process)
+
+
+@function_tool
+async def set_model(ctx: RunContextWrapper[ChatContext], model_id: str):
+    """Set default model for chat"""
+    # Get current provider
+    provider = await local_db.get_default_provider_info()
+    if provider:
+        # Saved by the bot process after the run, see run_chat()
+        ctx.context.default_model = (provider.name, model_id)
+        return f"Model `{model_id}` has been set as default for chat!"
+    return "No provider is configured. Use /add_provider to add provider."
+
+
+CHAT_TOOLS = [
+    mute_user,
+    unmute_user,
+    delete_message,
+    clear_your_memory,
+    list_models,
+    set_model,
+]
@@ -0,0 +1,358 @@
+"""In-process anti-spam for group messages.
+
+Every check is O(1) per message and memory is bounded:
+
+- Message rate per user: sliding window approximated by two fixed
+  windows (previous and current count), a few counters per user.
+- Duplicates: 64-bit SimHash of each text, compared by Hamming distance
+  against a ring buffer of the group's recent messages.
+- Link and mention floods: entity counts per message and per window.
+
+Users idle for USER_TTL are dropped, at most MAX_USERS are tracked.
+Groups without a message in DUPLICATE_WINDOW are dropped (their ring
+has nothing left to compare), at most MAX_GROUPS are tracked.
+Deletes and restrictions are collected by ActionBatcher and sent in
+batches (delete_messages takes up to 100 ids per call). They call the
+client directly rather than through send_queue: the per-chat posting
+bucket would hold cleanup back for minutes during a raid, and chatbot
+replies in the group would wait behind it.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from pyrogram import Client, enums, errors, types
+
+from app.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 10.0  # Seconds of the rate window
+MAX_MESSAGES = 8  # Messages per user per window
+MAX_LINKS = 3  # Links in one message
+MAX_MENTIONS = 5  # Mentions in one message
+MAX_WINDOW_LINKS = 6  # Links per user per window
+RING_SIZE = 64  # Recent messages kept per group for duplicate checks
+DUPLICATE_DISTANCE = 8  # Max differing SimHash bits of a near-duplicate (unrelated texts differ in ~32)
+DUPLICATE_WINDOW = 60.0  # Seconds a message counts as recent
+MAX_REPEATS = 2  # Same user posting the same text this many times before
+MAX_RAID_REPEATS = 4  # Different users posting the same text this many times before
+MIN_WORDS = 5  # Shorter texts ("ok", "hi all") skip duplicate checks
+MAX_WORDS = 200  # SimHash lane counters are 8 bits wide
+STRIKES_TO_RESTRICT = 3  # Flagged messages within STRIKE_TTL before muting
+STRIKE_TTL = 10 * 60.0
+RESTRICT_DURATION = timedelta(minutes=10)
+USER_TTL = 10 * 60.0  # Idle seconds before a user's counters are dropped
+MAX_USERS = 100_000
+MAX_GROUPS = 10_000  # Groups with a ring buffer of recent messages
+FLUSH_INTERVAL = 0.5  # Seconds between batched actions
+FLOOD_RETRIES = 3  # FloodWaits one action sleeps through before it is dropped
+
+_WORD = re.compile(r"\w+")
+_LINK_ENTITIES = {enums.MessageEntityType.URL, enums.MessageEntityType.TEXT_LINK}
+_MENTION_ENTITIES = {enums.MessageEntityType.MENTION, enums.MessageEntityType.TEXT_MENTION}
+
+
+# SimHash with 64 counters packed as 8-bit lanes in one Python int, so
+# summing token hashes is a handful of big-int additions instead of a
+# 64-step loop per token.
+
+_SPREAD = [
+    sum(1 << (8 * bit) for bit in range(8) if byte >> bit & 1) for byte in range(256)
+]
+_LANE_ONES = sum(1 << (8 * lane) for lane in range(64))
+_TOP_BIT = bytes.maketrans(bytes(range(256)), b"0" * 128 + b"1" * 128)
+
+
+@lru_cache(maxsize=65536)
+def _spread(token: str) -> int:
+    """64-bit hash of token with bit i moved to bit 8*i"""
+    h = hash(token) & 0xFFFFFFFFFFFFFFFF
+    return sum(_SPREAD[h >> (8 * k) & 0xFF] << (64 * k) for k in range(8))
+
+
+def simhash(text: str) -> int | None:
+    """SimHash of the words of text, None for texts too short to compare"""
+    words = _WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    words = words[:MAX_WORDS]
+    lanes = sum(map(_spread, words))
+    # Set bit i when lane i counts at least half the words: adding
+    # (128 - threshold) to every lane moves exactly those lanes to >= 128
+    threshold = (len(words) + 1) // 2
+    lanes += (128 - threshold) * _LANE_ONES
+    return int(lanes.to_bytes(64, "big").translate(_TOP_BIT), 2)
+
+
+class _UserState:
+    __slots__ = (
+        "window_start",
+        "previous",
+        "current",
+        "links_previous",
+        "links_current",
+        "strikes",
+        "strike_time",
+        "seen",
+    )
+
+    def __init__(self, now: float):
+        self.window_start = now
+        self.previous = 0
+        self.current = 0
+        self.links_previous = 0
+        self.links_current = 0
+        self.strikes = 0
+        self.strike_time = 0.0
+        self.seen = now
+
+    def hit(self, now: float, links: int) -> tuple[float, float]:
+        """Count a message, return estimated messages and links in the last WINDOW"""
+        elapsed = now - self.window_start
+        if elapsed >= WINDOW:
+            shifted = elapsed < 2 * WINDOW
+            self.previous = self.current if shifted else 0
+            self.links_previous = self.links_current if shifted else 0
+            self.current = 0
+            self.links_current = 0
+            self.window_start += WINDOW * int(elapsed // WINDOW)
+            elapsed = now - self.window_start
+        self.current += 1
+        self.links_current += links
+        self.seen = now
+        weight = 1 - elapsed / WINDOW
+        return (
+            self.current + self.previous * weight,
+            self.links_current + self.links_previous * weight,
+        )
+
+    def strike(self, now: float) -> int:
+        if now - self.strike_time > STRIKE_TTL:
+            self.strikes = 0
+        self.strikes += 1
+        self.strike_time = now
+        return self.strikes
+
+
+@dataclass(frozen=True, slots=True)
+class Verdict:
+    reason: str
+    restrict: bool = False
+
+
+class AntiSpam:
+    """Spam checks for one process, fed one message at a time"""
+
+    def __init__(self):
+        self._users: OrderedDict[tuple[int, int], _UserState] = OrderedDict()
+        self._recent: OrderedDict[int, deque[tuple[int, int, float]]] = OrderedDict()
+        self.checked = 0
+        self.flagged = 0
+
+    def _user(self, chat_id: int, user_id: int, now: float) -> _UserState:
+        key = (chat_id, user_id)
+        state = self._users.get(key)
+        if state is None:
+            state = self._users[key] = _UserState(now)
+        else:
+            self._users.move_to_end(key)
+        # Drop users idle too long, or the oldest ones over the limit
+        while self._users:
+            oldest_key, oldest = next(iter(self._users.items()))
+            if len(self._users) <= MAX_USERS and now - oldest.seen < USER_TTL:
+                break
+            del self._users[oldest_key]
+        return state
+
+    def _duplicate(self, chat_id: int, user_id: int, fingerprint: int, now: float) -> str | None:
+        recent = self._recent.get(chat_id)
+        if recent is None:
+            recent = self._recent[chat_id] = deque(maxlen=RING_SIZE)
+        else:
+            self._recent.move_to_end(chat_id)
+        same_user = others = 0
+        for other_hash, other_user, seen in recent:
+            if now - seen > DUPLICATE_WINDOW:
+                continue
+            if (fingerprint ^ other_hash).bit_count() <= DUPLICATE_DISTANCE:
+                if other_user == user_id:
+                    same_user += 1
+                else:
+                    others += 1
+        recent.append((fingerprint, user_id, now))
+        # Drop groups whose newest message is out of the window, or the oldest ones over the limit
+        while self._recent:
+            oldest_id, oldest = next(iter(self._recent.items()))
+            if len(self._recent) <= MAX_GROUPS and now - oldest[-1][2] <= DUPLICATE_WINDOW:
+                break
+            del self._recent[oldest_id]
+        if same_user >= MAX_REPEATS:
+            return "repeated message"
+        if same_user + others >= MAX_RAID_REPEATS:
+            return "same message from many users"
+        return None
+
+    def check(
+        self,
+        chat_id: int,
+        user_id: int,
+        text: str,
+        links: int = 0,
+        mentions: int = 0,
+        now: float | None = None,
+    ) -> Verdict | None:
+        """Return a verdict if the message looks like spam"""
+        now = time.monotonic() if now is None else now
+        self.checked += 1
+        state = self._user(chat_id, user_id, now)
+        messages, window_links = state.hit(now, links)
+
+        reason = None
+        if messages > MAX_MESSAGES:
+            reason = "message flood"
+        elif links > MAX_LINKS or window_links > MAX_WINDOW_LINKS:
+            reason = "link flood"
+        elif mentions > MAX_MENTIONS:
+            reason = "mention flood"
+        elif text and (fingerprint := simhash(text)) is not None:
+            reason = self._duplicate(chat_id, user_id, fingerprint, now)
+
+        if reason is None:
+            return None
+        self.flagged += 1
+        return Verdict(reason, restrict=state.strike(now) >= STRIKES_TO_RESTRICT)
+
+    def check_message(self, message: types.Message) -> Verdict | None:
+        return self.check(*message_features(message))
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "flagged": self.flagged,
+            "users": len(self._users),
+            "groups": len(self._recent),
+        }
+
+
+def message_features(message: types.Message) -> tuple[int, int, str, int, int]:
+    """Arguments of AntiSpam.check for a message, picklable for workers"""
+    entities = (message.entities or []) + (message.caption_entities or [])
+    links = sum(1 for e in entities if e.type in _LINK_ENTITIES)
+    mentions = sum(1 for e in entities if e.type in _MENTION_ENTITIES)
+    user_id = message.from_user.id if message.from_user else message.sender_chat.id
+    return (
+        message.chat.id,
+        user_id,
+        message.text or message.caption or "",
+        links,
+        mentions,
+    )
+
+
+def check_in_worker(
+    chat_id: int, user_id: int, text: str, links: int, mentions: int
+) -> Verdict | None:
+    """Run by a worker process, jobs are sharded by chat so its counters stay consistent"""
+    return antispam.check(chat_id, user_id, text, links, mentions)
+
+
+class ActionBatcher:
+    """Collect deletes and restrictions, apply them every FLUSH_INTERVAL"""
+
+    def __init__(self):
+        self._deletes: dict[int, list[tuple[int, int | None]]] = {}
+        self._restricts: set[tuple[int, int]] = set()
+        self._flusher: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+        # Admins are looked up only when they get flagged
+        self._admins = TTLCache(maxsize=10_000, ttl=10 * 60)
+
+    def add(self, client: Client, message: types.Message, verdict: Verdict):
+        chat_id = message.chat.id
+        user_id = message.from_user.id if message.from_user else None
+        self._deletes.setdefault(chat_id, []).append((message.id, user_id))
+        if verdict.restrict and user_id:
+            self._restricts.add((chat_id, user_id))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_later(client))
+
+    async def _is_admin(self, client: Client, chat_id: int, user_id: int) -> bool:
+        key = (chat_id, user_id)
+        cached = self._admins.get(key)
+        if cached is None:
+            try:
+                member = await client.get_chat_member(chat_id, user_id)
+                cached = member.status in (
+                    enums.ChatMemberStatus.ADMINISTRATOR,
+                    enums.ChatMemberStatus.OWNER,
+                )
+            except Exception:
+                cached = False
+            self._admins.set(key, cached)
+        return cached
+
+    def _apply(self, func, *args, **kwargs):
+        """Run one action in the background, see _moderate()"""
+        task = asyncio.create_task(_moderate(func, *args, **kwargs))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+        task.add_done_callback(_log_failure)
+
+    async def _flush_later(self, client: Client):
+        # Actions added while a flush is running go out with the next one
+        while self._deletes or self._restricts:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self._flush(client)
+
+    async def _flush(self, client: Client):
+        deletes, self._deletes = self._deletes, {}
+        restricts, self._restricts = self._restricts, set()
+
+        for chat_id, user_id in restricts:
+            if await self._is_admin(client, chat_id, user_id):
+                continue
+            self._apply(
+                client.restrict_chat_member,
+                chat_id,
+                user_id,
+                types.ChatPermissions(),
+                until_date=datetime.now() + RESTRICT_DURATION,
+            )
+
+        for chat_id, pending in deletes.items():
+            message_ids = [
+                message_id
+                for message_id, user_id in pending
+                if user_id is None or not await self._is_admin(client, chat_id, user_id)
+            ]
+            for i in range(0, len(message_ids), 100):
+                self._apply(client.delete_messages, chat_id, message_ids[i : i + 100])
+
+
+async def _moderate(func, *args, **kwargs):
+    """Call the client outside send_queue, sleeping through FloodWait"""
+    for attempt in range(FLOOD_RETRIES + 1):
+        try:
+            return await func(*args, **kwargs)
+        except errors.FloodWait as e:
+            if attempt == FLOOD_RETRIES:
+                raise
+            logger.warning(f"FloodWait {e.value}s on anti-spam {getattr(func, '__name__', func)}")
+            await asyncio.sleep(e.value)
+
+
+def _log_failure(future: asyncio.Future):
+    if not future.cancelled() and future.exception():
+        logger.warning(f"Anti-spam action failed: {future.exception()!r}")
+
+
+# Global instances
+antispam = AntiSpam()
+action_batcher = ActionBatcher()
@@ -0,0 +1,175 @@
+"""Callback query router.
+
+callback_data is split on "/" once and walked through a prefix tree of
+registered patterns, instead of testing every handler's regex in turn.
+
+Pattern segments:
+    literal        matches itself
+    <name>         any single segment, passed as str
+    <int:name>     a numeric segment, passed as int
+    <path:name>    the rest of the data (may contain "/"), must be last
+
+Literal segments win over parameters, so "provider/back" and
+"provider/<int:num>" can live side by side.
+
+Lists shown with numbered buttons are kept as snapshots in
+`callback_state`; buttons carry a short token instead of ids or names,
+so a click maps back to the exact list the user saw in O(1).
+"""
+
+import logging
+import secrets
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from pyrogram import Client, types
+
+from app.cache import TTLCache
+from app.utils import is_owner
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+@dataclass
+class Route:
+    pattern: str
+    handler: Handler
+    owner_only: bool = False
+
+
+@dataclass
+class _Node:
+    literals: dict[str, "_Node"] = field(default_factory=dict)
+    param: tuple[str, "_Node"] | None = None
+    int_param: tuple[str, "_Node"] | None = None
+    path_param: tuple[str, Route] | None = None
+    route: Route | None = None
+
+
+class CallbackRouter:
+    def __init__(self):
+        self._root = _Node()
+        self.routes: list[Route] = []
+
+    def route(self, pattern: str, owner_only: bool = False):
+        """Register handler(client, callback_query, **params) for pattern"""
+
+        def decorator(handler: Handler) -> Handler:
+            self.add(pattern, handler, owner_only)
+            return handler
+
+        return decorator
+
+    def add(self, pattern: str, handler: Handler, owner_only: bool = False):
+        route = Route(pattern, handler, owner_only)
+        node = self._root
+        segments = pattern.split("/")
+        for i, segment in enumerate(segments):
+            if segment.startswith("<path:"):
+                if i != len(segments) - 1:
+                    raise ValueError(f"<path:...> must be last in {pattern!r}")
+                node.path_param = (segment[6:-1], route)
+                break
+            if segment.startswith("<int:"):
+                name = segment[5:-1]
+                if node.int_param is None:
+                    node.int_param = (name, _Node())
+                node = node.int_param[1]
+            elif segment.startswith("<"):
+                name = segment[1:-1]
+                if node.param is None:
+                    node.param = (name, _Node())
+                node = node.param[1]
+            else:
+                node = node.literals.setdefault(segment, _Node())
+        else:
+            if node.route is not None:
+                raise ValueError(f"Duplicate callback route {pattern!r}")
+            node.route = route
+        self.routes.append(route)
+
+    def match(self, data: str) -> tuple[Route, dict] | None:
+        """Find route and params for callback data"""
+        params: list[tuple[str, Any]] = []
+        route = self._match(self._root, data.split("/"), 0, params)
+        return (route, dict(params)) if route else None
+
+    def _match(self, node: _Node, segments: list[str], i: int, params: list):
+        if i == len(segments):
+            return node.route
+
+        segment = segments[i]
+        child = node.literals.get(segment)
+        if child is not None:
+            route = self._match(child, segments, i + 1, params)
+            if route:
+                return route
+        if node.int_param is not None and segment.isdigit():
+            name, child = node.int_param
+            params.append((name, int(segment)))
+            route = self._match(child, segments, i + 1, params)
+            if route:
+                return route
+            params.pop()
+        if node.param is not None:
+            name, child = node.param
+            params.append((name, segment))
+            route = self._match(child, segments, i + 1, params)
+            if route:
+                return route
+            params.pop()
+        if node.path_param is not None:
+            name, route = node.path_param
+            params.append((name, "/".join(segments[i:])))
+            return route
+        return None
+
+    async def dispatch(self, client: Client, callback_query: types.CallbackQuery) -> bool:
+        """Run the handler for callback_query, return False if nothing matched"""
+        found = self.match(str(callback_query.data))
+        if found is None:
+            return False
+        route, params = found
+        # Owner check runs at most once per callback, and only for owner routes
+        if route.owner_only and not await is_owner(callback_query.from_user):
+            await callback_query.answer("You are not allowed to do this.", show_alert=True)
+            return True
+        await route.handler(client, callback_query, **params)
+        return True
+
+
+@dataclass
+class Snapshot:
+    """List shown to the user, plus whatever the handlers need to act on it"""
+
+    items: list
+    meta: dict = field(default_factory=dict)
+
+
+class CallbackState:
+    """Short-lived snapshots addressed by compact tokens in callback_data"""
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 30 * 60):
+        self._snapshots = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def put(self, items: list, **meta) -> str:
+        # "~" keeps tokens apart from numbers and literal route segments
+        token = "~" + secrets.token_urlsafe(6)
+        self._snapshots.set(token, Snapshot(list(items), meta))
+        return token
+
+    def get(self, token: str) -> Snapshot | None:
+        return self._snapshots.get(token)
+
+
+async def expired(callback_query: types.CallbackQuery):
+    await callback_query.answer(
+        "This list has expired, please run the command again.", show_alert=True
+    )
+
+
+# Global instances, handler modules register their routes on import
+router = CallbackRouter()
+callback_state = CallbackState()
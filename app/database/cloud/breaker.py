@@ -0,0 +1,91 @@
+"""Circuit breaker for the cloud database.
+
+Closed, calls go through. FAILURE_THRESHOLD transient failures in a row
+(timeouts, lost connections, OperationalError) open it: for OPEN_SECONDS
+calls fail fast with CloudUnavailable instead of each waiting out its
+own timeout. Then it is half open and lets one call through as a probe,
+success closes it again, failure opens it for another OPEN_SECONDS.
+
+Only used from the event loop, so there is no locking.
+"""
+
+import asyncio
+import time
+
+from sqlalchemy import exc
+
+FAILURE_THRESHOLD = 3  # Transient failures in a row that open the breaker
+OPEN_SECONDS = 15.0  # Fail fast this long before probing again
+
+
+class CloudUnavailable(ConnectionError):
+    """The breaker is open, the call was not attempted"""
+
+
+class CloudTimeout(TimeoutError):
+    """A call passed its deadline. Its thread keeps running and may still
+    commit, attempt resolves with the real outcome."""
+
+    def __init__(self, message: str, attempt: asyncio.Future):
+        super().__init__(message)
+        self.attempt = attempt
+
+
+def is_transient(error: BaseException) -> bool:
+    """Errors that may go away by retrying: network, timeouts, a busy or lost database"""
+    if isinstance(error, (CloudUnavailable, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, exc.DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(
+        error,
+        (exc.OperationalError, exc.InterfaceError, exc.DisconnectionError, exc.TimeoutError),
+    )
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = FAILURE_THRESHOLD, open_seconds: float = OPEN_SECONDS):
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self.failures = 0  # In a row
+        self.opened = 0  # Times the breaker opened
+        self._open_until = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.threshold:
+            return "closed"
+        if time.monotonic() < self._open_until:
+            return "open"
+        return "half_open"
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until the next probe is let through"""
+        return max(0.0, self._open_until - time.monotonic())
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self):
+        """The allowed call was cancelled before it could tell"""
+        self._probing = False
+
+    def success(self):
+        self.failures = 0
+        self._probing = False
+
+    def failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.threshold:
+            if self.failures == self.threshold:
+                self.opened += 1
+            self._open_until = time.monotonic() + self.open_seconds
@@ -1,17 +1,57 @@
 import asyncio
-from datetime import datetime, timedelta
+import logging
+import random
+import time
 from app.config import TURSO_AUTH_TOKEN, TURSO_DB_URL
+from app.database.cloud.breaker import CircuitBreaker, CloudTimeout, CloudUnavailable, is_transient
+from app.database.faults import cloud_faults
 from app.database.local import local_db
-from app.database.models import AIProvider, DefaultModel, TelegramUser, Base
-from sqlalchemy import create_engine, select
+from app.database.local.client import IS_OWNER
+from app.database.models import AIProvider, DefaultModel, TelegramGroup, TelegramUser, Base
+from app.database.profiling import queries
+from app.database.sessions import execute
+from app.database import upserts
+from app.metrics import CLOUD_DB_FALLBACKS, CLOUD_DB_RETRIES
+from app.tracing import tracer
+from sqlalchemy import create_engine, select, text
 from sqlalchemy.orm import Session, sessionmaker
 
+logger = logging.getLogger(__name__)
+
+OPERATION_TIMEOUT = 5.0  # Seconds one attempt of a cloud call may take
+RETRIES = 2  # Extra attempts of reads and keyed writes after the first one
+RETRY_BACKOFF = 0.2  # Seconds, doubled on each retry, plus up to as much jitter
+PING_INTERVAL = 30.0  # Seconds without cloud traffic before a keep-warm ping
+
+
+def _copy(obj):
+    """Detached copy of a mapped object's column values"""
+    return type(obj)(
+        **{
+            col.name: getattr(obj, col.name)
+            for col in obj.__table__.columns
+            if hasattr(obj, col.name)
+        }
+    )
+
+
+def _primary_key(obj) -> dict:
+    return {col.name: getattr(obj, col.name) for col in obj.__table__.primary_key.columns}
+
+
+def _where(table, key: dict) -> list:
+    return [table.c[name] == value for name, value in key.items()]
+
 
 class CloudDatabase:
-    """LibSQL Cloud database"""
+    """LibSQL Cloud database
+
+    Calls have a deadline, reads and keyed writes are retried with backoff.
+    While the circuit breaker is open, reads are answered from local.db and
+    writes go to local.db and the outbox, copied up once the cloud answers.
+    """
 
     _instance = None
-    _timeout = timedelta(minutes=5)
     _initialized_db = False
 
     def __new__(cls):
@@ -24,24 +64,35 @@ class CloudDatabase:
             return
         self._engine = None
         self._sessionmaker = None
-        self._session = None
         self._disposed = True
-        self._last_used = datetime.now()
-        self._closing_task = None
+        self._last_ok = 0.0  # time.monotonic() of the last successful call
+        self._keep_warm_task = None
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+        self._settling: set[asyncio.Task] = set()  # Timed-out writes waiting for their outcome
+        self.breaker = CircuitBreaker()
+        self.outbox_pending = 0  # Rows in the outbox, counted by flush_outbox()
+        self._outbox_counted = False
         self._initialized = True
 
     def _create_engine(self):
         url = TURSO_DB_URL
-        if "secure=true" not in url:
+        # Only libsql takes secure=, plain sqlite (tests, benchmarks) rejects it
+        if url.startswith("sqlite+libsql") and "secure=true" not in url:
             if "?" in url:
                 url += "&secure=true"
             else:
                 url += "?secure=true"
 
-        self._engine = create_engine(
-            url,
-            connect_args={"auth_token": TURSO_AUTH_TOKEN} if TURSO_AUTH_TOKEN else {},
-        )
+        if cloud_faults.enabled:
+            # SQLite stand-in with injected latency and errors (CLOUD_FAULTS)
+            self._engine = cloud_faults.create_engine(url)
+        else:
+            self._engine = create_engine(
+                url,
+                connect_args={"auth_token": TURSO_AUTH_TOKEN} if TURSO_AUTH_TOKEN else {},
+            )
+        queries.instrument(self._engine, "cloud")
         self._sessionmaker = sessionmaker(self._engine, expire_on_commit=False)
         self._disposed = False
 
@@ -51,33 +102,39 @@ class CloudDatabase:
             if self._disposed or self._engine is None:
                 self._create_engine()
             if self._engine:
-                Base.metadata.create_all(self._engine)
+                # Local-only tables (caches) never live in the cloud
+                tables = [
+                    t
+                    for t in Base.metadata.sorted_tables
+                    if not t.info.get("local_only")
+                ]
+                Base.metadata.create_all(self._engine, tables=tables)
                 self._initialized_db = True
 
-    def _get_session(self) -> Session | None:
+    def _get_session(self) -> Session:
+        """New session for one call, see app.database.sessions"""
         if self._disposed or self._engine is None:
             self._create_engine()
-        self._last_used = datetime.now()
-        if self._session is None or not self._session.is_active:
-            if self._sessionmaker:
-                self._session = self._sessionmaker()
-        if self._session:
-            return self._session
-
-    async def _auto_close(self):
+        return self._sessionmaker()
+
+    async def _keep_warm(self):
+        """Ping when idle instead of disposing the engine, so traffic never waits
+        for a cold reconnect. While the breaker is open the ping is the probe,
+        and once the cloud answers again the outbox is copied up."""
         while True:
-            await asyncio.sleep(60)
-            now = datetime.now()
-            if self._session and (now - self._last_used > self._timeout):
-                await asyncio.to_thread(self._session.close)
-                self._session = None
-            if (
-                not self._disposed
-                and self._engine
-                and (now - self._last_used > self._timeout)
-            ):
-                self._engine.dispose()
-                self._disposed = True
+            if self.breaker.state == "open":
+                await asyncio.sleep(self.breaker.retry_in + 0.1)
+            else:
+                await asyncio.sleep(PING_INTERVAL)
+            if time.monotonic() - self._last_ok >= PING_INTERVAL or self.breaker.state != "closed":
+                if not await self.ping():
+                    continue
+            if not self._initialized_db:
+                # The cloud was down at startup
+                await asyncio.to_thread(self.init_db)
+            # Rows may be left from before a restart
+            if self.outbox_pending or not self._outbox_counted:
+                await self.flush_outbox()
 
     @property
     def engine(self):
@@ -85,117 +142,270 @@ class CloudDatabase:
             self._create_engine()
         return self._engine
 
-    def _ensure_closing_task(self):
-        if self._closing_task is None or self._closing_task.done():
-            self._closing_task = asyncio.create_task(self._auto_close())
+    def _ensure_keep_warm_task(self):
+        if self._keep_warm_task is None or self._keep_warm_task.done():
+            self._keep_warm_task = asyncio.create_task(self._keep_warm())
+
+    async def _attempt(self, func, *args, **kwargs):
+        def call():
+            # Closing rolls back whatever a failed call left half done
+            with self._get_session() as s:
+                return func(s, *args, **kwargs)
 
-    async def _run_in_session(self, func, *args, **kwargs):
-        self._ensure_closing_task()
-        s = self._get_session()
-        self._last_used = datetime.now()
+        attempt = asyncio.ensure_future(queries.run("cloud", call))
+        # Nobody may await an abandoned attempt, avoid "exception was never retrieved"
+        attempt.add_done_callback(lambda f: f.cancelled() or f.exception())
         try:
-            return await asyncio.to_thread(func, s, *args, **kwargs)
-        finally:
-            pass
+            return await asyncio.wait_for(asyncio.shield(attempt), OPERATION_TIMEOUT)
+        except TimeoutError:
+            # The thread finishes on its own, with its own session, and may still commit
+            raise CloudTimeout(f"Cloud call took over {OPERATION_TIMEOUT:.0f}s", attempt) from None
+
+    async def _run_in_session(self, op: str, func, *args, idempotent: bool = False, **kwargs):
+        """Run func(session, ...) in a thread, traced as op (the public method),
+        with a deadline per attempt. Transient errors are retried only if
+        idempotent, and trip the breaker."""
+        self._ensure_keep_warm_task()
+        attempts = RETRIES + 1 if idempotent else 1
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise CloudUnavailable(
+                    f"Cloud database unavailable, next try in {self.breaker.retry_in:.0f}s"
+                )
+            try:
+                with tracer.span("db.cloud", op=op, attempt=attempt):
+                    result = await self._attempt(func, *args, **kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    # The database answered, the statement failed (constraint, bad SQL)
+                    self.breaker.success()
+                    raise
+                self.breaker.failure()
+                if attempt == attempts - 1 or self.breaker.state == "open":
+                    raise
+                CLOUD_DB_RETRIES.inc()
+                delay = RETRY_BACKOFF * 2**attempt
+                logger.warning(f"Cloud {op} failed ({e!r}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay + random.uniform(0, delay))
+            except BaseException:
+                self.breaker.release()
+                raise
+            else:
+                self.breaker.success()
+                self._last_ok = time.monotonic()
+                return result
 
-    async def get(self, model, *args, **kwargs):
-        result = await self.execute(select(model).filter_by(*args, **kwargs))
+    async def ping(self) -> bool:
+        """Whether the cloud answers a trivial query, keeps the connection warm"""
+        try:
+            await self._run_in_session("ping", lambda s: s.execute(text("SELECT 1")))
+        except Exception as e:
+            logger.warning(f"Cloud database ping failed: {e!r}")
+            return False
+        return True
+
+    async def _queue(self, model, key: dict, error: Exception):
+        await local_db.queue_cloud_write(model.__tablename__, key)
+        self.outbox_pending += 1
+        CLOUD_DB_FALLBACKS.labels("write").inc()
+        logger.warning(
+            f"Cloud write of {model.__tablename__} {key} failed ({error!r}), queued in the outbox"
+        )
+
+    async def _write(self, op: str, model, cloud_write, local_write, key: dict = None, idempotent: bool = True):
+        """Write to the cloud, then mirror to local.db with local_write(what
+        cloud_write returned). If the cloud is unreachable, write local.db anyway
+        with local_write(None) and queue the row (key, or the primary key of what
+        local_write returns) for flush_outbox(). Only idempotent writes are
+        retried or fall back after a timeout, see _settle() for the others."""
+        try:
+            result = await self._run_in_session(op, cloud_write, idempotent=idempotent)
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            if isinstance(e, CloudTimeout) and not idempotent:
+                self._settle(op, model, e.attempt, local_write, key)
+                return
+            await self._fall_back(model, local_write, key, e)
+            return
+        await local_write(result)
+        if self.outbox_pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush_outbox())
+
+    async def _fall_back(self, model, local_write, key: dict | None, error: Exception):
+        obj = await local_write(None)
+        await self._queue(model, key or _primary_key(obj), error)
+
+    def _settle(self, op: str, model, attempt: asyncio.Future, local_write, key: dict = None):
+        """A plain insert that timed out may still commit in its thread. Writing
+        it locally now and queueing it would insert it twice, under different
+        ids. Mirror it once the attempt ends instead: as committed, or through
+        the outbox if it failed."""
+        logger.warning(f"Cloud {op} timed out, mirroring it once its outcome is known")
+
+        async def settle():
+            try:
+                result = await attempt
+            except Exception as e:
+                if is_transient(e):
+                    await self._fall_back(model, local_write, key, e)
+                else:
+                    logger.error(f"Cloud {op} failed after its deadline: {e!r}")
+                return
+            await local_write(result)
+
+        task = asyncio.create_task(settle())
+        self._settling.add(task)
+        task.add_done_callback(self._settling.discard)
+
+    async def _write_statement(self, op: str, model, key: dict, statement):
+        """Run one update or delete of the row identified by key on both databases"""
+        await self._write(
+            op,
+            model,
+            lambda s: (s.execute(statement), s.commit()),
+            lambda _: local_db.execute(statement, op=op),
+            key=key,
+        )
+
+    async def _upsert(self, op: str, model, key: dict, statement):
+        """Run one INSERT ... ON CONFLICT on the cloud and copy the row it left,
+        cloud-assigned ids included, to local.db with another. Upserts end in
+        the same state however often they run, so they are retried."""
+
+        def cloud_write(s: Session) -> list:
+            # Returned, not stored: a timed-out attempt may still finish later
+            rows = s.execute(statement.returning(*model.__table__.columns)).mappings().all()
+            s.commit()
+            return rows
+
+        async def local_write(rows: list | None):
+            # Without a row (cloud down, or nothing to update) the same upsert
+            mirror = upserts.upsert(model, dict(rows[0]), tuple(key)) if rows else statement
+            await local_db.execute(mirror, op=op)
+
+        await self._write(op, model, cloud_write, local_write, key=key)
+
+    @staticmethod
+    def _replay(s: Session, table, key: dict, row: dict | None):
+        """Make the cloud row identified by key equal to row, or delete it"""
+        if row is None:
+            s.execute(table.delete().where(*_where(table, key)))
+        elif s.execute(table.update().where(*_where(table, key)).values(**row)).rowcount == 0:
+            s.execute(table.insert().values(**row))
+        s.commit()
+
+    async def flush_outbox(self) -> int:
+        """Copy the current local.db state of queued rows to the cloud, oldest first.
+        Returns how many rows are still queued."""
+        async with self._flush_lock:
+            entries = await local_db.get_cloud_outbox()
+            rows: dict[tuple, list[int]] = {}
+            for entry in entries:
+                rows.setdefault((entry.table_name, tuple(sorted(entry.key.items()))), []).append(entry.id)
+            done = []
+            for (table_name, items), ids in rows.items():
+                table = Base.metadata.tables[table_name]
+                key = dict(items)
+                result = await local_db.execute(select(table).where(*_where(table, key)), op="flush_outbox")
+                row = result.mappings().first()
+                try:
+                    await self._run_in_session(
+                        "flush_outbox", self._replay, table, key, dict(row) if row else None, idempotent=True
+                    )
+                except Exception as e:
+                    if is_transient(e):
+                        break
+                    logger.error(f"Dropping queued cloud write of {table_name} {key}: {e!r}")
+                done.extend(ids)
+            if done:
+                await local_db.remove_cloud_outbox(done)
+                logger.info(f"Copied {len(done)} queued writes to the cloud")
+            self.outbox_pending = len(entries) - len(done)
+            self._outbox_counted = True
+            return self.outbox_pending
+
+    async def get(self, model, *args, op: str = "get", **kwargs):
+        result = await self.execute(select(model).filter_by(*args, **kwargs), op=op)
         return result.scalars().first()
 
-    async def add(self, obj):
+    async def add(self, obj, op: str = "add"):
         # Create a copy of the object for cloud database
-        cloud_obj = type(obj)(
-            **{
-                col.name: getattr(obj, col.name)
-                for col in obj.__table__.columns
-                if hasattr(obj, col.name)
-            }
-        )
-        await self._run_in_session(lambda s, o: s.add(o), cloud_obj)
-        await self.commit()  # Commit to cloud database
-
-        # Mirror to local database with a separate object instance
-        local_obj = type(obj)(
-            **{
-                col.name: getattr(obj, col.name)
-                for col in obj.__table__.columns
-                if hasattr(obj, col.name)
-            }
+        cloud_obj = _copy(obj)
+
+        async def mirror(_):
+            # Separate instance for local, with the primary key the cloud assigned
+            local_obj = _copy(cloud_obj)
+            await local_db.add(local_obj, op=op)
+            return local_obj
+
+        # A retried insert could run twice, a timed-out one is settled instead
+        await self._write(
+            op, type(obj), lambda s: (s.add(cloud_obj), s.commit()), mirror, idempotent=False
         )
-        await local_db.add(local_obj)
 
     async def add_all(self, objs):
         """Add multiple objects"""
         for obj in objs:
-            await self.add(obj)
-
-    async def delete(self, obj):
-        # Get the primary key attribute name
-        pk_column = obj.__table__.primary_key.columns.values()[0]
-        pk_name = pk_column.name
-        pk_value = getattr(obj, pk_name)
-
-        # Delete from cloud database
-        await self._run_in_session(
-            lambda s, pk, model: s.execute(
-                model.__table__.delete().where(getattr(model, pk) == pk_value)
-            ),
-            pk_name,
-            type(obj),
-        )
-        await self.commit()  # Commit to cloud database
-
-        # Delete from local database
-        await local_db._run_in_session(
-            lambda s, pk, model: s.execute(
-                model.__table__.delete().where(getattr(model, pk) == pk_value)
-            ),
-            pk_name,
-            type(obj),
-        )
-        # Commit to local database
-        await local_db.commit()
+            await self.add(obj, op="add_all")
+
+    async def delete(self, obj, op: str = "delete"):
+        key = _primary_key(obj)
+        table = obj.__table__
+        await self._write_statement(op, type(obj), key, table.delete().where(*_where(table, key)))
 
-    async def merge(self, obj):
+    async def merge(self, obj, op: str = "merge"):
         # Create a completely new object instance FIRST to avoid session conflicts
-        obj_copy = type(obj)(
-            **{
-                col.name: getattr(obj, col.name)
-                for col in obj.__table__.columns
-                if hasattr(obj, col.name)
-            }
-        )
-        # Now merge the copy to cloud database (copy is not attached to any session)
-        await self._run_in_session(lambda s, o: s.merge(o), obj_copy)
-        await self.commit()  # Commit to cloud database
-
-        # Create another copy for local database
-        local_obj = type(obj)(
-            **{
-                col.name: getattr(obj, col.name)
-                for col in obj.__table__.columns
-                if hasattr(obj, col.name)
-            }
-        )
-        await local_db.merge(local_obj)
+        obj_copy = _copy(obj)
 
-    async def commit(self):
-        await self._run_in_session(lambda s: s.commit())
-        # Mirror commit to local database
-        await local_db.commit()
+        async def mirror(_):
+            local_obj = _copy(obj_copy)
+            await local_db.merge(local_obj, op=op)
+            return local_obj
 
-    async def execute(self, *args, **kwargs):
-        return await self._run_in_session(lambda s: s.execute(*args, **kwargs))
+        # Without a primary key merge inserts, which must not be retried
+        await self._write(
+            op,
+            type(obj),
+            lambda s: (s.merge(obj_copy), s.commit()),
+            mirror,
+            idempotent=None not in _primary_key(obj).values(),
+        )
+
+    async def execute(self, *args, op: str = "execute", **kwargs):
+        statement = args[0] if args else kwargs.get("statement")
+        is_select = getattr(statement, "is_select", False)
+        try:
+            return await self._run_in_session(
+                op, lambda s: execute(s, *args, **kwargs), idempotent=is_select
+            )
+        except Exception as e:
+            if not (is_select and is_transient(e)):
+                raise
+            # local.db mirrors the cloud, and has the writes still in the outbox
+            CLOUD_DB_FALLBACKS.labels("read").inc()
+            if not isinstance(e, CloudUnavailable):
+                logger.warning(f"Cloud read failed ({e!r}), answered from local.db")
+            return await local_db.execute(*args, op=op, **kwargs)
 
     # AIProvider methods
     async def get_provider_by_name(self, name: str):
         """Get provider by name"""
-        return await self.get(AIProvider, name=name)
+        return await self.get(AIProvider, name=name, op="get_provider_by_name")
+
+    async def update_provider(self, provider_id: int, **values):
+        """Update provider columns - mirrors to local"""
+        await self._write_statement(
+            "update_provider",
+            AIProvider,
+            {"id": provider_id},
+            AIProvider.__table__.update().where(AIProvider.id == provider_id).values(**values),
+        )
 
     async def get_default_provider(self):
         """Get default provider from DefaultModel"""
         result = await self.execute(
-            select(DefaultModel).filter_by(feature="default_provider")
+            select(DefaultModel).filter_by(feature="default_provider"), op="get_default_provider"
         )
         default_model = result.scalars().first()
         if default_model and default_model.provider_name:
@@ -204,50 +414,17 @@ class CloudDatabase:
 
     async def set_default_provider(self, provider: AIProvider):
         """Set default provider in DefaultModel - mirrors to local"""
-        result = await self.execute(
-            select(DefaultModel).filter_by(feature="default_provider")
+        await self._upsert(
+            "set_default_provider",
+            DefaultModel,
+            {"feature": "default_provider"},
+            upserts.default_model("default_provider", provider.name),
         )
-        default_model = result.scalars().first()
-
-        if not default_model:
-            default_model = DefaultModel(
-                feature="default_provider", provider_name=provider.name
-            )
-            # Mirror to local database
-            await self.add(default_model)
-            local_default_model = DefaultModel(
-                feature="default_provider", provider_name=provider.name
-            )
-            await local_db.add(local_default_model)
-        else:
-            # Update cloud database
-            await self._run_in_session(
-                lambda s: (
-                    s.execute(
-                        DefaultModel.__table__.update()
-                        .where(DefaultModel.feature == "default_provider")
-                        .values(provider_name=provider.name)
-                    )
-                )
-            )
-            await self.commit()
-
-            # Mirror update to local database
-            await local_db._run_in_session(
-                lambda s: (
-                    s.execute(
-                        DefaultModel.__table__.update()
-                        .where(DefaultModel.feature == "default_provider")
-                        .values(provider_name=provider.name)
-                    )
-                )
-            )
-            await local_db.commit()
 
     # DefaultModel methods
     async def get_default_model(self, feature: str):
         """Get default model for a feature"""
-        result = await self.execute(select(DefaultModel).filter_by(feature=feature))
+        result = await self.execute(select(DefaultModel).filter_by(feature=feature), op="get_default_model")
         return result.scalars().first()
 
     async def set_default_model(
@@ -258,62 +435,23 @@ class CloudDatabase:
         config: dict = None,
     ):
         """Set default model for a feature - mirrors to local"""
-        result = await self.execute(select(DefaultModel).filter_by(feature=feature))
-        default_model = result.scalars().first()
-
-        # Build update data
-        update_data = {}
-        if provider_name is not None:
-            update_data["provider_name"] = provider_name
-        if model is not None:
-            update_data["model"] = model
-        if config is not None:
-            update_data["config"] = config
-
-        if not default_model:
-            # Create new - will be mirrored by add method
-            default_model = DefaultModel(
-                feature=feature,
-                provider_name=provider_name or "",
-                model=model or "",
-                config=config or {},
-            )
-            await self.add(default_model)
-        else:
-            if update_data:
-                # Update cloud database
-                await self._run_in_session(
-                    lambda s: (
-                        s.execute(
-                            DefaultModel.__table__.update()
-                            .where(DefaultModel.feature == feature)
-                            .values(**update_data)
-                        )
-                    )
-                )
-                await self.commit()
-
-                # Mirror update to local database
-                await local_db._run_in_session(
-                    lambda s: (
-                        s.execute(
-                            DefaultModel.__table__.update()
-                            .where(DefaultModel.feature == feature)
-                            .values(**update_data)
-                        )
-                    )
-                )
-                await local_db.commit()
+        await self._upsert(
+            "set_default_model",
+            DefaultModel,
+            {"feature": feature},
+            upserts.default_model(feature, provider_name, model, config),
+        )
 
     # TelegramUser (Owner) methods
     async def get_user(self, user_id: int):
         """Get user by user_id"""
-        return await self.get(TelegramUser, id=user_id)
+        return await self.get(TelegramUser, id=user_id, op="get_user")
 
     async def is_owner(self, user_id: int) -> bool:
         """Check if user is owner"""
-        user = await self.get_user(user_id)
-        return user is not None and user.is_owner if user else False
+        # Same statement as local, so a fallback answers it unchanged
+        result = await self.execute(IS_OWNER, {"id": user_id}, op="is_owner")
+        return bool(result.scalar())
 
     async def set_owner(
         self,
@@ -323,47 +461,12 @@ class CloudDatabase:
         full_name: str = None,
     ):
         """Set owner privilege for user - mirrors to local"""
-        user = await self.get_user(user_id)
-        if user:
-            # Update cloud user
-            update_data = {"is_owner": is_owner}
-            if username:
-                update_data["username"] = username
-            if full_name:
-                update_data["first_name"] = full_name
-
-            await self._run_in_session(
-                lambda s: (
-                    s.execute(
-                        TelegramUser.__table__.update()
-                        .where(TelegramUser.id == user_id)
-                        .values(**update_data)
-                    )
-                )
-            )
-            await self.commit()
-
-            # Mirror update to local user
-            await local_db._run_in_session(
-                lambda s: (
-                    s.execute(
-                        TelegramUser.__table__.update()
-                        .where(TelegramUser.id == user_id)
-                        .values(**update_data)
-                    )
-                )
-            )
-            await local_db.commit()
-        else:
-            # Tạo user mới - will be mirrored by add method
-            first_name = full_name or ""
-            user = TelegramUser(
-                id=user_id,
-                username=username,
-                first_name=first_name,
-                is_owner=is_owner,
-            )
-            await self.add(user)
+        await self._upsert(
+            "set_owner",
+            TelegramUser,
+            {"id": user_id},
+            upserts.owner(user_id, is_owner, username, full_name),
+        )
 
     async def add_owner(
         self, user_id: int, username: str = None, full_name: str = None
@@ -377,9 +480,24 @@ class CloudDatabase:
 
     async def get_all_owners(self):
         """Get all owners"""
-        result = await self.execute(select(TelegramUser).filter_by(is_owner=True))
+        result = await self.execute(select(TelegramUser).filter_by(is_owner=True), op="get_all_owners")
         return result.scalars().all()
 
+    # TelegramGroup methods
+    async def get_group(self, group_id: int):
+        """Get group by group_id"""
+        return await self.get(TelegramGroup, id=group_id, op="get_group")
+
+    async def set_group_flags(self, group_id: int, title: str = None, **flags: bool):
+        """Set group feature flags (disable_chatbot, disable_anti_spam) - mirrors to local"""
+        # One upsert, concurrent toggles for a new group can't both insert it
+        await self._upsert(
+            "set_group_flags",
+            TelegramGroup,
+            {"id": group_id},
+            upserts.upsert(TelegramGroup, {"id": group_id, "title": title or "", **flags}, ("id",), flags),
+        )
+
 
 # Global instance
 cloud_db = CloudDatabase()
@@ -0,0 +1,64 @@
+"""Read models for hot paths.
+
+Frozen, slotted copies of the columns handlers read on every update,
+loaded with Core selects: no identity map, no attribute instrumentation
+and nothing that could lazy-load from another thread. Field names match
+the model columns, so they stand in for ORM instances wherever only
+attributes are read. Writes still go through the client methods.
+
+`python -m bench.reads` compares them with ORM loads.
+"""
+
+from dataclasses import dataclass, fields
+from functools import lru_cache
+
+from sqlalchemy import bindparam, select
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderInfo:
+    id: int
+    name: str
+    base_url: str
+    api_key: str
+    models: list[str]
+
+
+@dataclass(frozen=True, slots=True)
+class DefaultModelInfo:
+    feature: str
+    provider_name: str | None
+    model: str | None
+    config: dict
+
+
+@dataclass(frozen=True, slots=True)
+class UserInfo:
+    id: int
+    username: str | None
+    first_name: str
+    last_name: str | None
+    is_owner: bool
+
+
+@dataclass(frozen=True, slots=True)
+class GroupInfo:
+    id: int
+    title: str
+    username: str | None
+    disable_chatbot: bool
+    disable_anti_spam: bool
+
+
+def columns(info: type, model) -> list:
+    """Columns of model's table for the fields of info, in field order"""
+    return [model.__table__.c[field.name] for field in fields(info)]
+
+
+@lru_cache(maxsize=None)
+def lookup(info: type, model, *keys: str):
+    """Select of info's columns from model where each key column equals the
+    parameter of the same name. Built once, building it per call costs more
+    than running it."""
+    table = model.__table__
+    return select(*columns(info, model)).where(*(table.c[key] == bindparam(key) for key in keys)).limit(1)
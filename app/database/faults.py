@@ -0,0 +1,177 @@
+"""Latency and fault injection for the cloud database, for tests and benchmarks.
+
+With CLOUD_FAULTS set (a profile name or "key=value,..." spec) and
+TURSO_DB_URL pointing at a SQLite file, the cloud engine connects
+through a DB-API proxy that behaves like a remote database:
+
+    latency, jitter   seconds added to every statement (blocking, like
+                      the sync libsql driver blocks its executor thread)
+    connect_latency   seconds added to every new connection
+    error_rate        share of statements failing with OperationalError
+    drop_rate         share of statements losing the connection, which
+                      SQLAlchemy sees as a disconnect and invalidates
+    down              every connect and statement fails
+
+    CLOUD_FAULTS=wan TURSO_DB_URL=sqlite:///cloud.db python -m app
+    CLOUD_FAULTS="latency=0.3,error_rate=0.05" ...
+
+The profile is read on every statement, so benchmarks can switch it
+while the bot runs (`cloud_faults.profile = PROFILES["flaky"]`).
+"""
+
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, fields
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class FaultProfile:
+    name: str = "custom"
+    latency: float = 0.0
+    jitter: float = 0.0
+    connect_latency: float = 0.0
+    error_rate: float = 0.0
+    drop_rate: float = 0.0
+    down: bool = False
+
+
+PROFILES = {
+    "none": FaultProfile("none"),
+    "lan": FaultProfile("lan", latency=0.002, jitter=0.001, connect_latency=0.01),
+    "wan": FaultProfile("wan", latency=0.04, jitter=0.02, connect_latency=0.3),
+    "slow": FaultProfile("slow", latency=0.3, jitter=0.2, connect_latency=1.0),
+    "flaky": FaultProfile(
+        "flaky", latency=0.08, jitter=0.05, connect_latency=0.5, error_rate=0.05, drop_rate=0.02
+    ),
+    "down": FaultProfile("down", down=True),
+}
+
+
+def parse_profile(spec: str) -> FaultProfile:
+    """Profile name, or comma separated key=value overrides of the "none" profile"""
+    if spec in PROFILES:
+        return PROFILES[spec]
+    names = {f.name for f in fields(FaultProfile)} - {"name"}
+    values = {}
+    for item in spec.split(","):
+        key, _, value = item.partition("=")
+        key = key.strip()
+        if key not in names:
+            raise ValueError(f"Unknown fault setting {key!r} in CLOUD_FAULTS={spec!r}")
+        values[key] = value.strip().lower() in ("1", "true", "yes") if key == "down" else float(value)
+    return FaultProfile(spec, **values)
+
+
+class _Cursor:
+    def __init__(self, cursor, connection: "_Connection"):
+        self._cursor = cursor
+        self._connection = connection
+
+    def execute(self, *args):
+        self._connection.before_statement()
+        return self._cursor.execute(*args)
+
+    def executemany(self, *args):
+        self._connection.before_statement()
+        return self._cursor.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class _Connection:
+    """sqlite3 connection that fails and lags like a remote one"""
+
+    def __init__(self, connection: sqlite3.Connection, injector: "FaultInjector"):
+        self._connection = connection
+        self._injector = injector
+        self._dropped = False
+
+    def before_statement(self):
+        if self._dropped:
+            # pysqlite's is_disconnect() matches this message
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        if self._injector.statement():
+            self._dropped = True
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+
+    def cursor(self, *args, **kwargs):
+        return _Cursor(self._connection.cursor(*args, **kwargs), self)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._connection, name, value)
+
+
+class FaultInjector:
+    def __init__(self, spec: str | None = os.environ.get("CLOUD_FAULTS")):
+        self.profile: FaultProfile | None = parse_profile(spec) if spec else None
+        self.stats: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.profile is not None
+
+    def _count(self, key: str, value: float = 1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _sleep(self, seconds: float):
+        if seconds > 0:
+            self._count("delay_seconds", seconds)
+            time.sleep(seconds)
+
+    def connect(self, path: str) -> _Connection:
+        profile = self.profile
+        self._count("connects")
+        self._sleep(profile.connect_latency)
+        if profile.down:
+            self._count("errors")
+            raise sqlite3.OperationalError("unable to open database file (injected outage)")
+        # Like a network driver, connections may move between executor threads
+        return _Connection(sqlite3.connect(path, check_same_thread=False), self)
+
+    def statement(self) -> bool:
+        """Delay the statement, raise an injected error or return True to drop the connection"""
+        profile = self.profile
+        self._count("statements")
+        self._sleep(profile.latency + random.uniform(0, profile.jitter))
+        if profile.down or random.random() < profile.error_rate:
+            self._count("errors")
+            raise sqlite3.OperationalError("injected cloud error")
+        if random.random() < profile.drop_rate:
+            self._count("drops")
+            return True
+        return False
+
+    def create_engine(self, url: str, **kwargs):
+        """SQLAlchemy engine on the SQLite file of url, connecting through the injector"""
+        parsed = make_url(url)
+        if parsed.get_backend_name() != "sqlite" or parsed.get_driver_name() not in ("", "pysqlite"):
+            raise ValueError(f"Cloud fault injection needs a sqlite:/// TURSO_DB_URL, got {parsed.drivername}")
+        path = parsed.database or ":memory:"
+        logger.warning(f"Cloud database fault injection on ({self.profile.name}), using {path}")
+        return create_engine(url, creator=lambda: self.connect(path), **kwargs)
+
+
+# Global instance
+cloud_faults = FaultInjector()
@@ -2,16 +2,31 @@ import asyncio
 from datetime import datetime, timedelta
 
 
-from app.database.models import AIProvider, DefaultModel, TelegramUser, TelegramGroup, TelegramChannel, GroupMember, ChannelMember, Base
-from sqlalchemy import create_engine, select
+from app.database.models import AIProvider, DefaultModel, TelegramUser, TelegramGroup, TelegramChannel, GroupMember, ChannelMember, MediaCache, ProviderModel, CloudOutbox, Base
+from app.database.dto import DefaultModelInfo, GroupInfo, ProviderInfo, UserInfo, columns, lookup
+from app.database.profiling import queries
+from app.database.sessions import execute
+from app.database import upserts
+from app.tracing import tracer
+from sqlalchemy import bindparam, create_engine, delete, select
 from sqlalchemy.orm import Session, sessionmaker
 
 LIBSQL_DB_URL = "sqlite:///local.db"
+MEDIA_CACHE_LIMIT = 5000  # Max cached file_ids kept in local.db
+
+IS_OWNER = select(TelegramUser.is_owner).where(TelegramUser.id == bindparam("id"))
+# Default provider in one query
+DEFAULT_PROVIDER_INFO = select(*columns(ProviderInfo, AIProvider)).where(
+    AIProvider.name
+    == select(DefaultModel.provider_name)
+    .where(DefaultModel.feature == "default_provider")
+    .scalar_subquery()
+)
 
 
 class LocalDatabase:
     """
-    Local database - always open, no auto-close
+    Local database - always open, no auto-close, a short-lived session per call
     """
 
     _instance = None
@@ -27,13 +42,13 @@ class LocalDatabase:
             return
         self._engine = None
         self._sessionmaker = None
-        self._session = None
         self._initialized = True
 
     def _create_engine(self):
         self._engine = create_engine(
             LIBSQL_DB_URL,
         )
+        queries.instrument(self._engine, "local")
         self._sessionmaker = sessionmaker(self._engine, expire_on_commit=False)
 
     def init_db(self):
@@ -45,14 +60,11 @@ class LocalDatabase:
                 Base.metadata.create_all(self._engine)
                 self._initialized_db = True
 
-    def _get_session(self) -> Session | None:
+    def _get_session(self) -> Session:
+        """New session for one call, see app.database.sessions"""
         if self._engine is None:
             self._create_engine()
-        if self._session is None or not self._session.is_active:
-            if self._sessionmaker:
-                self._session = self._sessionmaker()
-        if self._session:
-            return self._session
+        return self._sessionmaker()
 
     @property
     def engine(self):
@@ -60,40 +72,59 @@ class LocalDatabase:
             self._create_engine()
         return self._engine
 
-    async def _run_in_session(self, func, *args, **kwargs):
-        s = self._get_session()
-        try:
-            return await asyncio.to_thread(func, s, *args, **kwargs)
-        finally:
-            pass
+    async def _run_in_session(self, op: str, func, *args, **kwargs):
+        """Run func(session, ...) in a thread, traced as op (the public method)"""
+
+        def call():
+            with self._get_session() as s:
+                return func(s, *args, **kwargs)
+
+        with tracer.span("db.local", op=op):
+            return await queries.run("local", call)
 
-    async def get(self, model, *args, **kwargs):
-        result = await self.execute(select(model).filter_by(*args, **kwargs))
+    async def get(self, model, *args, op: str = "get", **kwargs):
+        result = await self.execute(select(model).filter_by(*args, **kwargs), op=op)
         return result.scalars().first()
 
-    async def add(self, obj):
-        await self._run_in_session(lambda s, o: (s.add(o), s.commit()), obj)
+    async def add(self, obj, op: str = "add"):
+        await self._run_in_session(op, lambda s, o: (s.add(o), s.commit()), obj)
 
-    async def delete(self, obj):
-        await self._run_in_session(lambda s, o: (s.delete(o), s.commit()), obj)
+    async def delete(self, obj, op: str = "delete"):
+        await self._run_in_session(op, lambda s, o: (s.delete(o), s.commit()), obj)
 
-    async def merge(self, obj):
-        await self._run_in_session(lambda s, o: (s.merge(o), s.commit()), obj)
+    async def merge(self, obj, op: str = "merge"):
+        await self._run_in_session(op, lambda s, o: (s.merge(o), s.commit()), obj)
 
-    async def commit(self):
-        await self._run_in_session(lambda s: s.commit())
+    async def execute(self, *args, op: str = "execute", **kwargs):
+        return await self._run_in_session(op, lambda s: execute(s, *args, **kwargs))
 
-    async def execute(self, *args, **kwargs):
-        return await self._run_in_session(lambda s: s.execute(*args, **kwargs))
+    async def _get_info(self, op: str, info: type, statement, **params):
+        """First row of a Core select as a read model (app.database.dto)"""
+
+        def _get(s: Session):
+            row = s.execute(statement, params).first()
+            return info(*row) if row else None
+
+        return await self._run_in_session(op, _get)
 
     # AIProvider methods
     async def get_provider_by_name(self, name: str):
         """Get provider by name"""
-        return await self.get(AIProvider, name=name)
+        return await self.get(AIProvider, name=name, op="get_provider_by_name")
+
+    async def get_provider_info(self, name: str) -> ProviderInfo | None:
+        """Get provider by name, as a read model"""
+        return await self._get_info(
+            "get_provider_info", ProviderInfo, lookup(ProviderInfo, AIProvider, "name"), name=name
+        )
+
+    async def get_default_provider_info(self) -> ProviderInfo | None:
+        """Get default provider as a read model"""
+        return await self._get_info("get_default_provider_info", ProviderInfo, DEFAULT_PROVIDER_INFO)
 
     async def get_default_provider(self):
         """Get default provider from DefaultModel"""
-        result = await self.execute(select(DefaultModel).filter_by(feature="default_provider"))
+        result = await self.execute(select(DefaultModel).filter_by(feature="default_provider"), op="get_default_provider")
         default_model = result.scalars().first()
         if default_model and default_model.provider_name:
             return await self.get_provider_by_name(default_model.provider_name)
@@ -101,74 +132,46 @@ class LocalDatabase:
 
     async def set_default_provider(self, provider: AIProvider):
         """Set default provider in DefaultModel"""
-        result = await self.execute(select(DefaultModel).filter_by(feature="default_provider"))
-        default_model = result.scalars().first()
-        
-        if not default_model:
-            default_model = DefaultModel(feature="default_provider", provider_name=provider.name)
-            await self.add(default_model)
-        else:
-            default_model.provider_name = provider.name
-            await self.commit()
+        await self.execute(upserts.default_model("default_provider", provider.name), op="set_default_provider")
 
     # DefaultModel methods
     async def get_default_model(self, feature: str):
         """Get default model for a feature"""
-        result = await self.execute(select(DefaultModel).filter_by(feature=feature))
+        result = await self.execute(select(DefaultModel).filter_by(feature=feature), op="get_default_model")
         return result.scalars().first()
 
+    async def get_default_model_info(self, feature: str) -> DefaultModelInfo | None:
+        """Get default model for a feature, as a read model"""
+        return await self._get_info(
+            "get_default_model_info",
+            DefaultModelInfo,
+            lookup(DefaultModelInfo, DefaultModel, "feature"),
+            feature=feature,
+        )
+
     async def set_default_model(self, feature: str, provider_name: str = None, model: str = None, config: dict = None):
         """Set default model for a feature"""
-        result = await self.execute(select(DefaultModel).filter_by(feature=feature))
-        default_model = result.scalars().first()
-        
-        if not default_model:
-            default_model = DefaultModel(
-                feature=feature,
-                provider_name=provider_name,
-                model=model,
-                config=config or {}
-            )
-            await self.add(default_model)
-        else:
-            if provider_name is not None:
-                default_model.provider_name = provider_name
-            if model is not None:
-                default_model.model = model
-            if config is not None:
-                default_model.config = config
-            await self.commit()
+        await self.execute(upserts.default_model(feature, provider_name, model, config), op="set_default_model")
 
     # TelegramUser (Owner) methods
     async def get_user(self, user_id: int):
         """Get user by user_id"""
-        return await self.get(TelegramUser, id=user_id)
+        return await self.get(TelegramUser, id=user_id, op="get_user")
+
+    async def get_user_info(self, user_id: int) -> UserInfo | None:
+        """Get user by user_id, as a read model"""
+        return await self._get_info(
+            "get_user_info", UserInfo, lookup(UserInfo, TelegramUser, "id"), id=user_id
+        )
 
     async def is_owner(self, user_id: int) -> bool:
         """Check if user is owner"""
-        user = await self.get_user(user_id)
-        return user is not None and user.is_owner if user else False
+        result = await self.execute(IS_OWNER, {"id": user_id}, op="is_owner")
+        return bool(result.scalar())
 
     async def set_owner(self, user_id: int, is_owner: bool = True, username: str = None, full_name: str = None):
         """Set owner privilege for user"""
-        user = await self.get_user(user_id)
-        if user:
-            user.is_owner = is_owner
-            if username:
-                user.username = username
-            if full_name:
-                user.first_name = full_name
-            await self.commit()
-        else:
-            # Tạo user mới
-            first_name = full_name or ""
-            user = TelegramUser(
-                id=user_id,
-                username=username,
-                first_name=first_name,
-                is_owner=is_owner,
-            )
-            await self.add(user)
+        await self.execute(upserts.owner(user_id, is_owner, username, full_name), op="set_owner")
 
     async def add_owner(self, user_id: int, username: str = None, full_name: str = None):
         """Add new owner"""
@@ -180,120 +183,156 @@ class LocalDatabase:
 
     async def get_all_owners(self):
         """Get all owners"""
-        result = await self.execute(select(TelegramUser).filter_by(is_owner=True))
+        result = await self.execute(select(TelegramUser).filter_by(is_owner=True), op="get_all_owners")
         return result.scalars().all()
 
     # TelegramGroup methods
     async def get_group(self, group_id: int):
         """Get group by group_id"""
-        return await self.get(TelegramGroup, id=group_id)
+        return await self.get(TelegramGroup, id=group_id, op="get_group")
+
+    async def get_group_info(self, group_id: int) -> GroupInfo | None:
+        """Get group by group_id, as a read model"""
+        return await self._get_info(
+            "get_group_info", GroupInfo, lookup(GroupInfo, TelegramGroup, "id"), id=group_id
+        )
 
     async def add_group(self, group_id: int, title: str, username: str = None):
         """Add or update group"""
-        group = await self.get_group(group_id)
-        if group:
-            group.title = title
-            if username:
-                group.username = username
-            await self.commit()
-        else:
-            group = TelegramGroup(
-                id=group_id,
-                title=title,
-                username=username,
-            )
-            await self.add(group)
+        await self.execute(upserts.chat(TelegramGroup, group_id, title, username), op="add_group")
 
     async def get_channel(self, channel_id: int):
         """Get channel by channel_id"""
-        return await self.get(TelegramChannel, id=channel_id)
+        return await self.get(TelegramChannel, id=channel_id, op="get_channel")
 
     async def add_channel(self, channel_id: int, title: str, username: str = None):
         """Add or update channel"""
-        channel = await self.get_channel(channel_id)
-        if channel:
-            channel.title = title
-            if username:
-                channel.username = username
-            await self.commit()
-        else:
-            channel = TelegramChannel(
-                id=channel_id,
-                title=title,
-                username=username,
-            )
-            await self.add(channel)
+        await self.execute(upserts.chat(TelegramChannel, channel_id, title, username), op="add_channel")
 
     async def add_or_update_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None):
         """Add or update user"""
-        user = await self.get_user(user_id)
-        if user:
-            if username:
-                user.username = username
-            if first_name:
-                user.first_name = first_name
-            if last_name:
-                user.last_name = last_name
-            await self.commit()
-        else:
-            user = TelegramUser(
-                id=user_id,
-                username=username,
-                first_name=first_name or "",
-                last_name=last_name,
-            )
-            await self.add(user)
-        return user
+        await self.execute(upserts.user(user_id, username, first_name, last_name), op="add_or_update_user")
+
+    async def _add_member(self, op: str, chat_model, member_model, chat_column: str, user_id: int, chat_id: int, is_admin: bool, is_owner: bool):
+        """User, chat and membership upserts in one transaction. User and chat
+        are only created if missing, a known chat keeps its title."""
+
+        def _save(s: Session):
+            s.execute(upserts.user(user_id))
+            s.execute(upserts.chat(chat_model, chat_id))
+            s.execute(upserts.member(member_model, user_id, chat_column, chat_id, is_admin, is_owner))
+            s.commit()
+
+        await self._run_in_session(op, _save)
 
     async def add_group_member(self, user_id: int, group_id: int, is_admin: bool = False, is_owner: bool = False):
         """Add member to group with admin status"""
-        # Ensure user and group exist
-        user = await self.add_or_update_user(user_id)
-        await self.add_group(group_id, "")
-
-        # Check and add/update member
-        result = await self.execute(
-            select(GroupMember).filter_by(user_id=user_id, group_id=group_id)
+        await self._add_member(
+            "add_group_member", TelegramGroup, GroupMember, "group_id", user_id, group_id, is_admin, is_owner
         )
-        member = result.scalars().first()
-        
-        if member:
-            member.is_admin = is_admin
-            member.is_owner = is_owner
-            await self.commit()
-        else:
-            member = GroupMember(
-                user_id=user_id,
-                group_id=group_id,
-                is_admin=is_admin,
-                is_owner=is_owner,
-            )
-            await self.add(member)
 
     async def add_channel_member(self, user_id: int, channel_id: int, is_admin: bool = False, is_owner: bool = False):
         """Add member to channel with admin status"""
-        # Ensure user and channel exist
-        user = await self.add_or_update_user(user_id)
-        await self.add_channel(channel_id, "")
+        await self._add_member(
+            "add_channel_member", TelegramChannel, ChannelMember, "channel_id", user_id, channel_id, is_admin, is_owner
+        )
+
+    # MediaCache methods
+    async def get_media_file_id(self, *keys: str) -> str | None:
+        """Get cached Telegram file_id for the first known key"""
+        if not keys:
+            return None
+
+        def _touch(s: Session) -> str | None:
+            entry = s.scalars(select(MediaCache).where(MediaCache.key.in_(keys))).first()
+            if not entry:
+                return None
+            entry.last_used = datetime.now()
+            s.commit()
+            return entry.file_id
+
+        return await self._run_in_session("get_media_file_id", _touch)
+
+    async def set_media_file_id(self, keys: list[str], file_id: str, file_unique_id: str = None):
+        """Remember file_id under all keys, dropping least recently used entries over the limit"""
+        now = datetime.now()
+
+        def _save(s: Session):
+            for key in dict.fromkeys(keys):
+                s.merge(
+                    MediaCache(
+                        key=key,
+                        file_id=file_id,
+                        file_unique_id=file_unique_id,
+                        last_used=now,
+                    )
+                )
+            s.flush()
+            keep = (
+                select(MediaCache.key)
+                .order_by(MediaCache.last_used.desc())
+                .limit(MEDIA_CACHE_LIMIT)
+            )
+            s.execute(delete(MediaCache).where(MediaCache.key.not_in(keep)))
+            s.commit()
+
+        await self._run_in_session("set_media_file_id", _save)
+
+    async def forget_media_file_id(self, file_id: str):
+        """Drop a file_id Telegram no longer accepts"""
+        await self._run_in_session(
+            "forget_media_file_id",
+            lambda s: (
+                s.execute(delete(MediaCache).where(MediaCache.file_id == file_id)),
+                s.commit(),
+            )
+        )
 
-        # Check and add/update member
-        result = await self.execute(
-            select(ChannelMember).filter_by(user_id=user_id, channel_id=channel_id)
+    # ProviderModel (model catalog) methods
+    async def get_provider_models(self, provider_id: int | None = None) -> list[ProviderModel]:
+        """Get catalog entries of one provider, or of all providers"""
+        query = select(ProviderModel).order_by(ProviderModel.provider_id, ProviderModel.model_id)
+        if provider_id is not None:
+            query = query.where(ProviderModel.provider_id == provider_id)
+        result = await self.execute(query, op="get_provider_models")
+        return result.scalars().all()
+
+    async def replace_provider_models(self, provider_id: int, entries: list[dict]):
+        """Replace a provider's catalog in one transaction"""
+        now = datetime.now()
+
+        def _replace(s: Session):
+            s.execute(delete(ProviderModel).where(ProviderModel.provider_id == provider_id))
+            s.add_all(
+                ProviderModel(provider_id=provider_id, updated_at=now, **entry)
+                for entry in entries
+            )
+            s.commit()
+
+        await self._run_in_session("replace_provider_models", _replace)
+
+    # CloudOutbox methods
+    async def queue_cloud_write(self, table_name: str, key: dict):
+        """Remember a row written here while the cloud was unreachable"""
+        await self._run_in_session(
+            "queue_cloud_write",
+            lambda s: (s.add(CloudOutbox(table_name=table_name, key=key)), s.commit())
         )
-        member = result.scalars().first()
-        
-        if member:
-            member.is_admin = is_admin
-            member.is_owner = is_owner
-            await self.commit()
-        else:
-            member = ChannelMember(
-                user_id=user_id,
-                channel_id=channel_id,
-                is_admin=is_admin,
-                is_owner=is_owner,
+
+    async def get_cloud_outbox(self) -> list[CloudOutbox]:
+        """Queued rows, oldest first"""
+        result = await self.execute(select(CloudOutbox).order_by(CloudOutbox.id), op="get_cloud_outbox")
+        return result.scalars().all()
+
+    async def remove_cloud_outbox(self, ids: list[int]):
+        """Drop rows the cloud has caught up on"""
+        await self._run_in_session(
+            "remove_cloud_outbox",
+            lambda s: (
+                s.execute(delete(CloudOutbox).where(CloudOutbox.id.in_(ids))),
+                s.commit(),
             )
-            await self.add(member)
+        )
 
 
 # Global instance
@@ -6,6 +6,9 @@ from app.database.models.telegram_group import TelegramGroup
 from app.database.models.telegram_channel import TelegramChannel
 from app.database.models.ai_provider import AIProvider
 from app.database.models.default_model import DefaultModel
+from app.database.models.media_cache import MediaCache
+from app.database.models.provider_model import ProviderModel
+from app.database.models.cloud_outbox import CloudOutbox
 
 __all__ = [
     "Base",
@@ -16,4 +19,7 @@ __all__ = [
     "TelegramChannel",
     "AIProvider",
     "DefaultModel",
+    "MediaCache",
+    "ProviderModel",
+    "CloudOutbox",
 ]
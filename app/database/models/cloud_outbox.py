@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.models.base import Base
+
+
+class CloudOutbox(Base):
+    """Row written locally while the cloud was unreachable, copied up later (local only)"""
+
+    __tablename__ = "cloud_outbox"
+    __table_args__ = {"info": {"local_only": True}}
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    table_name: Mapped[str] = mapped_column(String(50))
+    key: Mapped[dict] = mapped_column(JSON)  # Column values identifying the row, e.g. {"id": 42}
+    queued_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
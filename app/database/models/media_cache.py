@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.models.base import Base
+
+
+class MediaCache(Base):
+    """Telegram file_id of media already uploaded once (local only, not synced)"""
+
+    __tablename__ = "media_cache"
+    __table_args__ = {"info": {"local_only": True}}
+
+    key: Mapped[str] = mapped_column(String(80), primary_key=True)  # sha256:..., prompt:...
+    file_id: Mapped[str] = mapped_column(String(200))
+    file_unique_id: Mapped[str] = mapped_column(String(100), nullable=True)
+    last_used: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
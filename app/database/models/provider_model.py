@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.models.base import Base
+
+
+class ProviderModel(Base):
+    """Model catalog entry fetched from a provider's /models API (local only, not synced)"""
+
+    __tablename__ = "provider_models"
+    __table_args__ = {"info": {"local_only": True}}
+
+    provider_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    model_id: Mapped[str] = mapped_column(String(200), primary_key=True)
+    context_length: Mapped[int] = mapped_column(Integer, nullable=True)
+    modality: Mapped[str] = mapped_column(String(50), nullable=True)  # text, text+image->text, ...
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
@@ -0,0 +1,188 @@
+"""Query timing, slow-query log and N+1 detection for both databases.
+
+Every statement is normalized into a fingerprint (literals and IN lists
+collapsed), timed per backend ("local" or "cloud") and counted in
+app.metrics. Statements slower than SLOW_QUERY_MS are logged with their
+fingerprint (never their parameters, provider rows hold API keys).
+
+`run()` replaces `asyncio.to_thread` in the database clients and also
+records how long the call waited for a free executor thread.
+
+Handlers run inside `queries.scope()` (see app.watchdog). A handler
+call that runs more than MAX_QUERIES statements, or one fingerprint
+REPEAT_LIMIT times, is reported as a likely N+1.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+
+from sqlalchemy import event
+
+from app.metrics import (
+    DB_EXECUTOR_WAIT_SECONDS,
+    DB_N_PLUS_ONE,
+    DB_QUERY_SECONDS,
+    DB_SLOW_QUERIES,
+    DB_UPDATE_QUERIES,
+)
+from app.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+MAX_QUERIES = 6  # Statements in one handler call before it is reported
+REPEAT_LIMIT = 3  # Runs of one fingerprint in one handler call before it is reported
+REPORTS = 50  # N+1 reports kept for /perf db
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES = re.compile(r"(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+\"?(\w+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Statement with literals, IN lists and multi-row VALUES collapsed"""
+    text = _STRING.sub("?", statement)
+    text = _NUMBER.sub("?", text)
+    text = _IN_LIST.sub("(?+)", text)
+    text = _VALUES.sub(r"\1, ...", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+@lru_cache(maxsize=2048)
+def label(fingerprint: str) -> str:
+    """Short, bounded metric label: statement type and first table"""
+    verb = fingerprint.split(" ", 1)[0].upper() if fingerprint else "?"
+    table = _TABLE.search(fingerprint)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+@dataclass(slots=True)
+class _Totals:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+
+class _Scope:
+    """Statements run by one handler call"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.fingerprints: Counter[tuple[str, str]] = Counter()
+        self.lock = threading.Lock()
+
+
+@dataclass(frozen=True, slots=True)
+class Report:
+    handler: str
+    queries: int
+    repeated: str | None  # Fingerprint run REPEAT_LIMIT+ times, if any
+    repeats: int
+    at: float
+
+
+_scope: ContextVar[_Scope | None] = ContextVar("query_scope", default=None)
+
+
+class QueryStats:
+    def __init__(self):
+        self.fingerprints: dict[tuple[str, str], _Totals] = {}
+        self.reports: deque[Report] = deque(maxlen=REPORTS)
+        self._reported: set[tuple[str, str | None]] = set()
+        self._lock = threading.Lock()
+
+    def instrument(self, engine, db: str):
+        """Time every statement run on engine"""
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before(conn, cursor, statement, parameters, context, executemany):
+            # Kept on the statement's context, nothing leaks if the statement fails
+            context._query_start = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after(conn, cursor, statement, parameters, context, executemany):
+            self._record(db, statement, time.perf_counter() - context._query_start)
+
+    def _record(self, db: str, statement: str, seconds: float):
+        fp = fingerprint(statement)
+        key = (db, fp)
+        with self._lock:
+            totals = self.fingerprints.get(key)
+            if totals is None:
+                totals = self.fingerprints[key] = _Totals()
+            totals.count += 1
+            totals.total += seconds
+            totals.max = max(totals.max, seconds)
+        DB_QUERY_SECONDS.labels(db, label(fp)).observe(seconds)
+        # Runs in the executor thread, which carries the caller's context
+        tracer.record("sql", seconds, db=db, statement=fp[:200])
+        scope = _scope.get()
+        if scope is not None:
+            with scope.lock:
+                scope.fingerprints[key] += 1
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            DB_SLOW_QUERIES.labels(db, label(fp)).inc()
+            logger.warning(f"Slow {db} query ({seconds * 1000:.0f} ms): {fp[:500]}")
+
+    async def run(self, db: str, func, *args, **kwargs):
+        """asyncio.to_thread, recording the wait for a free executor thread"""
+        submitted = time.perf_counter()
+
+        def call():
+            DB_EXECUTOR_WAIT_SECONDS.labels(db).observe(time.perf_counter() - submitted)
+            return func(*args, **kwargs)
+
+        return await asyncio.to_thread(call)
+
+    @contextmanager
+    def scope(self, name: str):
+        """Count the statements of one handler call, report likely N+1 patterns"""
+        scope = _Scope(name)
+        token = _scope.set(scope)
+        try:
+            yield scope
+        finally:
+            _scope.reset(token)
+            self._check(scope)
+
+    def _check(self, scope: _Scope):
+        total = sum(scope.fingerprints.values())
+        if not total:
+            return
+        DB_UPDATE_QUERIES.labels(scope.name).observe(total)
+        (db, repeated), repeats = scope.fingerprints.most_common(1)[0]
+        if repeats < REPEAT_LIMIT:
+            repeated = None
+        if total < MAX_QUERIES and repeated is None:
+            return
+        DB_N_PLUS_ONE.labels(scope.name).inc()
+        self.reports.append(Report(scope.name, total, repeated, repeats, time.time()))
+        # Log each pattern once, the metric and /perf db keep counting
+        if (scope.name, repeated) not in self._reported:
+            self._reported.add((scope.name, repeated))
+            detail = f", {repeats}x {db}: {repeated[:300]}" if repeated else ""
+            logger.warning(f"Possible N+1 in {scope.name}: {total} queries{detail}")
+
+    def top(self, limit: int = 10) -> list[tuple[str, str, _Totals]]:
+        """Fingerprints by total time"""
+        with self._lock:
+            items = [(db, fp, totals) for (db, fp), totals in self.fingerprints.items()]
+        items.sort(key=lambda item: item[2].total, reverse=True)
+        return items[:limit]
+
+
+# Global instance
+queries = QueryStats()
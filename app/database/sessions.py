@@ -0,0 +1,22 @@
+"""Session scope shared by the database clients.
+
+Every client call opens its own Session in the executor thread, runs in
+it and closes it. Nothing outlives the call: objects come back detached
+(attributes stay loaded, sessions use expire_on_commit=False), so memory
+does not grow with every user or group ever seen, and concurrent calls
+never share a Session. Changing a returned object does nothing; writes
+go through the client methods, which update in one session.
+"""
+
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.orm import Session
+
+
+def execute(session: Session, *args, **kwargs):
+    """session.execute() whose result is still readable once the session
+    closes: rows are buffered, statements without rows are committed"""
+    result = session.execute(*args, **kwargs)
+    if isinstance(result, CursorResult) and not result.returns_rows:
+        session.commit()
+        return result
+    return result.freeze()()
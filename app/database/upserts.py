@@ -0,0 +1,78 @@
+"""Single-statement upserts shared by the database clients.
+
+INSERT ... ON CONFLICT DO UPDATE replaces select-then-insert-or-update:
+one statement per row instead of a read, a write and a commit each, and
+no window between the check and the insert where a concurrent call
+inserts the same row first. Both databases are SQLite (local.db, libsql
+in the cloud), so the sqlite dialect's insert() covers them.
+"""
+
+from sqlalchemy.dialects.sqlite import insert
+
+from app.database.models import DefaultModel, TelegramUser
+
+
+def upsert(model, values: dict, key: tuple[str, ...], update: dict = None):
+    """Insert values, or when a row with the same key columns exists, set
+    update on it (default: every non-key value). An empty update leaves an
+    existing row alone."""
+    statement = insert(model).values(**values)
+    if update is None:
+        update = {name: value for name, value in values.items() if name not in key}
+    if not update:
+        return statement.on_conflict_do_nothing(index_elements=key)
+    return statement.on_conflict_do_update(index_elements=key, set_=update)
+
+
+def _given(**values) -> dict:
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def default_model(feature: str, provider_name: str = None, model: str = None, config: dict = None):
+    """DefaultModel of a feature, updating only the values given"""
+    return upsert(
+        DefaultModel,
+        {"feature": feature, "provider_name": provider_name, "model": model, "config": config or {}},
+        ("feature",),
+        _given(provider_name=provider_name, model=model, config=config),
+    )
+
+
+def owner(user_id: int, is_owner: bool, username: str = None, full_name: str = None):
+    """Owner flag of a user, created if unknown, names updated when given"""
+    return upsert(
+        TelegramUser,
+        {"id": user_id, "username": username, "first_name": full_name or "", "is_owner": is_owner},
+        ("id",),
+        _given(is_owner=is_owner, username=username or None, first_name=full_name or None),
+    )
+
+
+def user(user_id: int, username: str = None, first_name: str = None, last_name: str = None):
+    """User, created if unknown, names updated when given"""
+    return upsert(
+        TelegramUser,
+        {"id": user_id, "username": username, "first_name": first_name or "", "last_name": last_name},
+        ("id",),
+        _given(username=username or None, first_name=first_name or None, last_name=last_name or None),
+    )
+
+
+def chat(model, chat_id: int, title: str = None, username: str = None):
+    """Group or channel, created if unknown (untitled when title is None),
+    title and username updated when given"""
+    return upsert(
+        model,
+        {"id": chat_id, "title": title or "", "username": username},
+        ("id",),
+        _given(title=title, username=username or None),
+    )
+
+
+def member(model, user_id: int, chat_column: str, chat_id: int, is_admin: bool, is_owner: bool):
+    """Group or channel membership with its admin and owner flags"""
+    return upsert(
+        model,
+        {"user_id": user_id, chat_column: chat_id, "is_admin": is_admin, "is_owner": is_owner},
+        ("user_id", chat_column),
+    )
@@ -0,0 +1,69 @@
+"""Per-group feature flags, stored on TelegramGroup and cached in memory.
+
+Flags are read on every group message (chatbot and anti-spam filters),
+so they are served from memory and the cache entry is dropped whenever
+a flag is toggled.
+"""
+
+from dataclasses import dataclass
+
+from app.cache import TTLCache
+from app.database.cloud import cloud_db
+from app.database.local import local_db
+
+# Write to cloud (mirrors to local), read from local (faster)
+write_db = cloud_db
+read_db = local_db
+
+
+@dataclass(frozen=True, slots=True)
+class GroupFlags:
+    chatbot_disabled: bool = False
+    anti_spam_disabled: bool = False
+
+
+class GroupSettings:
+    def __init__(self, maxsize: int = 10_000, ttl: float = 60 * 60):
+        # TTL only picks up changes synced from the cloud, toggles invalidate right away
+        self._flags = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, chat_id: int) -> GroupFlags:
+        flags = self._flags.get(chat_id)
+        if flags is None:
+            group = await read_db.get_group_info(chat_id)
+            flags = (
+                GroupFlags(bool(group.disable_chatbot), bool(group.disable_anti_spam))
+                if group
+                else GroupFlags()
+            )
+            self._flags.set(chat_id, flags)
+        return flags
+
+    async def set(
+        self,
+        chat_id: int,
+        title: str | None = None,
+        chatbot_disabled: bool | None = None,
+        anti_spam_disabled: bool | None = None,
+    ):
+        updates = {}
+        if chatbot_disabled is not None:
+            updates["disable_chatbot"] = chatbot_disabled
+        if anti_spam_disabled is not None:
+            updates["disable_anti_spam"] = anti_spam_disabled
+        if not updates:
+            return
+        try:
+            await write_db.set_group_flags(chat_id, title=title, **updates)
+        finally:
+            self._flags.pop(chat_id)
+
+    async def is_chatbot_enabled(self, chat_id: int) -> bool:
+        return not (await self.get(chat_id)).chatbot_disabled
+
+    async def is_anti_spam_enabled(self, chat_id: int) -> bool:
+        return not (await self.get(chat_id)).anti_spam_disabled
+
+
+# Global instance
+group_settings = GroupSettings()
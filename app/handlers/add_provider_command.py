@@ -1,6 +1,6 @@
 """Command handlers for AI provider and model management."""
 
-from app.handlers.owner import is_user_owner
+from app.handlers.owner import owner_filter
 from pyrogram import Client, enums, filters, types
 
 from app.database.cloud import cloud_db
@@ -14,7 +14,7 @@ read_db = local_db
 
 @Client.on_message(
     filters.command("add_provider")
-    & filters.create(lambda _, __, m: is_user_owner(m.from_user.id))  # type: ignore
+    & owner_filter
 )
 async def add_provider_handler(client: Client, message: types.Message):
     """Add new AI provider from Telegram by OWNER.
@@ -39,9 +39,7 @@ async def add_provider_handler(client: Client, message: types.Message):
     # Check if provider already exists (read from local)
     existing = await read_db.get_provider_by_name(name)
     if existing:
-        existing.base_url = base_url
-        existing.api_key = api_key
-        await write_db.commit()
+        await write_db.update_provider(existing.id, base_url=base_url, api_key=api_key)
         await message.reply(f"Provider `{name}` updated!", quote=True)
     else:
         provider = AIProvider(
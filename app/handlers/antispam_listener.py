@@ -0,0 +1,45 @@
+import logging
+
+from pyrogram import Client, filters, types
+
+from app.antispam import action_batcher, antispam, message_features
+from app.group_settings import group_settings
+from app.workers import WorkerDiedError, workers
+
+logger = logging.getLogger(__name__)
+
+
+@Client.on_message(filters.group & filters.incoming & ~filters.service, group=-1)  # type: ignore
+async def antispam_listener(client: Client, message: types.Message):
+    """Check group messages before any other handler sees them"""
+    # Anonymous admins and linked channel posts are never spam
+    if message.sender_chat and (
+        message.sender_chat.id == message.chat.id or message.is_automatic_forward
+    ):
+        return
+    if not await group_settings.is_anti_spam_enabled(message.chat.id):
+        return
+
+    if workers.enabled:
+        # SimHash work moves off the update loop, one worker per chat
+        try:
+            verdict = await workers.run(
+                "app.antispam:check_in_worker",
+                *message_features(message),
+                shard=message.chat.id,
+            )
+        except WorkerDiedError:
+            return
+    else:
+        verdict = antispam.check_message(message)
+    if verdict is None:
+        return
+
+    logger.info(
+        f"Spam in {message.chat.id} from "
+        f"{message.from_user.id if message.from_user else message.sender_chat.id}: "
+        f"{verdict.reason}"
+    )
+    action_batcher.add(client, message, verdict)
+    # Flagged messages don't reach the chatbot
+    message.stop_propagation()
@@ -0,0 +1,10 @@
+from pyrogram import Client, types
+
+from app.callbacks import router
+
+
+@Client.on_callback_query()  # type: ignore
+async def callback_dispatcher(client: Client, callback_query: types.CallbackQuery):
+    """Dispatch every callback query through the callback router"""
+    if not await router.dispatch(client, callback_query):
+        await callback_query.answer()
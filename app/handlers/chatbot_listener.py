@@ -1,6 +1,10 @@
-from app.ai.agent import AIAgent
+import asyncio
+
 from app.database.cloud import cloud_db
 from app.database.local import local_db
+from app.group_settings import group_settings
+from app.lifecycle import inflight
+from app.sender import send_queue
 from pyrogram import Client, enums, filters, types
 
 # Write to cloud (mirrors to local), read from local (faster)
@@ -14,30 +18,48 @@ basic_buttons = [
 ]
 
 
+async def chatbot_enabled_filter(_, __, message: types.Message) -> bool:
+    """Private chats always, groups unless the chatbot is disabled (cached flag)"""
+    if message.chat.type not in [enums.ChatType.GROUP, enums.ChatType.SUPERGROUP]:
+        return True
+    return await group_settings.is_chatbot_enabled(message.chat.id)
+
+
 @Client.on_message(
     (filters.mentioned & ~filters.new_chat_members | filters.private)
     & filters.incoming
     & ~filters.create(lambda _, __, m: m.text.startswith("/"))  # type: ignore
+    & filters.create(chatbot_enabled_filter)
 )
 async def chatbot_handler(client: Client, message: types.Message):
     """Process chatbot message"""
-    await message.reply_chat_action(enums.ChatAction.TYPING)
-    agent = await AIAgent.create()
+    if inflight.draining:
+        send_queue.reply(message, "🔁 Updating, please try again in a minute.", quote=True)
+        return
 
-    resp = await agent.run_chat(client, message)
-    if resp:
-        if len(resp) > 4000:
-            for i in range(0, len(resp), 4000):
-                await message.reply(
-                    resp[i : i + 4000],
-                    quote=True,
-                    parse_mode=enums.ParseMode.MARKDOWN,
-                )
-        else:
-            await message.reply(
-                resp,
-                quote=True,
-                parse_mode=enums.ParseMode.MARKDOWN,
+    # Tracked so /update waits for the reply before restarting
+    async with inflight.track():
+        await message.reply_chat_action(enums.ChatAction.TYPING)
+        # Agent pulls in openai-agents and litellm, imported on first use (or by prewarm)
+        from app.ai.agent import AIAgent
+
+        agent = await AIAgent.create()
+
+        resp = await agent.run_chat(client, message)
+        if resp:
+            # Chunks are queued in order and paced by the send queue, never
+            # merged: a blank line would be added inside the reply
+            await asyncio.gather(
+                *[
+                    send_queue.reply(
+                        message,
+                        resp[i : i + 4000],
+                        mergeable=False,
+                        quote=True,
+                        parse_mode=enums.ParseMode.MARKDOWN,
+                    )
+                    for i in range(0, len(resp), 4000)
+                ]
             )
 
     if not message.sender_chat:
@@ -2,7 +2,6 @@ import asyncio
 
 from app.ai.text import localize
 from pyrogram import Client, enums, filters, types
-from agents import SQLiteSession
 
 basic_buttons = [
     types.InlineKeyboardButton(text="Channel", url="https://t.me/starfall_org"),
@@ -28,6 +27,9 @@ async def clear_handler(client: Client, message: types.Message):
             return
     await message.reply_chat_action(enums.ChatAction.TYPING)
     chat_id = message.chat.id
+    # openai-agents is heavy, imported on first use (or by prewarm)
+    from agents import SQLiteSession
+
     session = SQLiteSession(f"chat_{chat_id}", "conversations.sqlite")
     await session.clear_session()
     cleared_text = await localize(
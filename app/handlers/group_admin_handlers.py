@@ -1,14 +1,11 @@
 import asyncio
 
 from app.ai.text import localize
-from app.database.cloud import cloud_db
-from app.database.local import local_db
-from app.database.models import TelegramGroup, TelegramUser
+from app.callbacks import router
+from app.group_settings import group_settings
 from pyrogram import Client, enums, filters, types
 from app.utils import is_chat_admin, is_chat_owner, is_owner
 
-db = cloud_db
-
 basic_buttons = [
     types.InlineKeyboardButton(text="Channel", url="https://t.me/starfall_org"),
     types.InlineKeyboardButton(text="Group", url="https://t.me/starfall_community"),
@@ -16,47 +13,14 @@ basic_buttons = [
 ]
 
 
-def _get_state_key(chat_id: int, state_type: str) -> str:
-    """Create key for state stored in local database"""
-    return f"group_{chat_id}_{state_type}"
-
-
-async def _get_group_state(chat_id: int) -> dict:
-    """Get group state from local database"""
-    chatbot_disabled = await local_db.get_state(
-        _get_state_key(chat_id, "chatbot_disabled")
-    )
-    anti_spam_disabled = await local_db.get_state(
-        _get_state_key(chat_id, "anti_spam_disabled")
-    )
-    return {
-        "chatbot_disabled": chatbot_disabled == "true",
-        "anti_spam_disabled": anti_spam_disabled == "true",
-    }
-
-
-async def _set_group_state(
-    chat_id: int, chatbot_disabled: bool, anti_spam_disabled: bool
-):
-    """Save group state to local database"""
-    await local_db.set_state(
-        _get_state_key(chat_id, "chatbot_disabled"),
-        "true" if chatbot_disabled else "false",
-    )
-    await local_db.set_state(
-        _get_state_key(chat_id, "anti_spam_disabled"),
-        "true" if anti_spam_disabled else "false",
-    )
-
-
 @Client.on_message(filters.command("menu") & filters.group)  # type: ignore
 async def group_menu(client: Client, message: types.Message):
     """Display group administration menu"""
     await message.reply_chat_action(enums.ChatAction.TYPING)
     chat_id = message.chat.id
 
-    # Lấy state từ local database
-    state = await _get_group_state(chat_id)
+    # Lấy state từ cache (local database khi chưa có)
+    state = await group_settings.get(chat_id)
 
     # Kiểm tra quyền admin
     if not (
@@ -74,12 +38,12 @@ async def group_menu(client: Client, message: types.Message):
         [
             [
                 types.InlineKeyboardButton(
-                    text=("Disable" if state["chatbot_disabled"] else "Enable")
+                    text=("Enable" if state.chatbot_disabled else "Disable")
                     + " Chatbot",
                     callback_data="menu/chatbot",
                 ),
                 types.InlineKeyboardButton(
-                    text=("Disable" if state["anti_spam_disabled"] else "Enable")
+                    text=("Enable" if state.anti_spam_disabled else "Disable")
                     + " Anti-Spam",
                     callback_data="menu/anti_spam",
                 ),
@@ -93,9 +57,9 @@ async def group_menu(client: Client, message: types.Message):
     await message.reply(menu_text, reply_markup=keyboard_markup)
 
 
-@Client.on_callback_query(
-    filters.regex(r"menu/")  # type: ignore
-)
+@router.route("menu/chatbot")
+@router.route("menu/anti_spam")
+@router.route("menu/goodbye")
 async def group_admin_menu_handler(client: Client, callback_query: types.CallbackQuery):
     """Handle callback from group administration menu"""
     await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
@@ -116,13 +80,15 @@ async def group_admin_menu_handler(client: Client, callback_query: types.Callbac
         return
 
     # Lấy state hiện tại
-    state = await _get_group_state(chat_id)
+    state = await group_settings.get(chat_id)
 
     if action == "menu/chatbot":
         # Toggle chatbot state
-        new_chatbot_disabled = not state["chatbot_disabled"]
-        await _set_group_state(
-            chat_id, new_chatbot_disabled, state["anti_spam_disabled"]
+        new_chatbot_disabled = not state.chatbot_disabled
+        await group_settings.set(
+            chat_id,
+            title=callback_query.message.chat.title,
+            chatbot_disabled=new_chatbot_disabled,
         )
 
         chatbot_status = await localize(
@@ -136,9 +102,11 @@ async def group_admin_menu_handler(client: Client, callback_query: types.Callbac
 
     elif action == "menu/anti_spam":
         # Toggle anti-spam state
-        new_anti_spam_disabled = not state["anti_spam_disabled"]
-        await _set_group_state(
-            chat_id, state["chatbot_disabled"], new_anti_spam_disabled
+        new_anti_spam_disabled = not state.anti_spam_disabled
+        await group_settings.set(
+            chat_id,
+            title=callback_query.message.chat.title,
+            anti_spam_disabled=new_anti_spam_disabled,
         )
 
         antispam_status = await localize(
@@ -159,14 +127,3 @@ async def group_admin_menu_handler(client: Client, callback_query: types.Callbac
         await asyncio.sleep(3)
         await client.leave_chat(chat_id)
 
-
-async def is_chatbot_enabled(chat_id: int) -> bool:
-    """Check if chatbot is enabled"""
-    state = await _get_group_state(chat_id)
-    return not state["chatbot_disabled"]
-
-
-async def is_anti_spam_enabled(chat_id: int) -> bool:
-    """Check if anti-spam is enabled"""
-    state = await _get_group_state(chat_id)
-    return not state["anti_spam_disabled"]
@@ -1,8 +1,11 @@
 from pyrogram import Client, enums, filters, types
 
-from app.ai.nsfw import gen_img
+from app.ai.nsfw import NEGATIVE_PROMPT, gen_img
+from app.callbacks import router
+from app.lifecycle import inflight
 from app.database.cloud import cloud_db
 from app.database.local import local_db
+from app.media import content_key, prompt_key, send_cached_photo
 
 # Write to cloud (mirrors to local), read from local (faster)
 write_db = cloud_db
@@ -15,14 +18,93 @@ basic_buttons = [
 ]
 
 
+def parse_prompt(text: str) -> tuple[str, int | None]:
+    """Split `/image <prompt> [--seed N]` into prompt and seed"""
+    prompt = text.split(" ", 1)[1]
+    head, sep, tail = prompt.rpartition(" --seed ")
+    if sep and tail.strip().isdigit():
+        return head.strip(), int(tail)
+    return prompt, None
+
+
+def image_markup(file_key: str | None = None) -> types.InlineKeyboardMarkup:
+    buttons = [[button for button in basic_buttons]]
+    if file_key:
+        # file_key is "file:<digest>", resend by digest
+        buttons.insert(
+            0,
+            [
+                types.InlineKeyboardButton(
+                    text="🔁 Send again",
+                    callback_data=f"image/again/{file_key.split(':', 1)[1]}",
+                )
+            ],
+        )
+    return types.InlineKeyboardMarkup(buttons)
+
+
 @Client.on_message(filters.command("image"))  # type: ignore
 async def nsfw_handler(client: Client, message: types.Message):
     """Generate image"""
     await message.reply_chat_action(enums.ChatAction.TYPING)
-    prompt = message.text.split(" ", 1)[1]
-    await message.reply_photo(
-        await gen_img(prompt),
-        caption=f"```\n{prompt}\n```",
-        reply_markup=types.InlineKeyboardMarkup([[button for button in basic_buttons]]),
-    )
+    prompt, seed = parse_prompt(message.text)
+    caption = f"```\n{prompt}\n```"
+
+    keys = []
+    if seed is not None:
+        keys.append(prompt_key(prompt, NEGATIVE_PROMPT, seed))
+        # Same prompt and seed were generated before, send without generating
+        sent = await send_cached_photo(
+            client,
+            message.chat.id,
+            keys=keys,
+            caption=caption,
+            reply_markup=image_markup(),
+            # Stay in the forum topic the command came from
+            message_thread_id=message.message_thread_id,
+        )
+        if sent:
+            await message.delete()
+            return
+
+    if inflight.draining:
+        await message.reply("🔁 Updating, please try again in a minute.", quote=True)
+        return
+
+    # Tracked so /update waits for the image before restarting
+    async with inflight.track():
+        path = await gen_img(prompt, seed=seed)
+        file_key = await content_key(path)
+        await send_cached_photo(
+            client,
+            message.chat.id,
+            path,
+            keys=[file_key, *keys],
+            caption=caption,
+            reply_markup=image_markup(file_key),
+            message_thread_id=message.message_thread_id,
+        )
     await message.delete()
+
+
+@router.route("image/again/<digest>")
+async def image_again_handler(
+    client: Client, callback_query: types.CallbackQuery, digest: str
+):
+    """Send the same image again by file_id, no upload"""
+    sent = await send_cached_photo(
+        client,
+        callback_query.message.chat.id,
+        keys=[f"file:{digest}"],
+        caption=(
+            callback_query.message.caption.markdown
+            if callback_query.message.caption
+            else None
+        ),
+        reply_markup=callback_query.message.reply_markup,
+        message_thread_id=callback_query.message.message_thread_id,
+    )
+    if sent:
+        await callback_query.answer()
+    else:
+        await callback_query.answer("Image expired from cache.", show_alert=True)
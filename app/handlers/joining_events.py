@@ -46,7 +46,7 @@ async def on_new_chat_members(client: Client, message: types.Message):
                         is_admin = False
                         is_owner = False
 
-                    user = await local_db.get_user(inviter.id)
+                    user = await local_db.get_user_info(inviter.id)
                     if user:
                         await local_db.add_or_update_user(
                             user_id=inviter.id,
@@ -80,7 +80,7 @@ async def on_new_chat_members(client: Client, message: types.Message):
                         is_admin = False
                         is_owner = False
 
-                    user = await local_db.get_user(inviter.id)
+                    user = await local_db.get_user_info(inviter.id)
                     if user:
                         await local_db.add_or_update_user(
                             user_id=inviter.id,
@@ -1,12 +1,10 @@
-from app.handlers.owner import is_user_owner
+from app.callbacks import Snapshot, callback_state, expired, router
 from app.handlers.pagination import (
     ITEMS_PER_PAGE,
     create_models_keyboard,
 )
-from pyrogram import Client, enums, filters, types
+from pyrogram import Client, enums, types
 
-from app.ai.base import get_model
-from app.ai.base import models as get_models
 from app.database.cloud import cloud_db
 from app.database.local import local_db
 
@@ -15,36 +13,14 @@ write_db = cloud_db
 read_db = local_db
 
 
-@Client.on_callback_query(
-    filters.regex(r"models/close")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
-async def models_close_handler(client: Client, callback_query: types.CallbackQuery):
-    """Handle close for models list"""
-    await callback_query.message.delete()
-    if callback_query.message.reply_to_message:
-        await callback_query.message.reply_to_message.delete()
-
-
-@Client.on_callback_query(
-    filters.regex(r"models/page/")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
-async def models_page_handler(client: Client, callback_query: types.CallbackQuery):
-    """Handle pagination for models list"""
-
-    await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    parts = str(callback_query.data).split("/")
-    page = int(parts[-1])
-
-    all_models = await get_models()
-    current_model = await get_model()
-
-    # Move current model to top and mark it
-    models_list = list(all_models)
-    if current_model in models_list:
-        models_list.remove(current_model)
-    models_list.insert(0, current_model)
+def render_models_page(
+    token: str, snapshot: Snapshot, page: int
+) -> tuple[str, types.InlineKeyboardMarkup]:
+    """Build text and keyboard for one page of a models snapshot"""
+    models_list = snapshot.items
+    current_model = snapshot.meta.get("current")
+    details = snapshot.meta.get("details", {})
+    query = snapshot.meta.get("query")
 
     total_pages = max(1, (len(models_list) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
     start_idx = page * ITEMS_PER_PAGE
@@ -54,7 +30,7 @@ async def models_page_handler(client: Client, callback_query: types.CallbackQuer
     markup = create_models_keyboard(
         models=page_models,
         page=page,
-        callback_prefix="models",
+        callback_prefix=f"models/{token}",
         total_pages=total_pages,
     )
 
@@ -65,53 +41,61 @@ async def models_page_handler(client: Client, callback_query: types.CallbackQuer
         num = start_num + i
         is_selected = model == current_model
         prefix = "✅ " if is_selected else ""
-        model_names.append(f"`{num}`. {prefix}`{model}`")
+        line = f"`{num}`. {prefix}`{model}`"
+        if details.get(model):
+            line += f" — {details[model]}"
+        model_names.append(line)
 
     models_text = "\n".join(model_names)
 
-    await callback_query.message.edit_text(
-        f"**Models** (Page {page + 1}/{total_pages})\n\n"
+    title = f"**Models matching** `{query}`" if query else "**Models**"
+    text = (
+        f"{title} (Page {page + 1}/{total_pages})\n\n"
         f"{models_text}\n\n"
-        f"Tap a number to select model.",
-        reply_markup=markup,
+        f"Tap a number to select model."
     )
+    return text, markup
 
 
-@Client.on_callback_query(
-    filters.regex(r"models/\d+")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
-async def models_number_handler(client: Client, callback_query: types.CallbackQuery):
-    """Handle model selection from list via number button"""
-    from app.ai.base import models as get_models
+@router.route("models/<token>/close", owner_only=True)
+async def models_close_handler(
+    client: Client, callback_query: types.CallbackQuery, token: str
+):
+    """Handle close for models list"""
+    await callback_query.message.delete()
+    if callback_query.message.reply_to_message:
+        await callback_query.message.reply_to_message.delete()
 
-    await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    parts = str(callback_query.data).split("/")
 
-    # Kiểm tra định dạng callback data
-    if len(parts) < 2:
-        await callback_query.answer("Internal error!", show_alert=True)
+@router.route("models/<token>/back", owner_only=True)
+@router.route("models/<token>/page/<int:page>", owner_only=True)
+async def models_page_handler(
+    client: Client, callback_query: types.CallbackQuery, token: str, page: int = 0
+):
+    """Handle pagination for models list"""
+    snapshot = callback_state.get(token)
+    if snapshot is None:
+        await expired(callback_query)
         return
 
-    try:
-        model_num = int(parts[1])
-    except ValueError:
-        await callback_query.answer("Internal error!", show_alert=True)
-        return
+    text, markup = render_models_page(token, snapshot, page)
+    await callback_query.message.edit_text(text, reply_markup=markup)
+    await callback_query.answer()
 
-    all_models = await get_models()
-    current_model = await get_model()
 
-    # Build models list - only add current model to top if it's not empty
-    models_list = list(all_models)
-    if current_model and current_model in models_list:
-        models_list.remove(current_model)
-        models_list.insert(0, current_model)
-    elif current_model:
-        # Current model not in all_models list, add it to top
-        models_list.insert(0, current_model)
+@router.route("models/<token>/<int:model_num>", owner_only=True)
+async def models_number_handler(
+    client: Client, callback_query: types.CallbackQuery, token: str, model_num: int
+):
+    """Handle model selection from list via number button"""
+    snapshot = callback_state.get(token)
+    if snapshot is None:
+        await expired(callback_query)
+        return
 
+    models_list = snapshot.items
     if 1 <= model_num <= len(models_list):
+        await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
         model_id = models_list[model_num - 1]
         # Save to database instead of environment variable
         provider = await read_db.get_default_provider()
@@ -1,19 +1,27 @@
-from app.handlers.owner import is_user_owner
-from app.handlers.pagination import ITEMS_PER_PAGE, create_models_keyboard
+from app.handlers.owner import owner_filter
+from app.callbacks import callback_state
+from app.handlers.models_callbacks import render_models_page
 from pyrogram import Client, enums, filters, types
 
 from app.ai.base import get_model
 from app.ai.base import models as get_models
+from app.ai.catalog import catalog
+from app.database.local import local_db as read_db
 
 
 @Client.on_message(
     filters.command("models")
-    & filters.create(lambda _, __, m: is_user_owner(m.from_user.id))  # type: ignore
+    & owner_filter
 )
 async def models_handler(client: Client, message: types.Message, page: int = 0):
-    """List available models with pagination"""
+    """List available models with pagination, or search them with /models <query>"""
 
     await message.reply_chat_action(enums.ChatAction.TYPING)
+    query = " ".join(message.command[1:])
+    if query:
+        await search_models(message, query)
+        return
+
     all_models = await get_models()
     current_model = await get_model()
 
@@ -26,33 +34,32 @@ async def models_handler(client: Client, message: types.Message, page: int = 0):
         # Current model not in all_models list, add it to top
         models_list.insert(0, current_model)
 
-    total_pages = max(1, (len(models_list) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
-    start_idx = page * ITEMS_PER_PAGE
-    end_idx = min(start_idx + ITEMS_PER_PAGE, len(models_list))
-    page_models = models_list[start_idx:end_idx]
+    # Snapshot the list so page and select clicks don't fetch it again
+    token = callback_state.put(models_list, current=current_model)
+    text, markup = render_models_page(token, callback_state.get(token), page)
 
-    markup = create_models_keyboard(
-        models=page_models,
-        page=page,
-        callback_prefix="models",
-        total_pages=total_pages,
-    )
+    await message.reply(text, reply_markup=markup, quote=True)
+
+
+async def search_models(message: types.Message, query: str):
+    """Ranked catalog matches of the default provider, selectable like the full list"""
+    provider = await read_db.get_default_provider()
+    if not provider:
+        await message.reply("No AI provider configured. Use /add_provider to add one.", quote=True)
+        return
+
+    # Make sure the provider's catalog is loaded (fetched if stale) before searching
+    await catalog.entries(provider)
+    matches = await catalog.search(query, provider_id=provider.id)
+    if not matches:
+        await message.reply(f"No models matching `{query}`.", quote=True)
+        return
 
-    # Build message with model names
-    start_num = page * ITEMS_PER_PAGE + 1
-    model_names = []
-    for i, model in enumerate(page_models):
-        num = start_num + i
-        is_selected = model == current_model
-        prefix = "✅ " if is_selected else ""
-        model_names.append(f"`{num}`. {prefix}`{model}`")
-
-    models_text = "\n".join(model_names)
-
-    await message.reply(
-        f"**Models** (Page {page + 1}/{total_pages})\n\n"
-        f"{models_text}\n\n"
-        f"Tap a number to select model.",
-        reply_markup=markup,
-        quote=True,
+    token = callback_state.put(
+        [e.model_id for e in matches],
+        current=await get_model(),
+        query=query,
+        details={e.model_id: e.details for e in matches},
     )
+    text, markup = render_models_page(token, callback_state.get(token), 0)
+    await message.reply(text, reply_markup=markup, quote=True)
@@ -0,0 +1,24 @@
+from app.handlers.owner import owner_filter
+from pyrogram import Client, types
+
+from app.ai.catalog import catalog
+
+
+@Client.on_inline_query(owner_filter)  # type: ignore
+async def models_inline_handler(client: Client, inline_query: types.InlineQuery):
+    """Search models of all providers from any chat: @bot <query>"""
+    query = inline_query.query.strip()
+    matches = await catalog.search(query) if query else []
+
+    results = [
+        types.InlineQueryResultArticle(
+            title=entry.model_id,
+            description=" · ".join(filter(None, (entry.provider_name, entry.details))),
+            input_message_content=types.InputTextMessageContent(
+                f"`{entry.model_id}` ({entry.provider_name})"
+            ),
+            id=f"{entry.provider_id}:{i}",
+        )
+        for i, entry in enumerate(matches)
+    ]
+    await inline_query.answer(results, cache_time=30, is_personal=True)
@@ -1,7 +1,9 @@
-from pyrogram import Client, filters, types
+from pyrogram import Client, types
 
+from app.callbacks import router
 
-@Client.on_callback_query(filters.regex(r"noop"))
+
+@router.route("noop")
 async def noop_handler(client: Client, callback_query: types.CallbackQuery):
     """Handle noop callbacks (do nothing)"""
     await callback_query.answer()
@@ -13,15 +13,13 @@ def verify_password(password: str) -> bool:
     return password == OWNER_PASSWORD
 
 
-def is_user_owner(user_id: int) -> bool:
-    """Check if user is owner (sync wrapper)"""
-    import asyncio
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    return loop.run_until_complete(db.is_owner(user_id))
+async def _is_owner_filter(_, __, update) -> bool:
+    """Filter for messages, callback and inline queries sent by an owner"""
+    return bool(update.from_user) and await db.is_owner(update.from_user.id)
+
+
+# Async, so the check runs on the bot's loop instead of an executor thread
+owner_filter = filters.create(_is_owner_filter)
 
 
 @Client.on_message(filters.command("owner") & filters.private)  # type: ignore
@@ -0,0 +1,104 @@
+import time
+
+from app.handlers.owner import owner_filter
+from pyrogram import Client, filters, types
+
+from app.database.cloud import cloud_db
+from app.database.profiling import MAX_QUERIES, REPEAT_LIMIT, SLOW_QUERY_MS, queries
+from app.sender import send_queue
+from app.watchdog import BLOCK_THRESHOLD, SLOW_HANDLER, watchdog
+from app.workers import workers
+
+TOP_HANDLERS = 8
+TOP_QUERIES = 8
+RECENT_SAMPLES = 5
+MESSAGE_LIMIT = 4000  # Telegram allows 4096 characters
+
+
+def format_overview() -> str:
+    lines = [
+        "**Event loop**",
+        f"lag p50 {watchdog.lag_percentile(0.5) * 1000:.1f} ms · "
+        f"p99 {watchdog.lag_percentile(0.99) * 1000:.1f} ms · "
+        f"max {watchdog.lag_percentile(1.0) * 1000:.1f} ms (last minute)",
+        f"blocked > {BLOCK_THRESHOLD * 1000:.0f} ms: {watchdog.blocks} times",
+        f"send queue {send_queue.depth} · workers {workers.stats()['pending'] or '-'}",
+        "",
+        f"**Handlers** (by total time, top {TOP_HANDLERS})",
+    ]
+    handlers = sorted(watchdog.handlers.items(), key=lambda item: item[1].total, reverse=True)
+    for name, stats in handlers[:TOP_HANDLERS]:
+        lines.append(
+            f"`{name}` {stats.count}× avg {stats.total / stats.count * 1000:.0f} ms · "
+            f"max {stats.max * 1000:.0f} ms · errors {stats.errors}"
+        )
+    if not handlers:
+        lines.append("No handler calls yet.")
+
+    lines += ["", f"**Recent samples** (blocked loop, handlers > {SLOW_HANDLER:g}s)"]
+    recent = list(watchdog.samples)[-RECENT_SAMPLES:]
+    for number, sample in reversed(list(enumerate(recent, len(watchdog.samples) - len(recent) + 1))):
+        ago = time.time() - sample.at
+        lines.append(
+            f"{number}. {sample.kind} {sample.seconds * 1000:.0f} ms, {ago:.0f}s ago: `{sample.name}`"
+        )
+    if not recent:
+        lines.append("None.")
+    else:
+        lines.append("\n`/perf <number>` shows the stack of a sample.")
+    lines.append("`/perf db` shows query statistics.")
+    return "\n".join(lines)
+
+
+def format_queries() -> str:
+    lines = [f"**Queries** (by total time, top {TOP_QUERIES}, slow ≥ {SLOW_QUERY_MS:g} ms)"]
+    for db, fp, totals in queries.top(TOP_QUERIES):
+        lines.append(
+            f"{db} {totals.count}× avg {totals.total / totals.count * 1000:.1f} ms · "
+            f"max {totals.max * 1000:.0f} ms\n`{fp[:200]}`"
+        )
+    if len(lines) == 1:
+        lines.append("No queries yet.")
+
+    lines += [
+        "",
+        f"**Possible N+1** (≥ {MAX_QUERIES} queries or {REPEAT_LIMIT}× one query per handler call)",
+    ]
+    for report in list(queries.reports)[-RECENT_SAMPLES:][::-1]:
+        ago = time.time() - report.at
+        detail = f", {report.repeats}× `{report.repeated[:150]}`" if report.repeated else ""
+        lines.append(f"`{report.handler}` {report.queries} queries{detail}, {ago:.0f}s ago")
+    if not queries.reports:
+        lines.append("None.")
+
+    breaker = cloud_db.breaker
+    lines += [
+        "",
+        f"**Cloud** breaker {breaker.state.replace('_', ' ')} (opened {breaker.opened}×) · "
+        f"outbox {cloud_db.outbox_pending} queued",
+    ]
+    return "\n".join(lines)
+
+
+def format_sample(number: int) -> str:
+    samples = list(watchdog.samples)
+    if not 1 <= number <= len(samples):
+        return f"No sample {number}, there are {len(samples)}."
+    sample = samples[number - 1]
+    header = f"**{sample.kind}** {sample.seconds * 1000:.0f} ms at `{sample.name}`\n"
+    stack = "\n".join(sample.stack)
+    return header + f"```\n{stack[-(MESSAGE_LIMIT - len(header) - 10):]}\n```"
+
+
+@Client.on_message(filters.command("perf") & owner_filter)  # type: ignore
+async def perf_handler(client: Client, message: types.Message):
+    """Show event-loop lag, handler timings and blocking samples.
+    Usage: /perf [sample number | db]"""
+    args = message.command[1:]
+    if args and args[0] == "db":
+        text = format_queries()
+    elif args and args[0].isdigit():
+        text = format_sample(int(args[0]))
+    else:
+        text = format_overview()
+    await send_queue.reply(message, text[:MESSAGE_LIMIT], quote=True)
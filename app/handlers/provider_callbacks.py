@@ -1,15 +1,14 @@
 """Provider callback handler for AI provider management."""
 
-import re
-
-from pyrogram import Client, enums, filters, types
+from pyrogram import Client, enums, types
 from sqlalchemy import select
 
 from app.ai.base import get_provider_models
+from app.ai.catalog import catalog
 from app.database.cloud import cloud_db
 from app.database.local import local_db
+from app.callbacks import Snapshot, callback_state, expired, router
 from app.database.models import AIProvider
-from app.handlers.owner import is_user_owner
 from app.handlers.pagination import (
     ITEMS_PER_PAGE,
     create_models_keyboard,
@@ -21,35 +20,31 @@ write_db = cloud_db
 read_db = local_db
 
 
-@Client.on_callback_query(
-    filters.regex(r"^provider/page/\d+$")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
-async def provider_page_handler(client: Client, callback_query: types.CallbackQuery):
+@router.route("provider/<token>/page/<int:page>", owner_only=True)
+async def provider_page_handler(
+    client: Client, callback_query: types.CallbackQuery, token: str, page: int
+):
     """Handle provider pagination callback"""
-    await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    parts = str(callback_query.data).split("/")
-    page = int(parts[2])
-    await show_providers_list(client, callback_query.message, page, force_cloud=False)
+    await show_providers_list(client, callback_query.message, page, token=token)
     await callback_query.answer()
 
 
-@Client.on_callback_query(
-    filters.regex(r"^provider/back$")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
-async def provider_back_handler(client: Client, callback_query: types.CallbackQuery):
+@router.route("provider/back", owner_only=True)
+@router.route("provider/<token>/back", owner_only=True)
+async def provider_back_handler(
+    client: Client, callback_query: types.CallbackQuery, token: str | None = None
+):
     """Handle back to providers list callback"""
     await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    await show_providers_list(client, callback_query.message, 0, force_cloud=False)
+    await show_providers_list(client, callback_query.message, 0, token=token)
     await callback_query.answer()
 
 
-@Client.on_callback_query(
-    filters.regex(r"^provider/close$")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
-async def provider_close_handler(client: Client, callback_query: types.CallbackQuery):
+@router.route("provider/<token>/close", owner_only=True)
+@router.route("provider_models_select/<token>/close", owner_only=True)
+async def provider_close_handler(
+    client: Client, callback_query: types.CallbackQuery, token: str
+):
     """Handle close providers list callback"""
     await callback_query.message.delete()
     if callback_query.message.reply_to_message:
@@ -57,39 +52,40 @@ async def provider_close_handler(client: Client, callback_query: types.CallbackQ
     await callback_query.answer()
 
 
-@Client.on_callback_query(
-    filters.regex(r"^provider/\d+$")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
-async def provider_number_handler(client: Client, callback_query: types.CallbackQuery):
+@router.route("provider/<token>/<int:provider_num>", owner_only=True)
+async def provider_number_handler(
+    client: Client, callback_query: types.CallbackQuery, token: str, provider_num: int
+):
     """Handle provider number selection callback"""
-    await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    parts = str(callback_query.data).split("/")
-    provider_num = int(parts[1])
-    # Get all providers to calculate which one was selected
-    result = await read_db.execute(select(AIProvider))
-    providers = result.scalars().all()
+    snapshot = callback_state.get(token)
+    if snapshot is None:
+        await expired(callback_query)
+        return
 
-    if 1 <= provider_num <= len(providers):
-        provider = providers[provider_num - 1]
-        # Show provider actions for this specific provider
-        await show_provider_actions(
-            client, callback_query.message, provider, force_cloud=False
-        )
-    else:
+    if not 1 <= provider_num <= len(snapshot.items):
         await callback_query.answer("Invalid provider number!", show_alert=True)
+        return
+
+    await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
+    provider_id, _ = snapshot.items[provider_num - 1]
+    provider = await read_db.get(AIProvider, id=provider_id)
+    if not provider:
+        await callback_query.answer("Provider not found!", show_alert=True)
+        return
+
+    # Show provider actions for this specific provider
+    await show_provider_actions(
+        client, callback_query.message, provider, force_cloud=False
+    )
     await callback_query.answer()
 
 
-@Client.on_callback_query(
-    filters.regex(r"^provider/select/\d+$")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
-async def provider_select_handler(client: Client, callback_query: types.CallbackQuery):
+@router.route("provider/select/<int:provider_id>", owner_only=True)
+async def provider_select_handler(
+    client: Client, callback_query: types.CallbackQuery, provider_id: int
+):
     """Handle provider selection callback"""
     await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    parts = str(callback_query.data).split("/")
-    provider_id = int(parts[2])
 
     result = await read_db.execute(
         select(AIProvider).where(AIProvider.id == provider_id)
@@ -107,15 +103,12 @@ async def provider_select_handler(client: Client, callback_query: types.Callback
     )
 
 
-@Client.on_callback_query(
-    filters.regex(r"^provider/edit/\d+$")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
-async def provider_edit_handler(client: Client, callback_query: types.CallbackQuery):
+@router.route("provider/edit/<int:provider_id>", owner_only=True)
+async def provider_edit_handler(
+    client: Client, callback_query: types.CallbackQuery, provider_id: int
+):
     """Handle provider edit callback"""
     await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    parts = str(callback_query.data).split("/")
-    provider_id = int(parts[2])
 
     result = await read_db.execute(
         select(AIProvider).where(AIProvider.id == provider_id)
@@ -141,15 +134,12 @@ async def provider_edit_handler(client: Client, callback_query: types.CallbackQu
     )
 
 
-@Client.on_callback_query(
-    filters.regex(r"^provider/delete/\d+$")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
-async def provider_delete_handler(client: Client, callback_query: types.CallbackQuery):
+@router.route("provider/delete/<int:provider_id>", owner_only=True)
+async def provider_delete_handler(
+    client: Client, callback_query: types.CallbackQuery, provider_id: int
+):
     """Handle provider delete callback"""
     await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    parts = str(callback_query.data).split("/")
-    provider_id = int(parts[2])
 
     result = await read_db.execute(
         select(AIProvider).where(AIProvider.id == provider_id)
@@ -162,19 +152,18 @@ async def provider_delete_handler(client: Client, callback_query: types.Callback
 
     # Delete provider (write via cloud)
     await write_db.delete(provider)
+    await read_db.replace_provider_models(provider_id, [])
+    catalog.forget(provider_id)
     await callback_query.answer(f"Provider `{provider.name}` deleted!", show_alert=True)
     await show_providers_list(client, callback_query.message, 0, force_cloud=False)
 
 
-@Client.on_callback_query(
-    filters.regex(r"^provider/models_/\d+$")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
-async def provider_models_handler(client: Client, callback_query: types.CallbackQuery):
+@router.route("provider/models_/<int:provider_id>", owner_only=True)
+async def provider_models_handler(
+    client: Client, callback_query: types.CallbackQuery, provider_id: int
+):
     """Handle initial provider models callback"""
     await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    parts = str(callback_query.data).split("/")
-    provider_id = int(parts[2])
 
     result = await read_db.execute(
         select(AIProvider).where(AIProvider.id == provider_id)
@@ -192,45 +181,38 @@ async def provider_models_handler(client: Client, callback_query: types.Callback
     await callback_query.answer()
 
 
-@Client.on_callback_query(
-    filters.regex(r"^provider/models_/\d+/page/\d+$")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
+@router.route("provider_models_select/<token>/page/<int:page>", owner_only=True)
 async def provider_models_page_handler(
-    client: Client, callback_query: types.CallbackQuery
+    client: Client, callback_query: types.CallbackQuery, token: str, page: int
 ):
     """Handle provider models pagination callback"""
-    await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    parts = str(callback_query.data).split("/")
-    provider_id = int(parts[2])
-    page = int(parts[4])
-
-    result = await read_db.execute(
-        select(AIProvider).where(AIProvider.id == provider_id)
-    )
-    provider = result.scalars().first()
-
-    if not provider:
-        await callback_query.answer("Provider not found!", show_alert=True)
+    snapshot = callback_state.get(token)
+    if snapshot is None:
+        await expired(callback_query)
         return
 
-    await show_provider_models(
-        client, callback_query.message, provider.id, provider.name, page
-    )
+    text, markup = render_provider_models_page(token, snapshot, page)
+    await callback_query.message.edit_text(text, reply_markup=markup)
     await callback_query.answer()
 
 
-@Client.on_callback_query(
-    filters.regex(r"^provider/models_/\d+/back$")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
+@router.route("provider/models_/<int:provider_id>/back", owner_only=True)
+@router.route("provider_models_select/<token>/back", owner_only=True)
 async def provider_models_back_handler(
-    client: Client, callback_query: types.CallbackQuery
+    client: Client,
+    callback_query: types.CallbackQuery,
+    provider_id: int | None = None,
+    token: str | None = None,
 ):
     """Handle back from models to provider actions callback"""
+    if token is not None:
+        snapshot = callback_state.get(token)
+        if snapshot is None:
+            await expired(callback_query)
+            return
+        provider_id = snapshot.meta["provider_id"]
+
     await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    parts = str(callback_query.data).split("/")
-    provider_id = int(parts[2])
 
     result = await read_db.execute(
         select(AIProvider).where(AIProvider.id == provider_id)
@@ -248,62 +230,104 @@ async def provider_models_back_handler(
     await callback_query.answer()
 
 
-@Client.on_callback_query(
-    filters.regex(r"^provider_models_select/\d+/\d+$")
-    & filters.create(lambda _, __, cq: is_user_owner(cq.from_user.id))  # type: ignore
-)
+@router.route("provider_models_select/<token>/<int:model_index>", owner_only=True)
 async def provider_models_select_handler(
-    client: Client, callback_query: types.CallbackQuery
+    client: Client, callback_query: types.CallbackQuery, token: str, model_index: int
 ):
     """Handle provider model selection callback"""
-    await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
-    parts = str(callback_query.data).split("/")
-    provider_id = int(parts[1])
-    model_index = int(parts[2])
+    snapshot = callback_state.get(token)
+    if snapshot is None:
+        await expired(callback_query)
+        return
 
-    result = await read_db.execute(
-        select(AIProvider).where(AIProvider.id == provider_id)
-    )
-    provider = result.scalars().first()
+    # Validate model number (1-based indexing)
+    if not 1 <= model_index <= len(snapshot.items):
+        await callback_query.answer("Invalid model number!", show_alert=True)
+        return
 
+    await callback_query.message.reply_chat_action(enums.ChatAction.TYPING)
+    provider = await read_db.get(AIProvider, id=snapshot.meta["provider_id"])
     if not provider:
         await callback_query.answer("Provider not found!", show_alert=True)
         return
 
-    all_models = await get_provider_models(provider=provider)
-
-    # Check if models list is empty
-    if not all_models:
-        await callback_query.answer("No models available!", show_alert=True)
-        return
-
-    # Validate model number (1-based indexing)
-    # Convert from 1-based to 0-based indexing
-    actual_model_index = model_index - 1
-    selected_model = all_models[actual_model_index]
+    selected_model = snapshot.items[model_index - 1]
     # Save selected model to database
     await write_db.set_default_model("chat", provider.name, selected_model)
     await write_db.set_default_provider(provider)
     await callback_query.answer(f"Selected model: `{selected_model}`", show_alert=True)
     await show_provider_actions(client, callback_query.message, provider)
-    await callback_query.answer()
 
 
-async def show_providers_list(
-    client: Client, message: types.Message, page: int = 0, force_cloud: bool = False
-):
-    """Display providers list with pagination."""
+def render_providers_page(
+    token: str, snapshot: Snapshot, page: int
+) -> tuple[str, types.InlineKeyboardMarkup]:
+    """Build text and keyboard for one page of a providers snapshot"""
+    providers_list = snapshot.items
+    default_id = snapshot.meta.get("default_id")
+
+    # Calculate pagination
+    total_pages = max(1, (len(providers_list) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
+    start_idx = page * ITEMS_PER_PAGE
+    end_idx = min(start_idx + ITEMS_PER_PAGE, len(providers_list))
+    page_providers = providers_list[start_idx:end_idx]
+
+    # Create keyboard with numbered buttons
+    markup = create_providers_keyboard(
+        providers=page_providers,
+        page=page,
+        callback_prefix=f"provider/{token}",
+        total_pages=total_pages,
+    )
+
+    # Build message with provider names and numbers
+    start_num = page * ITEMS_PER_PAGE + 1
+    provider_names = []
+    for i, (provider_id, provider_name) in enumerate(page_providers):
+        num = start_num + i
+        prefix = "⭐ " if provider_id == default_id else ""
+        provider_names.append(f"`{num}`. {prefix}`{provider_name}`")
+
+    providers_text = "\n".join(provider_names)
+    text = f"**AI Providers** (Page {page + 1}/{total_pages})\n\n{providers_text}\n\nTap a number to select provider."
+    return text, markup
 
+
+async def snapshot_providers(force_cloud: bool = False) -> str | None:
+    """Snapshot providers list, return its token or None if there are no providers"""
     result = await read_db.execute(select(AIProvider))
     providers = result.scalars().all()
+    if not providers:
+        return None
     # Use cloud database if force_cloud is True to get the latest default provider
     default_provider = await (
         cloud_db.get_default_provider()
         if force_cloud
         else read_db.get_default_provider()
     )
+    return callback_state.put(
+        [(p.id, p.name) for p in providers],
+        default_id=default_provider.id if default_provider else None,
+    )
 
-    if not providers:
+
+async def show_providers_list(
+    client: Client,
+    message: types.Message,
+    page: int = 0,
+    force_cloud: bool = False,
+    token: str | None = None,
+):
+    """Display providers list with pagination.
+
+    With a token, pages through that snapshot; otherwise (or once it expired) lists afresh.
+    """
+    snapshot = callback_state.get(token) if token else None
+    if snapshot is None:
+        token = await snapshot_providers(force_cloud)
+        snapshot = callback_state.get(token) if token else None
+
+    if snapshot is None:
         # Check if this is a reply to a command message
         if hasattr(message, "reply_to_message") and message.reply_to_message:
             await message.reply_to_message.reply(
@@ -318,34 +342,7 @@ async def show_providers_list(
             )
         return
 
-    # Prepare providers list with (id, name) tuples
-    providers_list = [(p.id, p.name) for p in providers]
-
-    # Calculate pagination
-    total_pages = max(1, (len(providers_list) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
-    start_idx = page * ITEMS_PER_PAGE
-    end_idx = min(start_idx + ITEMS_PER_PAGE, len(providers_list))
-    page_providers = providers_list[start_idx:end_idx]
-
-    # Create keyboard with numbered buttons
-    markup = create_providers_keyboard(
-        providers=page_providers,
-        page=page,
-        callback_prefix="provider",
-        total_pages=total_pages,
-    )
-
-    # Build message with provider names and numbers
-    start_num = page * ITEMS_PER_PAGE + 1
-    provider_names = []
-    for i, (provider_id, provider_name) in enumerate(page_providers):
-        num = start_num + i
-        is_default = default_provider and provider_id == default_provider.id
-        prefix = "⭐ " if is_default else ""
-        provider_names.append(f"`{num}`. {prefix}`{provider_name}`")
-
-    providers_text = "\n".join(provider_names)
-    new_text = f"**AI Providers** (Page {page + 1}/{total_pages})\n\n{providers_text}\n\nTap a number to select provider."
+    new_text, markup = render_providers_page(token, snapshot, page)
 
     # Check if message unchanged, skip edit_text call
     if message.text != new_text or str(message.reply_markup) != str(markup):
@@ -467,6 +464,20 @@ async def show_provider_models(
         )
         return
 
+    token = callback_state.put(
+        all_models, provider_id=provider_id, provider_name=provider_name
+    )
+    text, markup = render_provider_models_page(token, callback_state.get(token), page)
+    await message.edit_text(text, reply_markup=markup)
+
+
+def render_provider_models_page(
+    token: str, snapshot: Snapshot, page: int
+) -> tuple[str, types.InlineKeyboardMarkup]:
+    """Build text and keyboard for one page of a provider models snapshot"""
+    all_models = snapshot.items
+    provider_name = snapshot.meta["provider_name"]
+
     total_pages = max(1, (len(all_models) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
     start_idx = page * ITEMS_PER_PAGE
     end_idx = min(start_idx + ITEMS_PER_PAGE, len(all_models))
@@ -476,7 +487,7 @@ async def show_provider_models(
     markup = create_models_keyboard(
         models=page_models,
         page=page,
-        callback_prefix=f"provider_models_select/{provider_id}",
+        callback_prefix=f"provider_models_select/{token}",
         total_pages=total_pages,
     )
 
@@ -489,9 +500,9 @@ async def show_provider_models(
 
     models_text = "\n".join(model_names)
 
-    await message.edit_text(
+    text = (
         f"**Models for {provider_name}** (Page {page + 1}/{total_pages})\n\n"
         f"{models_text}\n\n"
-        f"Tap a number to select model.",
-        reply_markup=markup,
+        f"Tap a number to select model."
     )
+    return text, markup
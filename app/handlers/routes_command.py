@@ -0,0 +1,95 @@
+from app.handlers.owner import owner_filter
+from pyrogram import Client, enums, filters, types
+
+from app.ai.router import router
+from app.database.cloud import cloud_db
+from app.database.local import local_db
+
+# Write to cloud (mirrors to local), read from local (faster)
+write_db = cloud_db
+read_db = local_db
+
+USAGE = (
+    "**Usage:** `/routes <feature> <provider>:<model>[:weight] ... "
+    "[hedge=<seconds>] [timeout=<seconds>]`\n"
+    "`/routes <feature> clear` goes back to the default provider.\n\n"
+    "Example:\n"
+    "`/routes chat oai:gpt-4o-mini:2 groq:llama-3.3-70b-versatile hedge=15`"
+)
+ROUTING_KEYS = ("providers", "hedge_after", "timeout")  # Config keys /routes sets
+
+
+def format_stats() -> str:
+    if not router.stats:
+        return "No requests routed yet."
+    lines = []
+    for name, stats in router.stats.items():
+        p50 = f"{stats.p50:.1f}s" if stats.p50 is not None else "-"
+        p95 = f"{stats.p95:.1f}s" if stats.p95 is not None else "-"
+        health = "✅" if stats.healthy else "⛔"
+        lines.append(
+            f"{health} `{name}` p50 {p50} · p95 {p95} · errors {stats.error_rate:.0%}"
+        )
+    return "\n".join(lines)
+
+
+@Client.on_message(
+    filters.command("routes")
+    & owner_filter
+)
+async def routes_handler(client: Client, message: types.Message):
+    """Show or set provider routes for a feature.
+    Usage: /routes <feature> <provider>:<model>[:weight] ... [hedge=<seconds>] [timeout=<seconds>]
+           /routes <feature> clear"""
+    await message.reply_chat_action(enums.ChatAction.TYPING)
+
+    args = message.text.split()[1:]
+    if len(args) < 2:
+        await message.reply(f"{USAGE}\n\n**Provider stats**\n{format_stats()}", quote=True)
+        return
+
+    feature = args[0]
+    default_model = await read_db.get_default_model(feature)
+    config = dict((default_model.config if default_model else None) or {})
+
+    if args[1:] == ["clear"]:
+        for key in ROUTING_KEYS:
+            config.pop(key, None)
+        await write_db.set_default_model(feature, config=config)
+        await message.reply(f"Routes for `{feature}` cleared, using the default provider.", quote=True)
+        return
+
+    providers = []
+    for arg in args[1:]:
+        try:
+            if arg.startswith("hedge="):
+                config["hedge_after"] = float(arg.split("=", 1)[1])
+                continue
+            if arg.startswith("timeout="):
+                config["timeout"] = float(arg.split("=", 1)[1])
+                continue
+            name, _, rest = arg.partition(":")
+            model, weight = rest, 1.0
+            # Model ids may contain ":" themselves, weight is the last part if numeric
+            head, sep, tail = rest.rpartition(":")
+            if sep and tail.replace(".", "", 1).isdigit():
+                model, weight = head, float(tail)
+        except ValueError:
+            await message.reply(f"Invalid value in `{arg}`.\n\n{USAGE}", quote=True)
+            return
+        if not await read_db.get_provider_by_name(name) or not model:
+            await message.reply(f"Invalid route `{arg}`.", quote=True)
+            return
+        providers.append({"name": name, "model": model, "weight": weight})
+
+    if providers:
+        config["providers"] = providers
+    await write_db.set_default_model(feature, config=config)
+    await message.reply(
+        f"Routes for `{feature}` set:\n"
+        + "\n".join(
+            f"`{p['name']}` → `{p['model']}` (x{p['weight']})"
+            for p in config.get("providers", [])
+        ),
+        quote=True,
+    )
@@ -1,4 +1,4 @@
-from app.handlers.owner import is_user_owner
+from app.handlers.owner import owner_filter
 from pyrogram import Client, enums, filters, types
 
 from app.database.local import local_db as read_db
@@ -6,7 +6,7 @@ from app.database.local import local_db as read_db
 
 @Client.on_message(
     filters.command("setmodel")
-    & filters.create(lambda _, __, m: is_user_owner(m.from_user.id))  # type: ignore
+    & owner_filter
 )
 async def set_model_command_handler(client: Client, message: types.Message):
     """Set default model for features (chat, translate)"""
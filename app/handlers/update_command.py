@@ -1,41 +1,91 @@
 """Update command handler - performs git pull and restarts the application"""
-import subprocess
-import sys
+import asyncio
 import os
 
 from pyrogram import Client, filters, types
-from app.handlers.owner import is_user_owner
+from app.lifecycle import (
+    inflight,
+    restart_in_place,
+    shutdown,
+    start_successor,
+    stop,
+)
+from app.sender import send_queue
+from app.utils import is_owner
+
+GIT_TIMEOUT = 120  # Seconds
+
+
+async def git_pull() -> tuple[int, str, str]:
+    """Run git pull without blocking the event loop"""
+    process = await asyncio.create_subprocess_exec(
+        "git",
+        "pull",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), GIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return -1, "", f"git pull timed out after {GIT_TIMEOUT}s"
+    return process.returncode, stdout.decode(), stderr.decode()
+
 
 @Client.on_message(filters.command("update") & filters.private)  # type: ignore
 async def update_handler(client: Client, message: types.Message):
-    """Handle update command - performs git pull and restarts the application"""
+    """Handle update command - performs git pull and restarts the application.
+    Usage: /update [warm]"""
     # Check if user is owner
-    if not is_user_owner(message.from_user.id):
-        await message.reply("❌ You don't have permission to use this command.", quote=True)
+    if not await is_owner(message.from_user):
+        await send_queue.reply(message, "❌ You don't have permission to use this command.", quote=True)
+        return
+    if inflight.draining:
+        await send_queue.reply(message, "⏳ An update is already in progress.", quote=True)
         return
 
-    await message.reply("🔄 Starting update process...", quote=True)
+    # Warm handoff starts the new process before this one stops
+    warm = "warm" in message.command[1:] or os.environ.get("UPDATE_WARM_HANDOFF") == "1"
+
+    # Awaited so FloodWait and send errors surface here instead of being lost
+    await send_queue.reply(message, "🔄 Starting update process...", quote=True)
 
     try:
         # Perform git pull
-        await message.reply("📥 Pulling latest changes from repository...", quote=True)
-        result = subprocess.run(
-            ["git", "pull"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        await send_queue.reply(message, "📥 Pulling latest changes from repository...", quote=True)
+        returncode, stdout, stderr = await git_pull()
+        if returncode != 0:
+            await send_queue.reply(message, f"❌ Git pull failed:\n```\n{stderr}\n```", quote=True)
+            return
+
+        await send_queue.reply(message, f"📝 Git pull output:\n```\n{stdout}\n```", quote=True)
 
-        await message.reply(f"📝 Git pull output:\n```\n{result.stdout}\n```", quote=True)
+        if warm:
+            await send_queue.reply(message, "🚀 Starting new process...", quote=True)
+            if not await start_successor():
+                await send_queue.reply(
+                    message,
+                    "❌ New process failed to start, still running the current version.",
+                    quote=True,
+                )
+                return
+
+        # Notify user about restart, waits until everything queued before it is sent
+        await send_queue.reply(
+            message,
+            f"🔁 Restarting application to apply updates... "
+            f"(waiting for {inflight.active} running jobs)",
+            quote=True,
+        )
 
-        # Notify user about restart
-        await message.reply("🔁 Restarting application to apply updates...", quote=True)
+        # Wait for running jobs, save unsent messages for the next process
+        await shutdown()
 
-        # Restart the application
-        python = sys.executable
-        os.execl(python, python, *sys.argv)
+        if warm:
+            stop()
+        else:
+            restart_in_place()
 
-    except subprocess.CalledProcessError as e:
-        await message.reply(f"❌ Git pull failed:\n```\n{e.stderr}\n```", quote=True)
     except Exception as e:
-        await message.reply(f"❌ Update failed: {str(e)}", quote=True)
\ No newline at end of file
+        await send_queue.reply(message, f"❌ Update failed: {str(e)}", quote=True)
@@ -0,0 +1,23 @@
+from pyrogram import Client, filters, types
+
+from app.recorder import recorder
+
+
+async def _recording(_, __, ___) -> bool:
+    return recorder.enabled
+
+
+recording = filters.create(_recording)
+
+
+# Lowest group: sees every update before anti-spam can stop it
+@Client.on_message(recording, group=-100)  # type: ignore
+async def record_message(client: Client, message: types.Message):
+    """Write anonymized update metadata when UPDATE_RECORD_FILE is set"""
+    recorder.record(message)
+
+
+@Client.on_callback_query(recording, group=-100)  # type: ignore
+async def record_callback_query(client: Client, callback_query: types.CallbackQuery):
+    """Write anonymized update metadata when UPDATE_RECORD_FILE is set"""
+    recorder.record(callback_query)
@@ -0,0 +1,109 @@
+"""Health and metrics HTTP server, runs on the bot's event loop.
+
+    /         plain "OK", for hosts that only check the port
+    /healthz  liveness: the event loop answers
+    /readyz   readiness: Telegram connected, cloud sync done, databases reachable
+    /metrics  Prometheus metrics (app.metrics)
+"""
+
+import asyncio
+import logging
+import os
+
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import text
+
+from app.client import client
+from app.database.cloud import cloud_db
+from app.database.local import local_db
+from app.lifecycle import inflight
+from app.metrics import CLOUD_DB_BREAKER_OPEN, QUEUE_DEPTH
+from app.sender import send_queue
+from app.workers import workers
+
+logger = logging.getLogger(__name__)
+
+PORT = int(os.environ.get("HEALTH_PORT", "7860"))
+DB_CHECK_TIMEOUT = 3.0  # Seconds before a database counts as unreachable
+
+
+def _ping(engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+class HealthServer:
+    def __init__(self, port: int = PORT):
+        self.port = port
+        self.synced = False
+        self._runner: web.AppRunner | None = None
+
+    async def start(self):
+        """Listen right away, so the port is open during the slow part of startup"""
+        QUEUE_DEPTH.labels("send").set_function(lambda: send_queue.depth)
+        QUEUE_DEPTH.labels("inflight").set_function(lambda: inflight.active)
+        QUEUE_DEPTH.labels("workers").set_function(
+            lambda: sum(workers.stats()["pending"])
+        )
+        QUEUE_DEPTH.labels("cloud_outbox").set_function(lambda: cloud_db.outbox_pending)
+        CLOUD_DB_BREAKER_OPEN.set_function(lambda: cloud_db.breaker.state != "closed")
+
+        app = web.Application()
+        app.router.add_get("/", self.root)
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/readyz", self.readyz)
+        app.router.add_get("/metrics", self.metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        # reuse_port: during a warm /update both processes hold the port for a while
+        try:
+            await web.TCPSite(self._runner, "0.0.0.0", self.port, reuse_port=True).start()
+        except OSError as e:
+            logger.error(f"Health server could not listen on port {self.port}: {e}")
+            return
+        logger.info(f"Health server listening on port {self.port}")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def root(self, request: web.Request):
+        return web.Response(text="OK")
+
+    async def healthz(self, request: web.Request):
+        return web.json_response({"status": "ok"})
+
+    async def _reachable(self, engine) -> bool:
+        try:
+            await asyncio.wait_for(asyncio.to_thread(_ping, engine), DB_CHECK_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Readiness check failed for {engine.url.drivername}: {e!r}")
+            return False
+        return True
+
+    async def readyz(self, request: web.Request):
+        local_ok, cloud_ok = await asyncio.gather(
+            self._reachable(local_db.engine), self._reachable(cloud_db.engine)
+        )
+        checks = {
+            "telegram": bool(client.is_connected),
+            "synced": self.synced,
+            "accepting": not inflight.draining,
+            "local_db": local_ok,
+            "cloud_db": cloud_ok,
+        }
+        return web.json_response(
+            {"ready": all(checks.values()), "checks": checks},
+            status=200 if all(checks.values()) else 503,
+        )
+
+    async def metrics(self, request: web.Request):
+        return web.Response(
+            body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST}
+        )
+
+
+# Global instance
+health_server = HealthServer()
@@ -0,0 +1,33 @@
+"""Shared aiohttp session, created on first use and closed on shutdown."""
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+# Strict limits so a slow upstream can't hold a handler forever
+TIMEOUT = ClientTimeout(total=30, connect=5, sock_read=25)
+MAX_CONNECTIONS = 50
+MAX_CONNECTIONS_PER_HOST = 10
+
+_session: ClientSession | None = None
+
+
+def get_session() -> ClientSession:
+    """Get the long-lived, connection-pooled session"""
+    global _session
+    if _session is None or _session.closed:
+        _session = ClientSession(
+            timeout=TIMEOUT,
+            connector=TCPConnector(
+                limit=MAX_CONNECTIONS,
+                limit_per_host=MAX_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=300,
+            ),
+        )
+    return _session
+
+
+async def close_session():
+    """Close the shared session, called from app lifecycle"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,163 @@
+"""Graceful shutdown and restart.
+
+Long-running work (AI replies, image generation) runs inside
+`inflight.track()`. On /update the bot stops taking new work, waits up
+to DRAIN_TIMEOUT for tracked work to finish, flushes the send queue and
+dumps whatever is still unsent, then restarts in one of two ways:
+
+    cold  re-exec in place (same PID), offline while the new code starts
+    warm  start the new process first. It does the slow part of startup
+          (imports, DB init), signals ready and waits for this process to
+          exit before the cloud sync, which rewrites the shared local.db,
+          and connecting to Telegram. If it dies before it is ready, this
+          process keeps running the old code.
+
+Warm handoff leaves the new process as an orphan, so it needs a
+supervisor that does not track the original PID (not plain Docker CMD).
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+
+from app.http import close_session
+from app.sender import send_queue
+from app.workers import workers
+
+logger = logging.getLogger(__name__)
+
+DRAIN_TIMEOUT = 60.0  # Seconds to wait for running AI and image jobs
+SEND_DRAIN_TIMEOUT = 10.0  # Seconds to wait for queued messages before dumping them
+HANDOFF_TIMEOUT = 180.0  # Seconds the new process gets to become ready
+HANDOFF_PID_ENV = "STARCHATTER_HANDOFF_PID"
+HANDOFF_READY_ENV = "STARCHATTER_HANDOFF_READY"
+
+
+class InFlight:
+    """Count running jobs so shutdown can wait for them"""
+
+    def __init__(self):
+        self.active = 0
+        self.draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @asynccontextmanager
+    async def track(self):
+        self.active += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if self.active == 0:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> int:
+        """Stop new work and wait for running jobs, return how many did not finish"""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.active
+
+
+def restart_command() -> list[str]:
+    # orig_argv keeps "-m app", sys.argv would only have the path of __main__.py
+    return [sys.executable, *sys.orig_argv[1:]]
+
+
+async def shutdown() -> tuple[int, int]:
+    """Drain jobs and sends, persist unsent messages.
+
+    Returns:
+        Jobs still running at the deadline, messages saved for the next process.
+    """
+    unfinished = await inflight.drain(DRAIN_TIMEOUT)
+    if unfinished:
+        logger.warning(f"{unfinished} jobs still running after {DRAIN_TIMEOUT}s, restarting anyway")
+    await send_queue.drain(SEND_DRAIN_TIMEOUT)
+    saved = await send_queue.dump()
+    if saved:
+        logger.info(f"Saved {saved} unsent messages for the next process")
+    await workers.close()
+    await close_session()
+    return unfinished, saved
+
+
+def restart_in_place():
+    """Replace this process with a fresh one (cold restart)"""
+    os.execv(sys.executable, restart_command())
+
+
+def stop():
+    """Stop like on Ctrl+C, main() then stops the client and exits"""
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+async def start_successor() -> bool:
+    """Start the new process and wait until it is ready to take over.
+
+    Returns False (and kills it) if it exits or is not ready in time.
+    """
+    ready_file = os.path.abspath(f".handoff-{os.getpid()}.ready")
+    if os.path.exists(ready_file):
+        os.remove(ready_file)
+
+    env = {
+        **os.environ,
+        HANDOFF_PID_ENV: str(os.getpid()),
+        HANDOFF_READY_ENV: ready_file,
+    }
+    # Plain Popen in its own session: it must outlive this process and its event loop
+    process = subprocess.Popen(restart_command(), env=env, start_new_session=True)
+
+    deadline = time.monotonic() + HANDOFF_TIMEOUT
+    while time.monotonic() < deadline:
+        if os.path.exists(ready_file):
+            os.remove(ready_file)
+            return True
+        if process.poll() is not None:
+            logger.error(f"New process exited with code {process.returncode} before it was ready")
+            return False
+        await asyncio.sleep(0.5)
+
+    logger.error("New process was not ready in time, killing it")
+    process.kill()
+    return False
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+async def handoff_ready():
+    """In a process started by start_successor: signal ready, wait for the old one to exit"""
+    pid = os.environ.pop(HANDOFF_PID_ENV, None)
+    ready_file = os.environ.pop(HANDOFF_READY_ENV, None)
+    if not pid or not ready_file:
+        return
+
+    with open(ready_file, "w"):
+        pass
+    print(f"Ready, waiting for process {pid} to hand over...")
+    # Old process drains for at most DRAIN_TIMEOUT + SEND_DRAIN_TIMEOUT
+    deadline = time.monotonic() + DRAIN_TIMEOUT + SEND_DRAIN_TIMEOUT + 30
+    while _alive(int(pid)) and time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+
+
+# Global instance
+inflight = InFlight()
@@ -3,6 +3,12 @@ from pyrogram import idle
 from app.client import client
 from app.database.cloud import cloud_db
 from app.database.local import local_db
+from app.health import health_server
+from app.lifecycle import handoff_ready, shutdown
+from app.sender import send_queue
+from app.startup import prewarm, profiler
+from app.watchdog import watchdog
+from app.workers import workers
 from app.database.models import (
     AIProvider, DefaultModel, TelegramGroup, TelegramUser,
     TelegramChannel, GroupMember, ChannelMember
@@ -17,11 +23,11 @@ async def sync_cloud_to_local():
     for model in models:
         try:
             # Get all data from cloud
-            result = await cloud_db.execute(select(model))
+            result = await cloud_db.execute(select(model), op="sync_cloud_to_local")
             cloud_objects = result.scalars().all()
 
             # Clear all existing data from local table first
-            await local_db.execute(model.__table__.delete())
+            await local_db.execute(model.__table__.delete(), op="sync_cloud_to_local")
 
             # Insert all cloud data to local, creating fresh instances to avoid session conflicts
             for obj in cloud_objects:
@@ -38,16 +44,51 @@ async def sync_cloud_to_local():
 
 
 async def main():
-    await client.start()
-    cloud_db.init_db()
-    local_db.init_db()
+    watchdog.start()
+    await health_server.start()
+    with profiler.phase("db init"):
+        try:
+            cloud_db.init_db()
+        except Exception as e:
+            print(f"Cloud database init failed: {e!r}")
+        local_db.init_db()
+
+    # Started by /update warm: the old process writes local.db until it exits,
+    # so the sync (which empties and refills it) has to wait for the handoff
+    with profiler.phase("handoff"):
+        await handoff_ready()
 
     # Sync từ cloud về local - gán cloud_db và local_db làm tham số mặc định
     print("Syncing data from cloud to local...")
     # try:
-    await sync_cloud_to_local()
+    with profiler.phase("sync"):
+        # Writes queued while the cloud was down go up first, the sync would overwrite them
+        if not await cloud_db.ping():
+            print("Cloud database unreachable, starting with local data.")
+        elif await cloud_db.flush_outbox():
+            print("Queued writes could not be copied to the cloud, keeping local data.")
+        else:
+            await sync_cloud_to_local()
     # except Exception as e:
     #     print(f"Sync error: {e}")
     print("Sync completed.")
+    health_server.synced = True
+
+    # Workers import their modules while the client connects
+    workers.start()
+    watchdog.instrument(client)
+    # Handler plugins are imported here
+    with profiler.phase("connect"):
+        await client.start()
+    profiler.finish()
+    prewarm()
+
+    restored = send_queue.restore(client)
+    if restored:
+        print(f"Resending {restored} messages left unsent by the previous process.")
     await idle()
+    # Queued messages go out, or are saved for the next start
+    await shutdown()
     await client.stop()
+    await health_server.stop()
+    watchdog.stop()
@@ -0,0 +1,78 @@
+"""Send media by cached Telegram file_id instead of uploading the same bytes again."""
+
+import asyncio
+import hashlib
+import logging
+
+from pyrogram import Client, errors, types
+
+from app.database.local import local_db
+
+logger = logging.getLogger(__name__)
+
+DIGEST_LENGTH = 40  # Hex chars, short enough to fit in callback_data
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()[:DIGEST_LENGTH]
+
+
+async def content_key(path: str) -> str:
+    """Cache key from file content"""
+    return f"file:{await asyncio.to_thread(_file_digest, path)}"
+
+
+def prompt_key(prompt: str, negative_prompt: str, seed: int) -> str:
+    """Cache key for a deterministic generation (same prompt and seed give same image)"""
+    data = "\0".join((str(seed), prompt, negative_prompt)).encode()
+    return f"prompt:{_digest(data)}"
+
+
+async def send_cached_photo(
+    client: Client,
+    chat_id: int | str,
+    photo: str | None = None,
+    keys: list[str] | None = None,
+    **kwargs,
+) -> types.Message | None:
+    """Send photo by cached file_id when any key is known, otherwise upload and remember it.
+
+    Args:
+        photo: Local path to upload on cache miss. If None, only cached file_id is used.
+        keys: Cache keys (e.g. prompt_key). Content hash is added when photo is given.
+
+    Returns:
+        Sent message, or None if photo is None and nothing is cached.
+    """
+    keys = list(keys or [])
+
+    file_id = await local_db.get_media_file_id(*keys)
+    if file_id is None and photo is not None:
+        if not any(key.startswith("file:") for key in keys):
+            keys.insert(0, await content_key(photo))
+            file_id = await local_db.get_media_file_id(keys[0])
+
+    if file_id:
+        try:
+            return await client.send_photo(chat_id, file_id, **kwargs)
+        except (errors.FileReferenceExpired, errors.MediaEmpty, errors.FileIdInvalid) as e:
+            logger.warning(f"Cached file_id rejected, uploading again: {e}")
+            await local_db.forget_media_file_id(file_id)
+
+    if photo is None:
+        return None
+
+    sent = await client.send_photo(chat_id, photo, **kwargs)
+    if sent and sent.photo:
+        await local_db.set_media_file_id(
+            keys, sent.photo.file_id, sent.photo.file_unique_id
+        )
+    return sent
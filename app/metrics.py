@@ -0,0 +1,94 @@
+"""Prometheus metrics of the bot, served on /metrics by app.health.
+
+Metrics live in the process that records them. With worker processes
+enabled, agent runs and image encodes report from the bot process
+(latency, tokens) and DB queries made inside workers are not counted.
+Database metrics are recorded by app.database.profiling.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+HANDLER_SECONDS = Histogram(
+    "starchatter_handler_seconds",
+    "Time spent in update handlers",
+    ["handler"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+HANDLER_ERRORS = Counter(
+    "starchatter_handler_errors_total",
+    "Update handlers that raised",
+    ["handler"],
+)
+QUEUE_DEPTH = Gauge(
+    "starchatter_queue_depth",
+    "Items waiting or running, read at scrape time",
+    ["queue"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "starchatter_db_query_seconds",
+    "SQL statement execution time, by statement type and table",
+    ["db", "statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_EXECUTOR_WAIT_SECONDS = Histogram(
+    "starchatter_db_executor_wait_seconds",
+    "Time a database call waited for a free executor thread",
+    ["db"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+DB_SLOW_QUERIES = Counter(
+    "starchatter_db_slow_queries_total",
+    "Statements slower than SLOW_QUERY_MS",
+    ["db", "statement"],
+)
+DB_UPDATE_QUERIES = Histogram(
+    "starchatter_db_queries_per_update",
+    "Statements run by one handler call",
+    ["handler"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+DB_N_PLUS_ONE = Counter(
+    "starchatter_db_n_plus_one_total",
+    "Handler calls with too many or repeated statements",
+    ["handler"],
+)
+CLOUD_DB_RETRIES = Counter(
+    "starchatter_cloud_db_retries_total",
+    "Cloud database calls retried after a transient error",
+)
+CLOUD_DB_FALLBACKS = Counter(
+    "starchatter_cloud_db_fallbacks_total",
+    "Cloud reads answered from local.db and writes queued in the outbox",
+    ["kind"],
+)
+CLOUD_DB_BREAKER_OPEN = Gauge(
+    "starchatter_cloud_db_breaker_open",
+    "1 while cloud database calls fail fast, read at scrape time",
+)
+LLM_SECONDS = Histogram(
+    "starchatter_llm_seconds",
+    "Duration of one LLM attempt, including tool calls",
+    ["provider", "outcome"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300),
+)
+LLM_TOKENS = Counter(
+    "starchatter_llm_tokens_total",
+    "Tokens used by successful chat runs",
+    ["provider", "kind"],
+)
+LOOP_LAG_SECONDS = Histogram(
+    "starchatter_event_loop_lag_seconds",
+    "How late the event loop wakes a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LOOP_BLOCKS = Counter(
+    "starchatter_event_loop_blocks_total",
+    "Times the event loop was blocked past the watchdog threshold, by code site",
+    ["site"],
+)
+SLOW_HANDLERS = Counter(
+    "starchatter_slow_handlers_total",
+    "Handlers still running past the watchdog threshold",
+    ["handler"],
+)
+
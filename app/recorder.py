@@ -0,0 +1,116 @@
+"""Anonymized update recording for load replay.
+
+With UPDATE_RECORD_FILE set, every incoming message and callback query is
+written as one JSON line of metadata: when it arrived, what kind of
+update it was, who sent it where. Never what it said: texts are kept as
+their length, commands as their name, callback data as the router
+pattern it matched ("provider/<token>/<int:provider_num>").
+
+Chat and user ids are replaced by keyed hashes. The key is random per
+process, so aliases are stable within one recording and cannot be
+mapped back to Telegram ids or joined across recordings. A private
+chat and its user share an alias, as they share an id.
+
+`python -m bench.replay` replays a recording against the handlers with
+stub backends, at 1x-100x speed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+
+from pyrogram import types
+
+from app.callbacks import router
+
+logger = logging.getLogger(__name__)
+
+RECORD_FILE = os.environ.get("UPDATE_RECORD_FILE")  # JSONL output, off when unset
+
+_COMMAND = re.compile(r"[a-z0-9_]{1,32}")
+
+
+class UpdateRecorder:
+    def __init__(self, path: str | None = RECORD_FILE):
+        self.path = path
+        self.recorded = 0
+        self._key = secrets.token_bytes(16)
+        self._start = time.monotonic()
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def alias(self, telegram_id: int | None) -> str | None:
+        if telegram_id is None:
+            return None
+        digest = hashlib.blake2b(str(telegram_id).encode(), key=self._key, digest_size=6)
+        return digest.hexdigest()
+
+    def _base(self, kind: str, chat: types.Chat | None, user: types.User | None) -> dict:
+        return {
+            "t": round(time.monotonic() - self._start, 3),
+            "type": kind,
+            "chat": self.alias(chat.id if chat else None),
+            "chat_type": chat.type.name.lower() if chat and chat.type else None,
+            "user": self.alias(user.id if user else None),
+        }
+
+    def describe_message(self, message: types.Message) -> dict:
+        record = self._base("message", message.chat, message.from_user)
+        text = message.text or message.caption or ""
+        if text.startswith("/"):
+            parts = text[1:].split()
+            name = parts[0].split("@", 1)[0].lower() if parts else ""
+            # Only plain command names, anything else could be user text
+            record["command"] = name if _COMMAND.fullmatch(name) else "other"
+            record["args"] = len(parts) - 1
+        record.update(
+            length=len(text),
+            mentioned=bool(message.mentioned),
+            reply=message.reply_to_message_id is not None,
+            sender_chat=message.sender_chat is not None,
+            media=message.media.name.lower() if message.media else None,
+            service=message.service.name.lower() if message.service else None,
+        )
+        if message.new_chat_members:
+            record["members"] = len(message.new_chat_members)
+            record["bot_joined"] = any(member.is_self for member in message.new_chat_members)
+        return record
+
+    def describe_callback(self, callback_query: types.CallbackQuery) -> dict:
+        message = callback_query.message
+        record = self._base("callback", message.chat if message else None, callback_query.from_user)
+        found = router.match(str(callback_query.data or ""))
+        record["route"] = found[0].pattern if found else None
+        return record
+
+    def record(self, update: types.Message | types.CallbackQuery):
+        if not self.enabled:
+            return
+        if isinstance(update, types.CallbackQuery):
+            record = self.describe_callback(update)
+        else:
+            record = self.describe_message(update)
+        # Unset fields are left out, recordings of busy bots get long
+        line = json.dumps({k: v for k, v in record.items() if v is not None and v is not False})
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "a", buffering=1)
+                self._file.write(line + "\n")
+                self.recorded += 1
+            except OSError as e:
+                logger.warning(f"Update recording to {self.path} failed, disabled: {e}")
+                self.path = None
+
+
+# Global instance
+recorder = UpdateRecorder()
@@ -0,0 +1,311 @@
+"""Outbound message scheduler.
+
+Sends go through one FIFO queue per chat, drained by a worker that
+respects per-chat and global token buckets. FloodWait reschedules the
+send instead of failing the handler, and adjacent small texts to the
+same target are merged into one message.
+
+Pending text sends can be dumped to a JSON file before a restart and
+queued again by the next process.
+"""
+
+import asyncio
+import enum
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from pyrogram import Client, enums, errors, types
+
+from app.tracing import SpanRef, tracer
+
+logger = logging.getLogger(__name__)
+
+MAX_TEXT = 4096  # Telegram message length limit
+GLOBAL_RATE = 25.0  # Messages per second over all chats (limit is ~30)
+PRIVATE_RATE = 1.0  # Messages per second in one private chat
+PRIVATE_BURST = 3
+GROUP_RATE = 20 / 60  # Messages per second in one group (limit is 20/min)
+GROUP_BURST = 5
+STATS_WINDOW = 500  # Recent sends kept for latency percentiles
+PENDING_FILE = "pending_sends.json"  # Unsent texts kept across restarts
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        """Take a token if available, otherwise return seconds until one is"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+@dataclass
+class _Job:
+    func: Callable[..., Any]
+    text: str | None
+    kwargs: dict
+    merge_key: tuple | None
+    futures: list[asyncio.Future] = field(default_factory=list)
+    enqueued: float = field(default_factory=time.monotonic)
+    # chat_id and reply_to_message_id of text sends, None for send_queue.call()
+    target: dict | None = None
+    waiting: bool = True  # Not handed to Telegram yet, safe to persist
+    # The worker runs in its own task, sends are traced under the enqueuing span
+    span: SpanRef | None = field(default_factory=tracer.current)
+
+
+class SendQueue:
+    def __init__(self):
+        self._queues: dict[int, deque[_Job]] = {}
+        self._buckets: dict[int, TokenBucket] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        self._current: dict[int, _Job] = {}
+        self._global = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self._latencies: deque[float] = deque(maxlen=STATS_WINDOW)
+        self.sent = 0
+        self.merged = 0
+        self.flood_waits = 0
+        self.throttle_seconds = 0.0
+
+    # Public API: each call enqueues immediately and returns a future for the sent message,
+    # so several sends keep their order even without awaiting each one.
+
+    def reply(
+        self, message: types.Message, text: str, mergeable: bool = True, **kwargs
+    ) -> asyncio.Future:
+        """Queue message.reply(text, **kwargs). Pieces of one longer text must
+        not be merged back together, send them with mergeable=False."""
+        return self._enqueue(
+            message.chat.id,
+            message.reply,
+            text,
+            kwargs,
+            mergeable=("reply", message.id) if mergeable else None,
+            target={"chat_id": message.chat.id, "reply_to_message_id": message.id},
+        )
+
+    def send_message(self, client, chat_id: int, text: str, **kwargs) -> asyncio.Future:
+        """Queue client.send_message(chat_id, text, **kwargs)"""
+        return self._enqueue(
+            chat_id,
+            lambda t, **kw: client.send_message(chat_id, t, **kw),
+            text,
+            kwargs,
+            mergeable=("send", chat_id),
+            target={"chat_id": chat_id},
+        )
+
+    def call(self, chat_id: int, func: Callable[..., Any], *args, **kwargs) -> asyncio.Future:
+        """Queue any other send (photo, edit, ...) under the chat's rate limit"""
+        return self._enqueue(
+            chat_id, lambda _, **kw: func(*args, **kw), None, kwargs, mergeable=None
+        )
+
+    def _enqueue(self, chat_id, func, text, kwargs, mergeable, target=None) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        merge_key = None
+        if mergeable and text is not None and "reply_markup" not in kwargs:
+            merge_key = (*mergeable, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+        job = _Job(func, text, kwargs, merge_key, [future], target=target)
+        self._queues.setdefault(chat_id, deque()).append(job)
+        worker = self._workers.get(chat_id)
+        if worker is None or worker.done():
+            self._workers[chat_id] = asyncio.create_task(self._worker(chat_id))
+        return future
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = TokenBucket(GROUP_RATE, GROUP_BURST)
+            else:
+                bucket = TokenBucket(PRIVATE_RATE, PRIVATE_BURST)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _merge(self, queue: deque[_Job]) -> _Job:
+        """Pop next job, folding following small texts with the same target into it"""
+        job = queue.popleft()
+        while (
+            job.merge_key is not None
+            and queue
+            and queue[0].merge_key == job.merge_key
+            and len(job.text) + 2 + len(queue[0].text) <= MAX_TEXT
+        ):
+            nxt = queue.popleft()
+            job.text = f"{job.text}\n\n{nxt.text}"
+            job.futures.extend(nxt.futures)
+            self.merged += 1
+        return job
+
+    async def _wait_for_tokens(self, chat_id: int):
+        for bucket in (self._bucket(chat_id), self._global):
+            while (delay := bucket.delay()) > 0:
+                self.throttle_seconds += delay
+                await asyncio.sleep(delay)
+
+    async def _worker(self, chat_id: int):
+        queue = self._queues[chat_id]
+        while queue:
+            job = self._current[chat_id] = self._merge(queue)
+            with tracer.span(
+                "send", parent=job.span, chat_id=chat_id, merged=len(job.futures)
+            ):
+                await self._send(chat_id, job)
+        self._current.pop(chat_id, None)
+        del self._queues[chat_id]
+        self._workers.pop(chat_id, None)
+
+    async def _send(self, chat_id: int, job: _Job):
+        while True:
+            await self._wait_for_tokens(chat_id)
+            job.waiting = False
+            try:
+                result = await job.func(job.text, **job.kwargs)
+            except errors.FloodWait as e:
+                # Reschedule this send, later ones in the chat wait behind it
+                self.flood_waits += 1
+                self.throttle_seconds += e.value
+                logger.warning(f"FloodWait {e.value}s in chat {chat_id}")
+                job.waiting = True
+                await asyncio.sleep(e.value)
+                continue
+            except Exception as e:
+                for future in job.futures:
+                    if not future.done():
+                        future.set_exception(e)
+                break
+            self.sent += 1
+            self._latencies.append(time.monotonic() - job.enqueued)
+            for future in job.futures:
+                if not future.done():
+                    future.set_result(result)
+            break
+
+    async def drain(self, timeout: float) -> int:
+        """Wait up to timeout for queued sends to go out, return how many are left"""
+        workers = [w for w in self._workers.values() if not w.done()]
+        if workers:
+            await asyncio.wait(workers, timeout=timeout)
+        return self.depth
+
+    async def dump(self, path: str = PENDING_FILE) -> int:
+        """Stop sending and write unsent texts to path, return how many were saved"""
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        pending, skipped = [], 0
+        for chat_id, queue in self._queues.items():
+            current = self._current.get(chat_id)
+            # A send already handed to Telegram may have gone through, don't repeat it
+            jobs = ([current] if current and current.waiting else []) + list(queue)
+            for job in jobs:
+                for future in job.futures:
+                    future.cancel()
+                entry = _serialize(job)
+                if entry is None:
+                    skipped += 1
+                else:
+                    pending.append(entry)
+        self._queues.clear()
+        self._current.clear()
+        self._workers.clear()
+
+        if skipped:
+            logger.warning(f"{skipped} queued non-text sends were dropped on shutdown")
+        if pending:
+            await asyncio.to_thread(_write_json, path, pending)
+        return len(pending)
+
+    def restore(self, client: Client, path: str = PENDING_FILE) -> int:
+        """Queue texts saved by dump() in a previous process"""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path) as f:
+                pending = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read pending sends: {e!r}")
+            return 0
+        finally:
+            os.remove(path)
+
+        for entry in pending:
+            kwargs = {k: _decode(v) for k, v in entry["kwargs"].items()}
+            if entry.get("reply_to_message_id"):
+                kwargs.pop("quote", None)
+                kwargs["reply_to_message_id"] = entry["reply_to_message_id"]
+            self.send_message(client, entry["chat_id"], entry["text"], **kwargs)
+        return len(pending)
+
+    @property
+    def depth(self) -> int:
+        """Sends waiting in all chats"""
+        return sum(len(q) for q in self._queues.values())
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def pct(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+        return {
+            "sent": self.sent,
+            "merged": self.merged,
+            "flood_waits": self.flood_waits,
+            "throttle_seconds": round(self.throttle_seconds, 3),
+            "queued": self.depth,
+            "latency_p50": round(pct(0.5), 3),
+            "latency_p95": round(pct(0.95), 3),
+        }
+
+
+def _encode(value):
+    if isinstance(value, enum.Enum):
+        return {"enum": type(value).__name__, "name": value.name}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Can't persist {type(value).__name__}")
+
+
+def _decode(value):
+    if isinstance(value, dict) and "enum" in value:
+        return getattr(enums, value["enum"])[value["name"]]
+    return value
+
+
+def _serialize(job: _Job) -> dict | None:
+    if job.target is None or job.text is None:
+        return None
+    try:
+        kwargs = {k: _encode(v) for k, v in job.kwargs.items()}
+    except TypeError:
+        return None
+    return {**job.target, "text": job.text, "kwargs": kwargs}
+
+
+def _write_json(path: str, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+# Global instance
+send_queue = SendQueue()
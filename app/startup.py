@@ -0,0 +1,177 @@
+"""Startup profiling and background prewarm of heavy dependencies.
+
+Set STARTUP_PROFILE=1 (or pass --profile-startup) to print, once the
+client is connected, how long each startup phase took and an import-time
+tree of every module imported on the way.
+
+After connecting, `prewarm()` imports the heavy AI and media libraries
+in a background thread, so the first /chat or /image doesn't pay for
+them. Set STARTUP_PREWARM=0 to skip it.
+
+This module only uses the standard library, it is imported first.
+"""
+
+import builtins
+import importlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENABLED = os.environ.get("STARTUP_PROFILE") == "1" or "--profile-startup" in sys.argv
+PREWARM_ENABLED = os.environ.get("STARTUP_PREWARM", "1") != "0"
+REPORT_MIN_MS = 5.0  # Imports faster than this are left out of the tree
+REPORT_TOP = 15
+
+# Imported lazily by handlers, loaded here ahead of first use
+PREWARM_MODULES = (
+    "openai",
+    "litellm",
+    "agents",
+    "agents.extensions.models.litellm_model",
+    "app.ai.agent",
+    "langdetect",
+    "gradio_client",
+    "PIL.Image",
+)
+
+
+class _Node:
+    __slots__ = ("name", "total", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.total = 0.0
+        self.children: list[_Node] = []
+
+    @property
+    def self_time(self) -> float:
+        return self.total - sum(child.total for child in self.children)
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.phases: list[tuple[str, float]] = []
+        self._root = _Node("<startup>")
+        self._stack = [self._root]
+        self._thread = threading.get_ident()
+        self._installed = False
+        self._start = time.perf_counter()
+
+    def start(self):
+        """Record imports from now on, until report()"""
+        self._original_import = builtins.__import__
+        # Patched before pyrogram binds it for loading plugins
+        self._original_import_module = importlib.import_module
+        builtins.__import__ = self._import
+        importlib.import_module = self._import_module
+        self._installed = True
+
+    def stop(self):
+        if self._installed:
+            builtins.__import__ = self._original_import
+            importlib.import_module = self._original_import_module
+            self._installed = False
+
+    def _timed(self, name: str, func, *args):
+        # Only first imports cost anything, and only the main thread is traced
+        if name in sys.modules or threading.get_ident() != self._thread:
+            return func(*args)
+        node = _Node(name)
+        self._stack[-1].children.append(node)
+        self._stack.append(node)
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            node.total = time.perf_counter() - start
+            self._stack.pop()
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        full_name = name
+        if level and globals:
+            package = globals.get("__package__") or ""
+            base = package.rsplit(".", level - 1)[0] if level > 1 else package
+            full_name = f"{base}.{name}" if name else base
+        return self._timed(
+            full_name, self._original_import, name, globals, locals, fromlist, level
+        )
+
+    def _import_module(self, name, package=None):
+        full_name = importlib.util.resolve_name(name, package) if name.startswith(".") else name
+        return self._timed(full_name, self._original_import_module, name, package)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self) -> str:
+        lines = ["Startup phases:"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<12} {seconds * 1000:8.1f} ms")
+        lines.append(f"  {'total':<12} {(time.perf_counter() - self._start) * 1000:8.1f} ms")
+
+        lines.append(f"\nImport tree (cumulative ms, >= {REPORT_MIN_MS:g} ms):")
+
+        def walk(node: _Node, depth: int):
+            for child in node.children:
+                if child.total * 1000 >= REPORT_MIN_MS:
+                    lines.append(f"  {child.total * 1000:8.1f}  {'  ' * depth}{child.name}")
+                    walk(child, depth + 1)
+
+        walk(self._root, 0)
+
+        nodes, pending = [], list(self._root.children)
+        while pending:
+            node = pending.pop()
+            nodes.append(node)
+            pending.extend(node.children)
+        lines.append(f"\nSlowest imports by self time (top {REPORT_TOP}):")
+        for node in sorted(nodes, key=lambda n: n.self_time, reverse=True)[:REPORT_TOP]:
+            lines.append(f"  {node.self_time * 1000:8.1f}  {node.name}")
+        return "\n".join(lines)
+
+    def finish(self):
+        """Stop tracing, print the report if profiling is enabled"""
+        self.stop()
+        if PROFILE_ENABLED:
+            print(self.report())
+
+
+def prewarm(modules: tuple[str, ...] = PREWARM_MODULES):
+    """Import heavy modules in a daemon thread"""
+    if not PREWARM_ENABLED:
+        return
+
+    def run():
+        start = time.perf_counter()
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                logger.warning(f"Prewarm of {name} failed: {e!r}")
+        try:
+            # langdetect loads its language profiles on the first detect()
+            from langdetect import detect
+
+            detect("prewarm")
+        except Exception:
+            pass
+        elapsed = time.perf_counter() - start
+        if PROFILE_ENABLED:
+            print(f"Prewarm finished in {elapsed * 1000:.1f} ms")
+
+    threading.Thread(target=run, name="prewarm", daemon=True).start()
+
+
+# Global instance, started by app.__main__ when profiling is enabled
+profiler = StartupProfiler()
@@ -0,0 +1,186 @@
+"""Lightweight span tracing from update to reply.
+
+    with tracer.span("ai.mcp_connect", url=url):
+        ...
+
+The current span lives in a context variable, so it follows awaits,
+`asyncio.create_task` and `asyncio.to_thread`. A span opened with no
+current span starts a new trace (handlers do this, see app.watchdog).
+
+Finished spans go to an in-memory ring of the last TRACES traces
+(`tracer.traces()`) and, with TRACE_FILE set, one JSON line each to
+that file. `scripts/trace_summary.py` reads the file and prints the
+critical path of slow requests.
+
+Work handed to another task or process carries the span explicitly:
+`tracer.current()` before, `tracer.span(..., parent=ref)` or
+`tracer.attach(ref)` on the other side.
+
+This module only uses the standard library.
+"""
+
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE = os.environ.get("TRACE_FILE")  # JSONL export, off when unset
+TRACES = 200  # Traces kept in memory
+
+_ids = itertools.count(1)
+_prefix = f"{os.getpid():x}"
+
+
+def _new_id() -> str:
+    # Unique per process, pid keeps spans from worker processes apart
+    return f"{_prefix}-{next(_ids):x}"
+
+
+@dataclass(frozen=True, slots=True)
+class SpanRef:
+    """Enough of a span to parent spans under it, picklable"""
+
+    trace_id: str
+    span_id: str
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start: float = field(default_factory=time.time)
+    attrs: dict = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def ref(self) -> SpanRef:
+        return SpanRef(self.trace_id, self.span_id)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+_current: ContextVar[Span | SpanRef | None] = ContextVar("current_span", default=None)
+# Set in worker processes, spans are returned to the bot process instead of exported
+_collector: ContextVar[list | None] = ContextVar("span_collector", default=None)
+
+
+class Tracer:
+    def __init__(self, path: str | None = TRACE_FILE):
+        self.path = path
+        self._file = None
+        self._traces: OrderedDict[str, list[dict]] = OrderedDict()
+        # SQL spans are recorded from executor threads
+        self._lock = threading.Lock()
+
+    def current(self) -> SpanRef | None:
+        span = _current.get()
+        return span.ref if isinstance(span, Span) else span
+
+    @contextmanager
+    def span(self, name: str, parent: SpanRef | None = None, **attrs):
+        """Time the block as a child of parent (default: the current span)"""
+        parent = parent or self.current()
+        span = Span(
+            name,
+            parent.trace_id if parent else _new_id(),
+            _new_id(),
+            parent.span_id if parent else None,
+            attrs=attrs,
+        )
+        token = _current.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            _current.reset(token)
+            self._finish(span, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float, **attrs):
+        """Add an already finished child span, e.g. from an event hook"""
+        parent = self.current()
+        if parent is None:
+            return
+        span = Span(
+            name, parent.trace_id, _new_id(), parent.span_id,
+            start=time.time() - seconds, attrs=attrs,
+        )
+        self._finish(span, seconds)
+
+    @contextmanager
+    def attach(self, parent: SpanRef | None):
+        """Continue a trace from another process, yields the spans finished meanwhile"""
+        spans: list[dict] = []
+        token = _current.set(parent)
+        collector_token = _collector.set(spans)
+        try:
+            yield spans
+        finally:
+            _collector.reset(collector_token)
+            _current.reset(token)
+
+    def adopt(self, spans: list[dict]):
+        """Export spans returned by attach() in another process"""
+        for record in spans:
+            self._export(record)
+
+    def _finish(self, span: Span, seconds: float):
+        record = {
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "start": round(span.start, 6),
+            "duration": round(seconds, 6),
+        }
+        if span.attrs:
+            record["attrs"] = span.attrs
+        if span.error:
+            record["error"] = span.error
+        collector = _collector.get()
+        if collector is not None:
+            collector.append(record)
+        else:
+            self._export(record)
+
+    def _export(self, record: dict):
+        with self._lock:
+            self._write(record)
+
+    def _write(self, record: dict):
+        trace = self._traces.get(record["trace_id"])
+        if trace is None:
+            trace = self._traces[record["trace_id"]] = []
+            while len(self._traces) > TRACES:
+                self._traces.popitem(last=False)
+        trace.append(record)
+        if self.path:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "a", buffering=1)
+                self._file.write(json.dumps(record, default=str) + "\n")
+            except OSError as e:
+                logger.warning(f"Trace export to {self.path} failed, disabled: {e}")
+                self.path = None
+
+    def traces(self) -> dict[str, list[dict]]:
+        """Recent traces, oldest first"""
+        with self._lock:
+            return {trace_id: list(spans) for trace_id, spans in self._traces.items()}
+
+
+# Global instance
+tracer = Tracer()
@@ -0,0 +1,233 @@
+"""Event-loop watchdog and handler timing.
+
+A heartbeat task wakes every HEARTBEAT seconds and records how late it
+was (loop lag). A daemon thread watches the heartbeat: when the loop
+has not come back for BLOCK_THRESHOLD, it samples the loop thread's
+stack with `sys._current_frames()`. That is the code blocking the loop,
+caught while it is still blocking.
+
+Handlers are timed from dispatch to return. One still running after
+SLOW_HANDLER seconds gets its await chain sampled (where it is waiting).
+
+Samples are kept in a ring for /perf and counted in app.metrics.
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+
+from app.database.profiling import queries
+from app.metrics import (
+    HANDLER_ERRORS,
+    HANDLER_SECONDS,
+    LOOP_BLOCKS,
+    LOOP_LAG_SECONDS,
+    SLOW_HANDLERS,
+)
+from app.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT = 0.05  # Seconds between heartbeats
+BLOCK_THRESHOLD = float(os.environ.get("WATCHDOG_BLOCK_MS", "200")) / 1000
+SLOW_HANDLER = float(os.environ.get("WATCHDOG_SLOW_HANDLER", "20"))  # Seconds
+SAMPLES = 50  # Samples kept for /perf
+LAG_WINDOW = 1200  # Lag measurements kept for percentiles (one minute)
+STACK_DEPTH = 12  # Frames kept per sample, innermost last
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass(frozen=True, slots=True)
+class Sample:
+    kind: str  # "blocked" or "slow"
+    name: str  # Blocking code site or handler name
+    seconds: float
+    at: float  # Wall clock time
+    stack: tuple[str, ...]
+
+
+class _HandlerStats:
+    __slots__ = ("count", "total", "max", "errors")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+
+def _format_stack(frames: list[tuple[str, int, str]]) -> tuple[str, ...]:
+    return tuple(
+        f"{os.path.relpath(filename) if filename.startswith(_APP_DIR) else filename}:{lineno} {name}"
+        for filename, lineno, name in frames[-STACK_DEPTH:]
+    )
+
+
+def _thread_stack(frame) -> list[tuple[str, int, str]]:
+    return [(f.filename, f.lineno, f.name) for f in traceback.extract_stack(frame)]
+
+
+def _await_stack(coro) -> list[tuple[str, int, str]]:
+    """Frames of a suspended coroutine and everything it awaits, outermost first"""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is not None:
+            frames.append((frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+def _site(frames: list[tuple[str, int, str]]) -> str:
+    """Innermost frame in our own code, the line to fix"""
+    for filename, lineno, name in reversed(frames):
+        if filename.startswith(_APP_DIR) and not filename.endswith("watchdog.py"):
+            return f"{os.path.relpath(filename)}:{lineno} {name}"
+    filename, lineno, name = frames[-1] if frames else ("?", 0, "?")
+    return f"{os.path.basename(filename)}:{lineno} {name}"
+
+
+class Watchdog:
+    def __init__(self):
+        self.samples: deque[Sample] = deque(maxlen=SAMPLES)
+        self.lags: deque[float] = deque(maxlen=LAG_WINDOW)
+        self.handlers: dict[str, _HandlerStats] = {}
+        self.blocks = 0
+        self._beat = time.monotonic()
+        self._loop_thread: int | None = None
+        self._heartbeat_task: asyncio.Task | None = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start the heartbeat and the watcher thread, called from the running loop"""
+        if self._heartbeat_task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(HEARTBEAT)
+            lag = max(0.0, loop.time() - start - HEARTBEAT)
+            self.lags.append(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            self._beat = time.monotonic()
+
+    def _watch(self):
+        blocked_since = None
+        stack: list[tuple[str, int, str]] = []
+        while not self._stopped.wait(HEARTBEAT):
+            beat = self._beat
+            stalled = time.monotonic() - beat
+            if blocked_since is None:
+                if stalled < BLOCK_THRESHOLD:
+                    continue
+                # Sample while it is still blocking
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is None:
+                    continue
+                blocked_since = beat
+                stack = _thread_stack(frame)
+            elif beat != blocked_since:
+                self._blocked(beat - blocked_since - HEARTBEAT, stack)
+                blocked_since = None
+
+    def _blocked(self, seconds: float, frames: list[tuple[str, int, str]]):
+        site = _site(frames)
+        self.blocks += 1
+        LOOP_BLOCKS.labels(site).inc()
+        self.samples.append(Sample("blocked", site, seconds, time.time(), _format_stack(frames)))
+        logger.warning(f"Event loop blocked for {seconds * 1000:.0f} ms at {site}")
+
+    def _slow(self, name: str, task: asyncio.Task, start: float):
+        frames = _await_stack(task.get_coro())
+        seconds = time.perf_counter() - start
+        SLOW_HANDLERS.labels(name).inc()
+        self.samples.append(Sample("slow", name, seconds, time.time(), _format_stack(frames)))
+        logger.warning(f"Handler {name} still running after {seconds:.1f}s at {_site(frames)}")
+
+    def _record(self, name: str, seconds: float, failed: bool):
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = _HandlerStats()
+        stats.count += 1
+        stats.total += seconds
+        stats.max = max(stats.max, seconds)
+        HANDLER_SECONDS.labels(name).observe(seconds)
+        if failed:
+            stats.errors += 1
+            HANDLER_ERRORS.labels(name).inc()
+
+    def timed(self, callback, name: str):
+        """Wrap an async pyrogram handler callback to record its wall time"""
+        if not inspect.iscoroutinefunction(callback):
+            return callback
+
+        @functools.wraps(callback)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            timer = asyncio.get_running_loop().call_later(
+                SLOW_HANDLER, self._slow, name, asyncio.current_task(), start
+            )
+            failed = False
+            update = args[1] if len(args) > 1 else None
+            chat = getattr(update, "chat", None) or getattr(
+                getattr(update, "message", None), "chat", None
+            )
+            try:
+                # Each handler call is the root of a trace
+                with (
+                    tracer.span(f"handler.{name}", chat_id=getattr(chat, "id", None)),
+                    queries.scope(name),
+                ):
+                    return await callback(*args, **kwargs)
+            except Exception as e:
+                # Stop/ContinuePropagation are control flow, not failures
+                failed = type(e).__name__ not in ("StopPropagation", "ContinuePropagation")
+                raise
+            finally:
+                timer.cancel()
+                self._record(name, time.perf_counter() - start, failed)
+
+        return wrapper
+
+    def instrument(self, client):
+        """Time every handler added from now on, called before plugins are loaded"""
+        add_handler = client.add_handler
+
+        def add_timed_handler(handler, group: int = 0):
+            # Pyrofork wraps message and callback handlers to resolve listeners first
+            name = getattr(handler, "original_callback", handler.callback).__name__
+            handler.callback = self.timed(handler.callback, name)
+            return add_handler(handler, group)
+
+        client.add_handler = add_timed_handler
+
+    def lag_percentile(self, p: float) -> float:
+        if not self.lags:
+            return 0.0
+        values = sorted(self.lags)
+        return values[min(len(values) - 1, int(p * len(values)))]
+
+
+# Global instance
+watchdog = Watchdog()
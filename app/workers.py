@@ -0,0 +1,278 @@
+"""Worker processes for CPU-heavy work (agent runs, image encoding, spam scoring).
+
+With WORKER_PROCESSES=N (N > 0) the bot process only ingests updates and
+sends; jobs go to N spawned worker processes over multiprocessing pipes.
+Each worker runs its own event loop, so one worker serves many concurrent
+async jobs (an agent run mostly waits on the LLM) while the CPU parts of
+different jobs run on different cores.
+
+Jobs name their function as "module:function" so workers import it
+themselves. Arguments and results must be picklable. With
+WORKER_PROCESSES=0 (default), before start() and once the pool is closed,
+the same calls run in-process: coroutine functions are awaited, plain functions
+go to a thread. In a worker, plain functions run on one thread of their
+own, off the loop that serves the async jobs.
+"""
+
+import asyncio
+import contextvars
+import importlib
+import inspect
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from multiprocessing.connection import Connection
+from typing import Any, Callable
+
+from app.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES", "0"))
+STOP_TIMEOUT = 5.0  # Seconds a worker gets to exit before it is terminated
+RESPAWN_DELAY = 5.0  # Seconds before restarting a worker that died right after starting
+
+
+class WorkerError(RuntimeError):
+    """Job failed with an exception that could not be sent back as is"""
+
+
+class WorkerDiedError(RuntimeError):
+    """Worker process exited while the job was running"""
+
+
+@lru_cache(maxsize=None)
+def _resolve(target: str) -> Callable[..., Any]:
+    module, _, name = target.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+@dataclass
+class _Worker:
+    index: int
+    process: multiprocessing.Process
+    conn: Connection
+    pending: dict[int, asyncio.Future] = field(default_factory=dict)
+    started: float = field(default_factory=time.monotonic)
+    alive: bool = True
+
+
+class WorkerPool:
+    def __init__(self, processes: int = WORKER_PROCESSES):
+        self.processes = processes
+        self._workers: list[_Worker] = []
+        self._ids = itertools.count()
+        self._closing = False
+
+    @property
+    def enabled(self) -> bool:
+        """Whether jobs go to worker processes: started and not closed"""
+        return self.processes > 0 and bool(self._workers) and not self._closing
+
+    def start(self):
+        """Spawn the workers, called from the running event loop"""
+        if self.processes <= 0 or self._workers or self._closing:
+            return
+        self._workers = [self._spawn(i) for i in range(self.processes)]
+        logger.info(f"Started {self.processes} worker processes")
+
+    def _spawn(self, index: int) -> _Worker:
+        # spawn, not fork: the parent has an event loop, threads and open sockets
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=_worker_main, args=(child_conn,), name=f"worker-{index}", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(index, process, parent_conn)
+        asyncio.get_running_loop().add_reader(parent_conn.fileno(), self._on_readable, worker)
+        return worker
+
+    def _on_readable(self, worker: _Worker):
+        try:
+            while worker.conn.poll():
+                job_id, ok, value, spans = worker.conn.recv()
+                tracer.adopt(spans)
+                future = worker.pending.get(job_id)
+                if future is None or future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+        except (EOFError, OSError):
+            self._replace(worker)
+
+    def _replace(self, worker: _Worker):
+        loop = asyncio.get_running_loop()
+        loop.remove_reader(worker.conn.fileno())
+        worker.alive = False
+        worker.conn.close()
+        for future in worker.pending.values():
+            if not future.done():
+                future.set_exception(WorkerDiedError(f"worker-{worker.index} exited"))
+        worker.pending.clear()
+        if self._closing:
+            return
+        worker.process.join(0.1)
+        logger.error(f"worker-{worker.index} died (exit code {worker.process.exitcode}), restarting")
+        # Don't spin if it crashes on startup (bad import, missing env)
+        delay = RESPAWN_DELAY if time.monotonic() - worker.started < 10 * RESPAWN_DELAY else 0
+        loop.call_later(delay, self._respawn, worker.index)
+
+    def _respawn(self, index: int):
+        if not self._closing:
+            self._workers[index] = self._spawn(index)
+
+    async def run(self, target: str, *args, shard: Any = None, **kwargs) -> Any:
+        """Run target(*args, **kwargs) in a worker and return its result.
+
+        Args:
+            target: "module:function", sync or async.
+            shard: Jobs with the same shard always go to the same worker (for
+                per-process state like anti-spam counters). Otherwise the
+                least busy worker is used.
+        """
+        if not self.enabled:
+            func = _resolve(target)
+            if inspect.iscoroutinefunction(func):
+                return await func(*args, **kwargs)
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+        alive = [w for w in self._workers if w.alive]
+        if not alive:
+            raise WorkerDiedError("every worker process is restarting")
+        if shard is not None:
+            worker = self._workers[hash(shard) % len(self._workers)]
+            if not worker.alive:
+                raise WorkerDiedError(f"worker-{worker.index} is restarting")
+        else:
+            worker = min(alive, key=lambda w: len(w.pending))
+
+        job_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        worker.pending[job_id] = future
+        try:
+            try:
+                worker.conn.send(("run", job_id, target, args, kwargs, tracer.current()))
+            except OSError as e:
+                # Pipe broke before the reader noticed the worker exiting
+                raise WorkerDiedError(f"worker-{worker.index} exited") from e
+            return await future
+        except asyncio.CancelledError:
+            # Lost a hedge race or the caller gave up, stop the job in the worker too
+            if job_id in worker.pending and not worker.conn.closed:
+                try:
+                    worker.conn.send(("cancel", job_id))
+                except OSError:
+                    pass
+            raise
+        finally:
+            worker.pending.pop(job_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "processes": len(self._workers),
+            "pending": [len(w.pending) for w in self._workers],
+        }
+
+    async def close(self):
+        """Stop the workers, later jobs run in-process"""
+        self._closing = True
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            if not worker.alive:
+                continue
+            loop.remove_reader(worker.conn.fileno())
+            try:
+                worker.conn.send(("stop",))
+            except OSError:
+                pass
+        for worker in self._workers:
+            await asyncio.to_thread(worker.process.join, STOP_TIMEOUT)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            if not worker.conn.closed:
+                worker.conn.close()
+            for future in worker.pending.values():
+                if not future.done():
+                    future.set_exception(WorkerDiedError(f"worker-{worker.index} stopped"))
+        self._workers = []
+
+
+def _worker_main(conn: Connection):
+    # Ctrl+C is for the bot process, it stops workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(conn))
+
+
+async def _serve(conn: Connection):
+    loop = asyncio.get_running_loop()
+    stopped = loop.create_future()
+    tasks: dict[int, asyncio.Task] = {}
+    # Plain functions (image encoding, spam checks) would block every agent run
+    # on this loop. One thread keeps their per-process state single-threaded.
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="worker-sync")
+
+    def reply(job_id: int, ok: bool, value: Any, spans: list[dict]):
+        try:
+            conn.send((job_id, ok, value, spans))
+        except Exception:
+            # Result or exception not picklable, pickling fails before anything is written
+            conn.send((job_id, False, WorkerError(f"{type(value).__name__}: {value}"), spans))
+
+    async def run(job_id: int, target: str, args: tuple, kwargs: dict, parent):
+        # Spans of the job go back with the result, under the caller's span
+        with tracer.attach(parent) as spans:
+            try:
+                with tracer.span(f"worker.{target}", pid=os.getpid()):
+                    func = _resolve(target)
+                    if inspect.iscoroutinefunction(func):
+                        result = await func(*args, **kwargs)
+                    else:
+                        # Same context as the span, like asyncio.to_thread()
+                        call = partial(contextvars.copy_context().run, func, *args, **kwargs)
+                        result = await loop.run_in_executor(executor, call)
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                reply(job_id, False, e, spans)
+            else:
+                reply(job_id, True, result, spans)
+            finally:
+                tasks.pop(job_id, None)
+
+    def on_readable():
+        try:
+            while conn.poll():
+                message = conn.recv()
+                if message[0] == "run":
+                    tasks[message[1]] = loop.create_task(run(*message[1:]))
+                elif message[0] == "cancel":
+                    task = tasks.get(message[1])
+                    if task:
+                        task.cancel()
+                elif message[0] == "stop" and not stopped.done():
+                    stopped.set_result(None)
+        except (EOFError, OSError):
+            # Bot process is gone
+            if not stopped.done():
+                stopped.set_result(None)
+
+    loop.add_reader(conn.fileno(), on_readable)
+    await stopped
+    loop.remove_reader(conn.fileno())
+    for task in list(tasks.values()):
+        task.cancel()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global instance
+workers = WorkerPool()
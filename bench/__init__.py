@@ -0,0 +1,21 @@
+"""Offline benchmarks. Run with `python -m bench.<name>` from the repo root.
+
+Importing this package fills in dummy config so `app.config` does not prompt,
+and keeps the bot offline: no worker processes, no remote MCP tools, no
+litellm price map download.
+"""
+
+import os
+
+for _key, _value in {
+    "BOT_TOKEN": "0:bench",
+    "API_ID": "1",
+    "API_HASH": "bench",
+    "TURSO_DB_URL": "sqlite:///bench_cloud.db",
+    "TURSO_AUTH_TOKEN": "",
+    "OWNER_PASSWORD": "bench",
+    "WORKER_PROCESSES": "0",
+    "MCP_TOOLS_URL": "",
+    "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+}.items():
+    os.environ.setdefault(_key, _value)
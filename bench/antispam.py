@@ -0,0 +1,68 @@
+"""Anti-spam throughput on synthetic group traffic.
+
+    python -m bench.antispam [messages]
+
+Traffic is mostly normal chatter from many users over many groups, with
+a few flooding users and a copy-paste raid mixed in.
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from app.antispam import AntiSpam
+
+WORDS = (
+    "the a is of to and in that have it for not on with as you do at this but by from "
+    "they we say her she or an will my one all would there what so up out if about who "
+    "get which go me when make can like time no just him know take people into year good"
+).split()
+SPAM = "join our channel for free crypto signals every day now best pumps guaranteed"
+
+
+def traffic(count: int, groups: int = 200, users: int = 20_000):
+    rng = random.Random(1)
+    now = 0.0
+    raid_users = [rng.randrange(users) for _ in range(30)]
+    for i in range(count):
+        now += 0.0002  # 5000 messages per second
+        roll = rng.random()
+        if roll < 0.01:
+            # One user flooding a group
+            yield -1, 1, " ".join(rng.choices(WORDS, k=6)), 0, 0, now
+        elif roll < 0.02:
+            # Same text from many users, with small edits
+            text = SPAM + " " + rng.choice(("🚀", "!!", "now", ""))
+            yield -2, rng.choice(raid_users), text, 1, 0, now
+        else:
+            text = " ".join(rng.choices(WORDS, k=rng.randint(2, 30)))
+            yield -rng.randrange(3, groups), rng.randrange(users), text, 0, 0, now
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    messages = list(traffic(count))
+    antispam = AntiSpam()
+
+    start = time.perf_counter()
+    for message in messages:
+        antispam.check(*message)
+    elapsed = time.perf_counter() - start
+
+    # Second pass only for memory, tracemalloc slows everything down
+    tracemalloc.start()
+    fresh = AntiSpam()
+    for message in messages:
+        fresh.check(*message)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = antispam.stats()
+    print(f"messages: {count}, flagged: {stats['flagged']}, users tracked: {stats['users']}")
+    print(f"throughput: {count / elapsed:,.0f} messages/s ({elapsed / count * 1e6:.1f} µs each)")
+    print(f"peak memory: {peak / 1e6:.1f} MB ({peak / max(stats['users'], 1):.0f} B per user)")
+
+
+if __name__ == "__main__":
+    main()
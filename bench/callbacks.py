@@ -0,0 +1,96 @@
+"""Callback dispatch: sequential regex filters vs the callback router.
+
+    python -m bench.callbacks [iterations]
+
+Regex filters are awaited one handler at a time like pyrogram's
+dispatcher does (filters.regex is an async filter). Owner checks are not
+included: the old chain ran a DB lookup in an executor thread for the
+matched handler, the router runs one awaited lookup per owner route.
+"""
+
+import asyncio
+import random
+import re
+import sys
+import time
+
+from app.callbacks import CallbackRouter
+
+# (regex used by the old handlers, router pattern), in old registration order
+ROUTES = [
+    (r"models/close", "models/close"),
+    (r"models/page/", "models/page/<int:page>"),
+    (r"models/\d+", "models/<int:model_num>"),
+    (r"noop", "noop"),
+    (r"^provider/page/\d+$", "provider/page/<int:page>"),
+    (r"^provider/back$", "provider/back"),
+    (r"^provider/close$", "provider/close"),
+    (r"^provider/\d+$", "provider/<int:provider_num>"),
+    (r"^provider/select/\d+$", "provider/select/<int:provider_id>"),
+    (r"^provider/edit/\d+$", "provider/edit/<int:provider_id>"),
+    (r"^provider/delete/\d+$", "provider/delete/<int:provider_id>"),
+    (r"^provider/models_/\d+$", "provider/models_/<int:provider_id>"),
+    (r"^provider/models_/\d+/page/\d+$", "provider/models_/<int:provider_id>/page/<int:page>"),
+    (r"^provider/models_/\d+/back$", "provider/models_/<int:provider_id>/back"),
+    (r"^provider_models_select/\d+/\d+$", "provider_models_select/<int:provider_id>/<int:model_index>"),
+    (r"setmodel/", "setmodel/model/<feature>/<int:provider_id>/<path:model_name>"),
+    (r"menu/", "menu/<action>"),
+]
+
+SAMPLES = [
+    "models/page/3",
+    "models/42",
+    "noop",
+    "provider/7",
+    "provider/models_/2/page/4",
+    "provider_models_select/2/118",
+    "setmodel/model/chat/1/openai/gpt-4o-mini",
+    "menu/anti_spam",
+]
+
+
+async def _handler(*args, **kwargs):
+    pass
+
+
+async def regex_filter(pattern: re.Pattern, data: str) -> bool:
+    return bool(pattern.search(data))
+
+
+async def regex_dispatch(patterns: list[re.Pattern], data: list[str]):
+    # Pyrogram awaits each handler's filter in order until one passes
+    for item in data:
+        for pattern in patterns:
+            if await regex_filter(pattern, item):
+                break
+
+
+async def router_dispatch(router: CallbackRouter, data: list[str]):
+    for item in data:
+        router.match(item)
+
+
+def measure(coro, iterations: int) -> float:
+    start = time.perf_counter()
+    asyncio.run(coro)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    patterns = [re.compile(regex) for regex, _ in ROUTES]
+    router = CallbackRouter()
+    for _, pattern in ROUTES:
+        router.add(pattern, _handler)
+
+    data = [random.choice(SAMPLES) for _ in range(iterations)]
+
+    regex = measure(regex_dispatch(patterns, data), iterations)
+    routed = measure(router_dispatch(router, data), iterations)
+    print(f"iterations: {iterations}, routes: {len(ROUTES)}")
+    print(f"sequential regex: {regex * 1e9:8.0f} ns/callback")
+    print(f"callback router:  {routed * 1e9:8.0f} ns/callback")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Handler latency and correctness with a slow or failing cloud database.
+
+    python -m bench.cloud_faults [--profiles none,wan,slow,flaky,down]
+        [--scenarios models,provider_callbacks,chat_private,join] [--updates 100]
+
+Runs bench.handlers scenarios once per app.database.faults profile. The
+cloud database is a SQLite file behind the fault injector, the local one
+is untouched, so the gap between profiles is what Turso costs.
+
+Per profile and scenario: msgs/s, p50/p99 latency and the share of
+updates that failed (no handler ran because a filter raised, a handler
+raised, an expected button never showed up), plus how often the
+circuit breaker opened and how many writes went to the outbox. After
+each profile the faults are switched off, the outbox is flushed and the
+mirrored tables are compared: cloud rows missing or different in
+local.db are writes whose mirror was lost (local-only rows, like groups
+seen in join events, are expected).
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+
+from sqlalchemy import select
+
+from bench.fakes import Dispatcher, FakeClient
+from bench.handlers import SCENARIOS, Bench, run_scenario, seed
+from bench.stub_llm import StubLLM
+
+from app.database.cloud import cloud_db
+from app.database.cloud.breaker import CircuitBreaker
+from app.database.faults import PROFILES, cloud_faults, parse_profile
+from app.database.local import local_db
+from app.database.models import AIProvider, DefaultModel, TelegramGroup, TelegramUser
+
+MIRRORED = [AIProvider, DefaultModel, TelegramUser, TelegramGroup]
+DEFAULT_PROFILES = "none,lan,wan,slow,flaky,down"
+DEFAULT_SCENARIOS = "models,provider_callbacks,chat_private,join"
+
+
+def reset_cloud():
+    """Fresh pool and breaker, so one profile's broken state does not leak into the next"""
+    cloud_db.engine.dispose()
+    cloud_db.breaker = CircuitBreaker()
+
+
+def _rows(engine, model) -> set[tuple]:
+    columns = [column.name for column in model.__table__.columns]
+    with engine.connect() as conn:
+        return {
+            tuple(repr(row._mapping[name]) for name in columns)
+            for row in conn.execute(select(model.__table__))
+        }
+
+
+async def recover() -> tuple[int, int]:
+    """Switch faults off, flush the outbox, return (rows left queued, drift):
+    cloud rows of the mirrored tables that local.db lacks or has different"""
+    cloud_faults.profile = PROFILES["none"]
+    reset_cloud()
+    left = await cloud_db.flush_outbox()
+    drift = sum(
+        len(_rows(cloud_db.engine, model) - _rows(local_db.engine, model))
+        for model in MIRRORED
+    )
+    return left, drift
+
+
+async def run(args) -> None:
+    stub = StubLLM(args.llm_latency)
+    # Seeded with no faults, the engine connects through the injector from here on
+    cloud_faults.profile = PROFILES["none"]
+    await seed(await stub.start())
+
+    client = FakeClient()
+    bench = Bench(client, Dispatcher().load_plugins(), stub)
+    print(f"{'scenario':<22}{'msgs/s':>9}{'p50 ms':>9}{'p99 ms':>10}{'failed':>9}")
+    try:
+        for profile in args.profiles:
+            reset_cloud()
+            cloud_faults.profile = profile
+            cloud_faults.stats.clear()
+            print(f"\n{profile.name}")
+            for name in args.scenarios:
+                result = await run_scenario(bench, name, args.updates, args.concurrency)
+                failed = result["failed"] / result["updates"] if result["updates"] else 0.0
+                print(
+                    f"  {name:<20}{result['rate']:>9.1f}"
+                    f"{result['p50'] * 1000:>9.0f}{result['p99'] * 1000:>10.0f}{failed:>9.1%}"
+                )
+                if args.verbose:
+                    for error, count in result["errors"].most_common(3):
+                        print(f"    ! {count}x {error[:160]}")
+            stats = cloud_faults.stats
+            queued = cloud_db.outbox_pending
+            print(
+                f"  cloud: {stats['statements']} statements, {stats['connects']} connects, "
+                f"{stats['errors']} errors, {stats['drops']} drops, "
+                f"{stats['delay_seconds']:.1f}s delay · breaker opened {cloud_db.breaker.opened}x"
+            )
+            left, drift = await recover()
+            print(
+                f"  after recovery: {queued} queued writes, {left} still queued, "
+                f"{drift} rows missing in local"
+            )
+    finally:
+        client.close()
+        await stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", default=DEFAULT_PROFILES, help=f"names from {', '.join(PROFILES)} or specs")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help=f"from {', '.join(SCENARIOS)}")
+    parser.add_argument("--updates", type=int, default=100, help="updates per scenario and profile")
+    parser.add_argument("--concurrency", type=int, default=1, help="updates handled at once")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds to first token")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the most common errors")
+    args = parser.parse_args()
+    # Specs contain commas themselves, separate them with ";"
+    separator = ";" if ";" in args.profiles else ","
+    try:
+        args.profiles = [parse_profile(spec.strip()) for spec in args.profiles.split(separator)]
+    except ValueError as e:
+        parser.error(str(e))
+    args.scenarios = args.scenarios.split(",")
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name}, choose from {', '.join(SCENARIOS)}")
+
+    logging.basicConfig(level=logging.CRITICAL)
+    # local.db and the cloud stand-in go here
+    os.chdir(tempfile.mkdtemp(prefix="starchatter-faults-"))
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Synthetic Telegram updates and a fake client for driving the real handlers.
+
+`FakeClient` answers every Bot API method the handlers call: sends and
+edits return a `types.Message` (kept in `messages`, so benchmarks can
+press the buttons of the last reply), everything else returns True.
+Calls are counted and can be given a fixed latency.
+
+`Dispatcher` loads app/handlers the way `Client.load_plugins` does and
+dispatches like pyrogram: per group in order, the first handler whose
+filters pass runs, StopPropagation ends the update.
+"""
+
+import asyncio
+import inspect
+import itertools
+import logging
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from pathlib import Path
+
+import pyrogram
+from pyrogram import enums, handlers, types
+from pyrogram.handlers.handler import Handler
+
+logger = logging.getLogger(__name__)
+
+BOT_ID = 7000000001
+HANDLERS_DIR = Path(__file__).resolve().parent.parent / "app" / "handlers"
+
+# Which update type each handler type receives
+UPDATE_TYPES = {
+    handlers.MessageHandler: types.Message,
+    handlers.CallbackQueryHandler: types.CallbackQuery,
+    handlers.InlineQueryHandler: types.InlineQuery,
+    handlers.ChatJoinRequestHandler: types.ChatJoinRequest,
+}
+
+# Methods whose result is the sent or edited message
+_SENDS = ("send_", "edit_message_", "copy_message", "forward_messages")
+_NOT_SENDS = {"send_chat_action", "send_reaction"}  # Return True, not a message
+RECENT = 20  # Bot messages remembered per chat, newest last
+
+
+class FakeClient:
+    def __init__(self, latency: float = 0.0):
+        self.me = types.User(
+            id=BOT_ID, is_self=True, is_bot=True, first_name="StarChatter", username="starchatter_bot"
+        )
+        self.loop = asyncio.get_running_loop()
+        # Pyrogram runs sync filters here
+        self.executor = ThreadPoolExecutor(4, thread_name_prefix="fake-client")
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self.messages: dict[int, types.Message] = {}  # Last version of every bot message
+        self.chats: dict[int, types.Chat] = {}
+        self.replies: dict[int, int] = {}  # Incoming message id -> id of the bot's reply
+        self._recent: dict[int, deque[int]] = {}
+        self._message_ids = itertools.count(1)
+        self._query_ids = itertools.count(1)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def method(*args, **kwargs):
+            self.calls[name] += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if name.startswith(_SENDS) and name not in _NOT_SENDS:
+                return self._sent(name, *args, **kwargs)
+            if name == "get_chat_member":
+                return types.ChatMember(
+                    client=self,
+                    status=enums.ChatMemberStatus.MEMBER,
+                    user=self.user(kwargs.get("user_id", args[1] if len(args) > 1 else 0)),
+                )
+            if name == "get_me":
+                return self.me
+            return True
+
+        return method
+
+    def get_listener_matching_with_data(self, data, listener_type):
+        """No conversation listeners (client.listen) in benchmarks"""
+        return None
+
+    def _sent(self, name: str, chat_id=None, text=None, *args, **kwargs) -> types.Message:
+        chat_id = kwargs.get("chat_id", chat_id)
+        text = kwargs.get("text", kwargs.get("caption", text))
+        message_id = kwargs.get("message_id")
+        if not name.startswith("edit_") or message_id is None:
+            message_id = next(self._message_ids)
+        previous = self.messages.get(message_id)
+        reply_to = kwargs.get("reply_to_message_id") or getattr(previous, "reply_to_message_id", None)
+        message = types.Message(
+            client=self,
+            id=message_id,
+            chat=self.chat(chat_id),
+            from_user=self.me,
+            text=text if text is not None else getattr(previous, "text", None),
+            reply_markup=kwargs.get("reply_markup"),
+            reply_to_message_id=reply_to,
+            outgoing=True,
+        )
+        if previous is None:
+            self._recent.setdefault(message.chat.id, deque(maxlen=RECENT)).append(message_id)
+        self.messages[message_id] = message
+        if reply_to is not None:
+            self.replies.setdefault(reply_to, message_id)
+        return message
+
+    def bot_message(self, chat_id: int, text: str, **kwargs) -> types.Message:
+        """A message the bot sent earlier, without counting an API call"""
+        return self._sent("send_message", chat_id, text, **kwargs)
+
+    def recent(self, chat_id: int) -> list[types.Message]:
+        """Bot messages in chat_id, newest first"""
+        return [self.messages[i] for i in reversed(self._recent.get(chat_id, ()))]
+
+    def reply_to(self, message: types.Message) -> types.Message | None:
+        """Current version of the bot's first reply to message"""
+        message_id = self.replies.get(message.id)
+        return self.messages.get(message_id) if message_id is not None else None
+
+    # Update factories
+
+    def user(self, user_id: int, name: str = "Bench") -> types.User:
+        return types.User(
+            client=self, id=user_id, first_name=name, last_name=str(user_id), username=f"bench{user_id}"
+        )
+
+    def chat(
+        self, chat_id: int, title: str | None = None, chat_type: enums.ChatType | None = None
+    ) -> types.Chat:
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            if chat_type is None:
+                chat_type = enums.ChatType.PRIVATE if chat_id > 0 else enums.ChatType.SUPERGROUP
+            chat = self.chats[chat_id] = types.Chat(
+                client=self,
+                id=chat_id,
+                type=chat_type,
+                title=title or (None if chat_id > 0 else f"Bench group {-chat_id}"),
+                first_name="Bench" if chat_id > 0 else None,
+            )
+        return chat
+
+    def message(
+        self,
+        chat_id: int,
+        user: types.User,
+        text: str | None = None,
+        mentioned: bool = False,
+        **kwargs,
+    ) -> types.Message:
+        """Incoming message from user in chat_id (positive: private, negative: group)"""
+        return types.Message(
+            client=self,
+            id=next(self._message_ids),
+            chat=self.chat(chat_id),
+            from_user=user,
+            text=text,
+            mentioned=mentioned,
+            outgoing=False,
+            **kwargs,
+        )
+
+    def private_message(self, user: types.User, text: str) -> types.Message:
+        return self.message(user.id, user, text)
+
+    def group_message(
+        self, chat_id: int, user: types.User, text: str, mentioned: bool = False
+    ) -> types.Message:
+        if mentioned:
+            text = f"@{self.me.username} {text}"
+        return self.message(chat_id, user, text, mentioned=mentioned)
+
+    def new_members(
+        self, chat_id: int, inviter: types.User, members: list[types.User]
+    ) -> types.Message:
+        return self.message(chat_id, inviter, new_chat_members=members, service=enums.MessageServiceType.NEW_CHAT_MEMBERS)
+
+    def callback_query(
+        self, user: types.User, message: types.Message, data: str
+    ) -> types.CallbackQuery:
+        return types.CallbackQuery(
+            client=self,
+            id=str(next(self._query_ids)),
+            from_user=user,
+            chat_instance=str(message.chat.id),
+            message=message,
+            data=data,
+        )
+
+    def buttons(self, message: types.Message) -> list[str]:
+        """Callback data of the inline buttons of message"""
+        markup = message.reply_markup
+        if not isinstance(markup, types.InlineKeyboardMarkup):
+            return []
+        return [
+            button.callback_data
+            for row in markup.inline_keyboard
+            for button in row
+            if button.callback_data
+        ]
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class Dispatcher:
+    def __init__(self):
+        self.groups: dict[int, list[Handler]] = {}
+        self.errors: Counter[str] = Counter()
+
+    def load_plugins(self, root: Path = HANDLERS_DIR):
+        """Same discovery as Client.load_plugins: every `.handlers` attribute of every module"""
+        for path in sorted(root.rglob("*.py")):
+            module_path = ".".join(("app", "handlers", *path.relative_to(root).with_suffix("").parts))
+            module = import_module(module_path)
+            for name in vars(module).keys():
+                try:
+                    for handler, group in getattr(module, name).handlers:
+                        if isinstance(handler, Handler) and isinstance(group, int):
+                            self.groups.setdefault(group, []).append(handler)
+                except Exception:
+                    pass
+        self.groups = dict(sorted(self.groups.items()))
+        return self
+
+    async def dispatch(self, client: FakeClient, update) -> list[str]:
+        """Run update through the handlers, return the names of the ones whose filters passed"""
+        ran = []
+        try:
+            for group in self.groups.values():
+                for handler in group:
+                    if not isinstance(update, UPDATE_TYPES.get(type(handler), ())):
+                        continue
+                    name = getattr(handler, "original_callback", handler.callback).__name__
+                    try:
+                        if not await handler.check(client, update):
+                            continue
+                    except Exception as e:
+                        self.errors[f"filter of {name}: {e!r}"] += 1
+                        continue
+                    ran.append(name)
+                    try:
+                        if inspect.iscoroutinefunction(handler.callback):
+                            await handler.callback(client, update)
+                        else:
+                            await client.loop.run_in_executor(
+                                client.executor, handler.callback, client, update
+                            )
+                    except pyrogram.StopPropagation:
+                        raise
+                    except pyrogram.ContinuePropagation:
+                        continue
+                    except Exception as e:
+                        self.errors[f"{name}: {e!r}"] += 1
+                        logger.debug("Handler failed", exc_info=True)
+                    break
+        except pyrogram.StopPropagation:
+            pass
+        return ran
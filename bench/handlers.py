@@ -0,0 +1,315 @@
+"""Handler throughput on synthetic updates, fully offline.
+
+    python -m bench.handlers [scenario ...] [--updates 200] [--concurrency 20]
+        [--llm-latency 0.2] [--tokens-per-second 0] [--api-latency 0]
+
+Real handlers (loaded like the bot loads its plugins) get fake pyrogram
+Messages and CallbackQuerys through bench.fakes. The chat model is
+bench.stub_llm, both databases are SQLite files in a temp directory
+(TURSO_DB_URL points the cloud client at one) and MCP tools are off.
+
+Scenarios:
+    chat_private        private messages to the chatbot
+    chat_long           private messages with a reply over one Telegram message,
+                        checks that its chunks join back to the model's text
+    chat_group          mentions in groups (anti-spam runs first)
+    models              /models from an owner
+    provider_callbacks  /providers, then provider -> models -> select buttons
+    join                bot added to groups, users joining them
+
+Each update is one sample: msgs/s over the scenario, p50/p99 latency from
+dispatch to handler return, and SQL statements per update (both
+databases, filters included). Send rate limits are lifted unless
+--telegram-limits is given, so the numbers show the bot and not the
+Telegram pacing. With WORKER_PROCESSES=N agent runs and spam checks go
+to N worker processes, like in the bot.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from bench.fakes import Dispatcher, FakeClient
+from bench.stub_llm import MODELS, StubLLM
+
+from app import sender
+from app.database.cloud import cloud_db
+from app.database.local import local_db
+from app.workers import workers
+from app.database.models import AIProvider
+from app.database.profiling import queries
+from app.sender import TokenBucket, send_queue
+
+OWNER_ID = 500
+USER_BASE = 100_000  # Private chat users
+USERS = 1_000
+GROUP_BASE = 1_000_000_000  # Group ids are negative
+GROUPS = 50
+WARMUP = 5  # Updates per scenario before measuring
+LONG_REPLY = 4050  # Characters, a full 4000-character chunk and a short tail
+
+# Buttons pressed after /providers, in order
+PROVIDER_CLICKS = [
+    re.compile(r"^provider/[^/]+/1$"),  # First provider
+    re.compile(r"^provider/models_/\d+$"),  # Its models
+    re.compile(r"^provider_models_select/[^/]+/1$"),  # First model, written through cloud
+]
+
+
+class Bench:
+    def __init__(self, client: FakeClient, dispatcher: Dispatcher, stub: StubLLM):
+        self.client = client
+        self.dispatcher = dispatcher
+        self.stub = stub
+        self.scenario = ""
+        self.latencies: list[float] = []
+        self.queries: list[int] = []
+        self.unhandled = 0
+        self.missing_buttons = 0
+        self.garbled_replies = 0
+        self.recording = True
+
+    def reset(self, scenario: str):
+        self.scenario = scenario
+        self.latencies.clear()
+        self.queries.clear()
+        self.unhandled = 0
+        self.missing_buttons = 0
+        self.garbled_replies = 0
+        self.stub.reply_chars = 0
+        self.dispatcher.errors.clear()
+        self.client.calls.clear()
+
+    async def dispatch(self, update):
+        start = time.perf_counter()
+        with queries.scope(f"bench.{self.scenario}") as scope:
+            ran = await self.dispatcher.dispatch(self.client, update)
+        if not self.recording:
+            return
+        self.latencies.append(time.perf_counter() - start)
+        self.queries.append(sum(scope.fingerprints.values()))
+        if not ran:
+            self.unhandled += 1
+
+    async def click(self, user, message, pattern: re.Pattern) -> bool:
+        """Press the first button of message whose callback data matches"""
+        data = next((d for d in self.client.buttons(message) if pattern.search(d)), None)
+        if data is None:
+            self.missing_buttons += 1
+            return False
+        await self.dispatch(self.client.callback_query(user, message, data))
+        return True
+
+
+# Scenarios: one call produces one or more updates
+
+
+async def chat_private(bench: Bench, i: int):
+    user = bench.client.user(USER_BASE + i % USERS)
+    await bench.dispatch(bench.client.private_message(user, f"Hello, how are you? ({i})"))
+
+
+async def chat_long(bench: Bench, i: int):
+    client = bench.client
+    bench.stub.reply_chars = LONG_REPLY
+    message = client.private_message(client.user(USER_BASE + i % USERS), f"Tell me everything ({i})")
+    await bench.dispatch(message)
+    chunks = [m.text for m in reversed(client.recent(message.chat.id)) if m.reply_to_message_id == message.id]
+    if len(chunks) != 2 or "".join(chunks) != bench.stub.reply_text():
+        bench.garbled_replies += 1
+
+
+async def chat_group(bench: Bench, i: int):
+    user = bench.client.user(USER_BASE + i % USERS)
+    chat_id = -(GROUP_BASE + i % GROUPS)
+    await bench.dispatch(
+        bench.client.group_message(chat_id, user, f"what do you think about {i}?", mentioned=True)
+    )
+
+
+async def models(bench: Bench, i: int):
+    owner = bench.client.user(OWNER_ID, "Owner")
+    await bench.dispatch(bench.client.private_message(owner, "/models"))
+
+
+async def provider_callbacks(bench: Bench, i: int):
+    client = bench.client
+    owner = client.user(OWNER_ID, "Owner")
+    command = client.private_message(owner, "/providers")
+    await bench.dispatch(command)
+    for pattern in PROVIDER_CLICKS:
+        # The list is edited in place, press buttons of its current version
+        listing = client.reply_to(command)
+        if listing is None or not await bench.click(owner, listing, pattern):
+            break
+
+
+async def join(bench: Bench, i: int):
+    client = bench.client
+    inviter = client.user(USER_BASE + i % USERS)
+    if i % 2 == 0:
+        # Bot added to a new group
+        chat_id = -(GROUP_BASE + GROUPS + i)
+        await bench.dispatch(client.new_members(chat_id, inviter, [client.me]))
+    else:
+        # Someone joining a group the bot is in
+        chat_id = -(GROUP_BASE + GROUPS + i - 1)
+        await bench.dispatch(client.new_members(chat_id, inviter, [client.user(USER_BASE + USERS + i)]))
+
+
+SCENARIOS = {
+    "chat_private": chat_private,
+    "chat_long": chat_long,
+    "chat_group": chat_group,
+    "models": models,
+    "provider_callbacks": provider_callbacks,
+    "join": join,
+}
+
+
+async def seed(llm_url: str):
+    """Stub provider as the chat default and one owner, written through the cloud client"""
+    cloud_db.init_db()
+    local_db.init_db()
+    await cloud_db.add(AIProvider(name="stub", base_url=llm_url, api_key="bench", models=MODELS))
+    provider = await local_db.get_provider_by_name("stub")
+    await cloud_db.set_default_provider(provider)
+    await cloud_db.set_default_model("chat", provider.name, MODELS[0])
+    await cloud_db.add_owner(user_id=OWNER_ID, username="owner", full_name="Bench Owner")
+
+
+def lift_send_limits():
+    sender.PRIVATE_RATE = sender.PRIVATE_BURST = 1e9
+    sender.GROUP_RATE = sender.GROUP_BURST = 1e9
+    send_queue._global = TokenBucket(1e9, 1e9)
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+async def run_scenario(bench: Bench, name: str, updates: int, concurrency: int) -> dict:
+    scenario = SCENARIOS[name]
+    bench.reset(name)
+    bench.recording = False
+    for i in range(WARMUP):
+        await scenario(bench, -1 - i)
+    await send_queue.drain(5)
+    bench.reset(name)
+    bench.recording = True
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await scenario(bench, i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(updates)))
+    elapsed = time.perf_counter() - start
+    await send_queue.drain(5)
+
+    count = len(bench.latencies)
+    handler_errors = sum(
+        n for error, n in bench.dispatcher.errors.items() if not error.startswith("filter of ")
+    )
+    return {
+        "updates": count,
+        "rate": count / elapsed if elapsed else 0.0,
+        "p50": percentile(bench.latencies, 0.5),
+        "p99": percentile(bench.latencies, 0.99),
+        "queries": sum(bench.queries) / count if count else 0.0,
+        "max_queries": max(bench.queries, default=0),
+        "api_calls": sum(bench.client.calls.values()) / count if count else 0.0,
+        "unhandled": bench.unhandled,
+        "missing_buttons": bench.missing_buttons,
+        "garbled_replies": bench.garbled_replies,
+        "errors": Counter(bench.dispatcher.errors),
+        # Updates that should have been handled and were not, or failed
+        "failed": bench.unhandled + bench.missing_buttons + bench.garbled_replies + handler_errors,
+    }
+
+
+async def run(args) -> int:
+    stub = StubLLM(args.llm_latency, args.llm_jitter, args.tokens_per_second)
+    llm_url = await stub.start()
+    await seed(llm_url)
+    if not args.telegram_limits:
+        lift_send_limits()
+
+    workers.start()
+    client = FakeClient(args.api_latency)
+    bench = Bench(client, Dispatcher().load_plugins(), stub)
+    print(
+        f"updates {args.updates} · concurrency {args.concurrency} · "
+        f"LLM {args.llm_latency * 1000:.0f} ms first token"
+        + (f", {args.tokens_per_second:g} tokens/s" if args.tokens_per_second else "")
+        + f" · API {args.api_latency * 1000:.0f} ms\n"
+    )
+    print(
+        f"{'scenario':<20}{'updates':>8}{'msgs/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+        f"{'queries':>9}{'max':>5}{'api':>6}"
+    )
+    failed = 0
+    try:
+        for name in args.scenarios:
+            result = await run_scenario(bench, name, args.updates, args.concurrency)
+            print(
+                f"{name:<20}{result['updates']:>8}{result['rate']:>9.1f}"
+                f"{result['p50'] * 1000:>9.1f}{result['p99'] * 1000:>9.1f}"
+                f"{result['queries']:>9.1f}{result['max_queries']:>5}{result['api_calls']:>6.1f}"
+            )
+            problems = []
+            if result["unhandled"]:
+                problems.append(f"{result['unhandled']} updates matched no handler")
+            if result["missing_buttons"]:
+                problems.append(f"{result['missing_buttons']} expected buttons not found")
+            if result["garbled_replies"]:
+                problems.append(f"{result['garbled_replies']} long replies not sent as their two chunks")
+            for error, count in result["errors"].most_common(3):
+                problems.append(f"{count}x {error[:200]}")
+            for problem in problems:
+                print(f"  ! {problem}")
+            failed += bool(problems)
+    finally:
+        client.close()
+        await workers.close()
+        await stub.stop()
+    print(f"\nstub LLM served {stub.requests} completions")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default all)")
+    parser.add_argument("--updates", type=int, default=200, help="updates per scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="updates in flight")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="0 sends all tokens at once")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="seconds per Telegram API call")
+    parser.add_argument("--telegram-limits", action="store_true", help="keep the send queue rate limits")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show handler logs")
+    args = parser.parse_args()
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name}, choose from {', '.join(SCENARIOS)}")
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    # local.db, the cloud stand-in and conversations.sqlite all go here
+    os.chdir(tempfile.mkdtemp(prefix="starchatter-bench-"))
+    sys.exit(1 if asyncio.run(run(args)) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Resident memory of the database clients over a long run of new users.
+
+    python -m bench.memory [--users 1000000] [--concurrency 8] [--report-every 50000]
+
+Simulates what the bot does for every user it meets, straight against
+cloud_db and local_db (SQLite files in a temp directory, no handlers or
+Telegram fakes, so a million users fit in one run):
+
+    owner check        cloud_db.is_owner()
+    chatbot listener   local_db.get(TelegramUser), cloud_db.add() if new
+    join event         local_db.add_group_member() in one of GROUPS groups
+    returning user     local_db.get_user() of a random user seen before
+
+RSS is printed every --report-every users. With a session per call it
+should stay flat once SQLite's page cache and SQLAlchemy's statement
+cache are warm; anything that keeps loaded objects around (an identity
+map living as long as the process) shows up as steady growth. Exits 1
+if RSS grew more than --max-growth MB between the first report and the
+end. SQLite runs with synchronous=OFF here, fsyncs would only slow the
+run down. Expect a few hundred users/s, so the full million takes a
+while; --users 100000 already shows the trend.
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from app.database.cloud import cloud_db
+from app.database.local import local_db
+from app.database.models import TelegramUser
+
+USER_BASE = 100_000
+GROUP_BASE = 1_000_000_000
+GROUPS = 500
+
+
+def rss_mb() -> float:
+    """Current resident set size, peak RSS where /proc is not available"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _no_sync(dbapi_connection, _):
+    dbapi_connection.execute("PRAGMA synchronous=OFF")
+
+
+async def visit(i: int):
+    user_id = USER_BASE + i
+    await cloud_db.is_owner(user_id)
+    if await local_db.get(TelegramUser, id=user_id) is None:
+        await cloud_db.add(TelegramUser(id=user_id, first_name=f"user {i}"))
+    await local_db.add_group_member(user_id, -(GROUP_BASE + i % GROUPS))
+    if i:
+        await local_db.get_user(USER_BASE + random.randrange(i))
+
+
+async def run(args) -> int:
+    for engine in (local_db.engine, cloud_db.engine):
+        event.listen(engine, "connect", _no_sync)
+    cloud_db.init_db()
+    local_db.init_db()
+
+    next_user = 0
+    done = 0
+
+    async def worker():
+        nonlocal next_user, done
+        while next_user < args.users:
+            i = next_user
+            next_user += 1
+            await visit(i)
+            done += 1
+
+    print(f"{'users':>10}{'RSS MB':>10}{'growth':>10}{'users/s':>10}")
+    first = None
+    start = last = time.perf_counter()
+    last_done = 0
+    workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+    while not all(w.done() for w in workers):
+        await asyncio.wait(workers, timeout=0.5)
+        if done - last_done < args.report_every and not all(w.done() for w in workers):
+            continue
+        gc.collect()
+        now, rss = time.perf_counter(), rss_mb()
+        first = rss if first is None else first
+        print(f"{done:>10}{rss:>10.1f}{rss - first:>+10.1f}{(done - last_done) / (now - last):>10.0f}")
+        last, last_done = now, done
+    for w in workers:
+        w.result()
+
+    growth = rss_mb() - first
+    print(f"\n{done} users in {time.perf_counter() - start:.0f}s, RSS grew {growth:+.1f} MB")
+    if growth > args.max_growth:
+        print(f"More than {args.max_growth:g} MB, something keeps loaded rows alive")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--concurrency", type=int, default=8, help="users handled at once")
+    parser.add_argument("--report-every", type=int, default=50_000, help="users between RSS samples")
+    parser.add_argument("--max-growth", type=float, default=32.0, help="MB of RSS growth that fails the run")
+    args = parser.parse_args()
+
+    # Slow query warnings are expected, SQLite serializes the writers
+    logging.basicConfig(level=logging.ERROR)
+    # local.db and the cloud stand-in go here
+    os.chdir(tempfile.mkdtemp(prefix="starchatter-memory-"))
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Hot-path reads: ORM instances against app.database.dto read models.
+
+    python -m bench.reads [--iterations 5000] [--users 10000]
+
+Seeds local.db in a temp directory, then times each lookup the bot does
+per update both ways:
+
+    provider            get_provider_by_name()         get_provider_info()
+    default provider    get_default_provider()         get_default_provider_info()
+    default model       get_default_model()            get_default_model_info()
+    group flags         get_group()                    get_group_info()
+    user                get_user()                     get_user_info()
+
+"load" is the query and object construction alone, in one thread with
+one session (what the executor thread does). "call" is the awaited
+client method, including the hop to the executor and back. The memory
+table loads every user both ways and reports bytes per object held.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import fields
+
+from sqlalchemy import select
+
+from app.database.dto import DefaultModelInfo, GroupInfo, ProviderInfo, UserInfo, columns, lookup
+from app.database.local import local_db
+from app.database.local.client import DEFAULT_PROVIDER_INFO
+from app.database.models import AIProvider, DefaultModel, TelegramGroup, TelegramUser
+
+USER_BASE = 100_000
+GROUP_BASE = 1_000_000_000
+GROUPS = 100
+PROVIDERS = 20
+
+
+def seed(users: int):
+    local_db.init_db()
+    with local_db._get_session() as s:
+        s.add_all(
+            AIProvider(
+                name=f"provider{i}",
+                base_url=f"http://127.0.0.1:{8000 + i}/v1",
+                api_key="sk-bench",
+                models=[f"model-{j}" for j in range(10)],
+            )
+            for i in range(PROVIDERS)
+        )
+        s.add_all(
+            [
+                DefaultModel(feature="default_provider", provider_name="provider3"),
+                DefaultModel(feature="chat", provider_name="provider3", model="model-1", config={}),
+            ]
+        )
+        s.add_all(
+            TelegramUser(id=USER_BASE + i, username=f"user{i}", first_name=f"User {i}")
+            for i in range(users)
+        )
+        s.add_all(
+            TelegramGroup(id=-(GROUP_BASE + i), title=f"Group {i}") for i in range(GROUPS)
+        )
+        s.commit()
+
+
+def _orm(model, **filters):
+    return lambda s: s.scalars(select(model).filter_by(**filters)).first()
+
+
+def _core(info, statement, **params):
+    def load(s):
+        row = s.execute(statement, params).first()
+        return info(*row) if row else None
+
+    return load
+
+
+def _orm_default_provider(s):
+    default = s.scalars(select(DefaultModel).filter_by(feature="default_provider")).first()
+    return s.scalars(select(AIProvider).filter_by(name=default.provider_name)).first()
+
+
+def cases(users: int) -> list[tuple]:
+    """(name, orm load, dto load, orm call, dto call)"""
+    user_id = USER_BASE + users // 2
+    group_id = -(GROUP_BASE + GROUPS // 2)
+    return [
+        (
+            "provider",
+            _orm(AIProvider, name="provider7"),
+            _core(ProviderInfo, lookup(ProviderInfo, AIProvider, "name"), name="provider7"),
+            lambda: local_db.get_provider_by_name("provider7"),
+            lambda: local_db.get_provider_info("provider7"),
+        ),
+        (
+            "default provider",
+            _orm_default_provider,
+            _core(ProviderInfo, DEFAULT_PROVIDER_INFO),
+            local_db.get_default_provider,
+            local_db.get_default_provider_info,
+        ),
+        (
+            "default model",
+            _orm(DefaultModel, feature="chat"),
+            _core(DefaultModelInfo, lookup(DefaultModelInfo, DefaultModel, "feature"), feature="chat"),
+            lambda: local_db.get_default_model("chat"),
+            lambda: local_db.get_default_model_info("chat"),
+        ),
+        (
+            "group flags",
+            _orm(TelegramGroup, id=group_id),
+            _core(GroupInfo, lookup(GroupInfo, TelegramGroup, "id"), id=group_id),
+            lambda: local_db.get_group(group_id),
+            lambda: local_db.get_group_info(group_id),
+        ),
+        (
+            "user",
+            _orm(TelegramUser, id=user_id),
+            _core(UserInfo, lookup(UserInfo, TelegramUser, "id"), id=user_id),
+            lambda: local_db.get_user(user_id),
+            lambda: local_db.get_user_info(user_id),
+        ),
+    ]
+
+
+def time_load(load, iterations: int) -> float:
+    """Microseconds per load, a fresh session each time like the clients use"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with local_db._get_session() as s:
+            load(s)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def time_call(call, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await call()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def held_bytes(load_all) -> tuple[float, int]:
+    """Bytes allocated per object kept alive after loading, and the object count"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    with local_db._get_session() as s:
+        objects = load_all(s)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    held = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return held / len(objects), len(objects)
+
+
+async def run(args) -> int:
+    seed(args.users)
+    print(f"{args.iterations} iterations, {args.users} users\n")
+    print(f"{'lookup':<18}{'ORM load':>10}{'DTO load':>10}{'ORM call':>10}{'DTO call':>10}   µs")
+    for name, orm_load, dto_load, orm_call, dto_call in cases(args.users):
+        # Same answer both ways
+        with local_db._get_session() as s:
+            orm, dto = orm_load(s), dto_load(s)
+        assert dto == await dto_call(), name
+        assert all(getattr(orm, f.name) == getattr(dto, f.name) for f in fields(dto)), name
+        print(
+            f"{name:<18}{time_load(orm_load, args.iterations):>10.1f}"
+            f"{time_load(dto_load, args.iterations):>10.1f}"
+            f"{await time_call(orm_call, args.iterations):>10.1f}"
+            f"{await time_call(dto_call, args.iterations):>10.1f}"
+        )
+
+    orm_bytes, count = held_bytes(lambda s: s.scalars(select(TelegramUser)).all())
+    statement = select(*columns(UserInfo, TelegramUser))
+    dto_bytes, _ = held_bytes(lambda s: [UserInfo(*row) for row in s.execute(statement)])
+    print(f"\n{count} users held: ORM {orm_bytes:.0f} B/object, DTO {dto_bytes:.0f} B/object")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000, help="lookups per case and variant")
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args()
+
+    # local.db goes here
+    os.chdir(tempfile.mkdtemp(prefix="starchatter-reads-"))
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""Replay a recorded update stream against the handlers, at 1x-100x speed.
+
+    python -m bench.replay updates.jsonl --speed 10 [--llm-latency 1.5]
+    python -m bench.replay updates.jsonl --describe
+
+Recordings come from the bot with UPDATE_RECORD_FILE set (app.recorder):
+anonymized metadata only. Each record becomes a synthetic update of the
+same shape (chat type, sender, command, mention, text length, media,
+join, callback route) and is queued at its recorded time divided by
+--speed. Like pyrogram, --workers tasks take updates off that queue.
+
+Backends are stubs: the fake client stands in for Telegram, bench.stub_llm
+for the model, SQLite files for Turso. Outbound sends keep the real
+send-queue pacing unless --no-send-limits is given.
+
+Every --interval seconds a line shows offered and handled updates/s,
+the update queue (dispatcher saturated), LLM calls in flight (AI
+saturated), SQL statements/s and send queue depth (send path saturated).
+The summary has latency from arrival to handler return per update kind.
+
+Users who ran owner commands or pressed owner buttons in the recording
+are made owners, so those paths are replayed past the owner check.
+Commands that call external services (/image, /poem) or restart the
+bot (/update) are skipped and counted.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from pyrogram import Client, enums
+
+from bench.fakes import Dispatcher, FakeClient
+from bench.handlers import GROUP_BASE, USER_BASE, lift_send_limits, percentile, seed
+from bench.stub_llm import MODELS, StubLLM
+
+from app.callbacks import router
+from app.database.cloud import cloud_db
+from app.database.profiling import queries
+from app.sender import send_queue
+
+OWNER_COMMANDS = {"add_provider", "addmodel", "models", "perf", "providers", "routes", "setmodel"}
+SKIPPED_COMMANDS = {"image", "poem", "update"}
+FILLER = "the quick brown fox jumps over the lazy dog while the bot thinks about it "
+BURST_WINDOW = 5.0  # Seconds, for callback bursts in --describe
+
+
+def load(path: str, limit: int | None = None) -> list[dict]:
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+                if limit and len(records) >= limit:
+                    break
+    records.sort(key=lambda r: r.get("t", 0.0))
+    return records
+
+
+def label(record: dict) -> str:
+    """Update kind used for the summary rows"""
+    if record["type"] == "callback":
+        return "callback"
+    if record.get("command"):
+        return f"/{record['command']}"
+    if record.get("service"):
+        return record["service"]
+    if record.get("chat_type") == "private":
+        return "private"
+    return "mention" if record.get("mentioned") else "group"
+
+
+def is_group(record: dict) -> bool:
+    return record.get("chat_type") in ("group", "supergroup")
+
+
+def describe(records: list[dict]):
+    """Traffic shape of a recording"""
+    if not records:
+        print("Empty recording.")
+        return
+    duration = records[-1].get("t", 0.0) - records[0].get("t", 0.0)
+    per_second = Counter(int(r.get("t", 0.0)) for r in records)
+    print(
+        f"{len(records)} updates over {duration:.0f}s · "
+        f"avg {len(records) / max(duration, 1):.1f}/s · peak {max(per_second.values())}/s"
+    )
+
+    kinds = Counter(label(r) for r in records)
+    print("\nupdate kinds")
+    for kind, count in kinds.most_common(15):
+        print(f"  {count:>8}  {count / len(records):6.1%}  {kind}")
+
+    group_messages = [r for r in records if r["type"] == "message" and is_group(r)]
+    if group_messages:
+        mentioned = sum(1 for r in group_messages if r.get("mentioned"))
+        print(f"\nmention rate in groups: {mentioned / len(group_messages):.1%} of {len(group_messages)} messages")
+
+    senders = defaultdict(set)
+    for r in group_messages:
+        if r.get("user"):
+            senders[r["chat"]].add(r["user"])
+    if senders:
+        sizes = [len(users) for users in senders.values()]
+        print(
+            f"groups: {len(sizes)} · active senders per group "
+            f"p50 {percentile(sizes, 0.5):.0f} · p90 {percentile(sizes, 0.9):.0f} · max {max(sizes)}"
+        )
+
+    callbacks = [r for r in records if r["type"] == "callback"]
+    if callbacks:
+        routes = Counter(r.get("route") or "(unmatched)" for r in callbacks)
+        burst = 0
+        recent = defaultdict(list)
+        for r in callbacks:
+            times = recent[r.get("user")]
+            times.append(r.get("t", 0.0))
+            while times[0] < times[-1] - BURST_WINDOW:
+                times.pop(0)
+            burst = max(burst, len(times))
+        print(f"\ncallbacks: {len(callbacks)} · largest burst {burst} from one user in {BURST_WINDOW:g}s")
+        for route, count in routes.most_common(10):
+            print(f"  {count:>8}  {route}")
+
+
+class Replay:
+    def __init__(self, client: FakeClient, dispatcher: Dispatcher):
+        self.client = client
+        self.dispatcher = dispatcher
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.ids: dict[str, int] = {}
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.waits: list[float] = []
+        self.query_counts: dict[str, list[int]] = defaultdict(list)
+        self.offered = 0
+        self.handled = 0
+        self.unhandled = 0
+        self.skipped: Counter[str] = Counter()
+        self.synthesized = 0  # Callbacks with no matching button on screen
+        self._window: list[float] = []
+
+    # Aliases -> fake ids, groups negative like Telegram's
+
+    def user_id(self, alias: str) -> int:
+        if alias not in self.ids:
+            self.ids[alias] = USER_BASE + len(self.ids)
+        return self.ids[alias]
+
+    def chat_id(self, record: dict) -> int:
+        alias = record.get("chat")
+        if record.get("chat_type") == "private" and alias:
+            return self.user_id(alias)
+        if alias not in self.ids:
+            self.ids[alias] = -(GROUP_BASE + len(self.ids))
+        chat_id = self.ids[alias]
+        chat_type = enums.ChatType[record["chat_type"].upper()] if record.get("chat_type") else None
+        self.client.chat(chat_id, chat_type=chat_type)
+        return chat_id
+
+    def owners(self, records: list[dict]) -> set[int]:
+        owner_routes = {route.pattern for route in router.routes if route.owner_only}
+        return {
+            self.user_id(r["user"])
+            for r in records
+            if r.get("user")
+            and (r.get("command") in OWNER_COMMANDS or r.get("route") in owner_routes)
+        }
+
+    # Records -> updates
+
+    def update(self, record: dict):
+        chat_id = self.chat_id(record)
+        user = self.client.user(self.user_id(record["user"])) if record.get("user") else None
+        if record["type"] == "callback":
+            return self._callback(record, chat_id, user)
+
+        command = record.get("command")
+        if command in SKIPPED_COMMANDS:
+            self.skipped[f"/{command}"] += 1
+            return None
+        if command:
+            text = f"/{command}" + " arg" * record.get("args", 0)
+        else:
+            length = record.get("length", 0)
+            text = (FILLER * (length // len(FILLER) + 1))[:length]
+            if record.get("mentioned") and is_group(record):
+                text = f"@{self.client.me.username} {text}"
+
+        kwargs = {}
+        if record.get("media"):
+            kwargs["media"] = enums.MessageMediaType[record["media"].upper()]
+            kwargs["caption"], text = text or None, None
+        if record.get("service"):
+            kwargs["service"] = enums.MessageServiceType[record["service"].upper()]
+            text = None
+        if record.get("members"):
+            members = [
+                self.client.user(self.user_id(f"{record.get('t')}-{i}"))
+                for i in range(record["members"] - bool(record.get("bot_joined")))
+            ]
+            if record.get("bot_joined"):
+                members.append(self.client.me)
+            kwargs["new_chat_members"] = members
+        if record.get("sender_chat"):
+            # Anonymous admin, posting as the group itself
+            kwargs["sender_chat"], user = self.client.chat(chat_id), None
+        return self.client.message(
+            chat_id, user, text, mentioned=bool(record.get("mentioned")), **kwargs
+        )
+
+    def _callback(self, record: dict, chat_id: int, user):
+        route = record.get("route")
+        # Press a button the bot actually showed in that chat, snapshot tokens and all
+        for message in self.client.recent(chat_id):
+            for data in self.client.buttons(message):
+                found = router.match(data)
+                if found and found[0].pattern == route:
+                    return self.client.callback_query(user, message, data)
+
+        # Nothing on screen: made-up values, token routes take the expired path
+        self.synthesized += 1
+        data = "/".join(
+            "1" if segment.startswith("<int:")
+            else MODELS[0] if segment.startswith("<path:")
+            else "~replay" if segment.startswith("<")
+            else segment
+            for segment in (route or "noop").split("/")
+        )
+        message = self.client.bot_message(chat_id, "Replayed list")
+        return self.client.callback_query(user, message, data)
+
+    # Feeding and handling
+
+    async def feed(self, records: list[dict], speed: float):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        first = records[0].get("t", 0.0) if records else 0.0
+        for record in records:
+            delay = start + (record.get("t", 0.0) - first) / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            update = self.update(record)
+            if update is not None:
+                self.offered += 1
+                self.queue.put_nowait((time.perf_counter(), label(record), update))
+
+    async def worker(self):
+        while True:
+            arrived, kind, update = await self.queue.get()
+            self.waits.append(time.perf_counter() - arrived)
+            try:
+                with queries.scope(f"replay.{kind}") as scope:
+                    ran = await self.dispatcher.dispatch(self.client, update)
+            finally:
+                self.queue.task_done()
+            seconds = time.perf_counter() - arrived
+            self.handled += 1
+            self.unhandled += not ran
+            self.latencies[kind].append(seconds)
+            self.query_counts[kind].append(sum(scope.fingerprints.values()))
+            self._window.append(seconds)
+
+    async def monitor(self, stub: StubLLM, interval: float):
+        print(
+            f"{'time':>6}{'offered/s':>11}{'handled/s':>11}{'queued':>8}{'p99 ms':>9}"
+            f"{'llm':>6}{'sql/s':>8}{'sends':>7}"
+        )
+        start = time.perf_counter()
+        offered = handled = 0
+        statements = _statements()
+        while True:
+            await asyncio.sleep(interval)
+            now_statements = _statements()
+            window, self._window = self._window, []
+            print(
+                f"{time.perf_counter() - start:>6.0f}"
+                f"{(self.offered - offered) / interval:>11.1f}"
+                f"{(self.handled - handled) / interval:>11.1f}"
+                f"{self.queue.qsize():>8}"
+                f"{percentile(window, 0.99) * 1000:>9.0f}"
+                f"{stub.active:>6}"
+                f"{(now_statements - statements) / interval:>8.0f}"
+                f"{send_queue.depth:>7}"
+            )
+            offered, handled, statements = self.offered, self.handled, now_statements
+
+    def summary(self, elapsed: float):
+        print(
+            f"\n{self.handled} updates in {elapsed:.1f}s ({self.handled / elapsed:.1f}/s) · "
+            f"queue wait p50 {percentile(self.waits, 0.5) * 1000:.0f} ms · "
+            f"p99 {percentile(self.waits, 0.99) * 1000:.0f} ms"
+        )
+        print(f"\n{'kind':<24}{'count':>8}{'p50 ms':>9}{'p99 ms':>9}{'queries':>9}")
+        for kind, values in sorted(self.latencies.items(), key=lambda item: -len(item[1])):
+            counts = self.query_counts[kind]
+            print(
+                f"{kind[:24]:<24}{len(values):>8}{percentile(values, 0.5) * 1000:>9.0f}"
+                f"{percentile(values, 0.99) * 1000:>9.0f}{sum(counts) / len(counts):>9.1f}"
+            )
+        notes = []
+        if self.unhandled:
+            notes.append(f"{self.unhandled} updates matched no handler")
+        if self.synthesized:
+            notes.append(f"{self.synthesized} callbacks had no matching button, data was made up")
+        for command, count in self.skipped.items():
+            notes.append(f"{count}x {command} skipped")
+        for error, count in self.dispatcher.errors.most_common(5):
+            notes.append(f"{count}x {error[:200]}")
+        for note in notes:
+            print(f"  ! {note}")
+
+
+def _statements() -> int:
+    return sum(totals.count for _, _, totals in queries.top(limit=None))
+
+
+async def run(args, records: list[dict]):
+    stub = StubLLM(args.llm_latency, args.llm_jitter, args.tokens_per_second)
+    await seed(await stub.start())
+    if not args.send_limits:
+        lift_send_limits()
+
+    client = FakeClient(args.api_latency)
+    replay = Replay(client, Dispatcher().load_plugins())
+    for owner in replay.owners(records):
+        await cloud_db.add_owner(user_id=owner)
+
+    print(
+        f"{len(records)} updates at {args.speed:g}x · {args.workers} workers · "
+        f"LLM {args.llm_latency * 1000:.0f} ms · API {args.api_latency * 1000:.0f} ms\n"
+    )
+    workers = [asyncio.create_task(replay.worker()) for _ in range(args.workers)]
+    monitor = asyncio.create_task(replay.monitor(stub, args.interval))
+    start = time.perf_counter()
+    try:
+        await replay.feed(records, args.speed)
+        await replay.queue.join()
+        elapsed = time.perf_counter() - start
+        await send_queue.drain(30)
+    finally:
+        for task in (*workers, monitor):
+            task.cancel()
+        client.close()
+        await stub.stop()
+    replay.summary(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="JSONL written with UPDATE_RECORD_FILE")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = recorded pace, 100 = 100x faster")
+    parser.add_argument("--limit", type=int, help="replay only the first N updates")
+    parser.add_argument("--describe", action="store_true", help="print the traffic shape and exit")
+    parser.add_argument("--workers", type=int, default=Client.WORKERS, help="concurrent updates, like Client(workers=)")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between progress lines")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="seconds to first token")
+    parser.add_argument("--llm-jitter", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="0 sends all tokens at once")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds per Telegram API call")
+    parser.add_argument("--no-send-limits", dest="send_limits", action="store_false", help="lift send queue pacing")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show handler logs")
+    args = parser.parse_args()
+    if not 0 < args.speed <= 1000:
+        parser.error("--speed must be in (0, 1000]")
+
+    records = load(args.path, args.limit)
+    if args.describe:
+        describe(records)
+        return
+    if not records:
+        sys.exit(f"No updates in {args.path}")
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    # local.db, the cloud stand-in and conversations.sqlite all go here
+    os.chdir(tempfile.mkdtemp(prefix="starchatter-replay-"))
+    asyncio.run(run(args, records))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""OpenAI-compatible stub server with configurable latency and streaming.
+
+    python -m bench.stub_llm --port 8700 --latency 0.5 --tokens-per-second 80
+
+Serves /v1/models and /v1/chat/completions. Every completion waits
+`latency` seconds (plus up to `jitter`) before the first token, then
+produces `reply_tokens` tokens (or `reply_chars` characters when set)
+at `tokens_per_second`. Streaming
+requests get SSE chunks paced the same way, others one JSON body once
+the last token is "generated". Usage counts are filled in so token
+metrics see real numbers.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+
+from aiohttp import web
+
+MODELS = ["stub-chat", "stub-fast", "stub-large"]  # Listed by /v1/models
+WORDS = (
+    "sure here is a short answer that keeps the benchmark busy without saying much "
+    "about anything in particular so the reply has a realistic length"
+).split()
+
+
+class StubLLM:
+    def __init__(
+        self,
+        latency: float = 0.2,
+        jitter: float = 0.0,
+        tokens_per_second: float = 0.0,
+        reply_tokens: int = 40,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second  # 0 means all tokens at once
+        self.reply_tokens = reply_tokens
+        self.reply_chars = 0  # Exact reply length when set, instead of reply_tokens
+        self.requests = 0
+        self.streamed = 0
+        self.active = 0  # Completions in progress
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1/models", self.models)
+        app.router.add_post("/v1/chat/completions", self.completions)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in the running loop, return the base URL (ends in /v1)"""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}/v1"
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def models(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "object": "list",
+                "data": [
+                    {"id": model, "object": "model", "created": 0, "owned_by": "bench"}
+                    for model in MODELS
+                ],
+            }
+        )
+
+    def reply_text(self) -> str:
+        """Text of every completion"""
+        return "".join(self._reply())
+
+    def _reply(self) -> list[str]:
+        if not self.reply_chars:
+            return [WORDS[i % len(WORDS)] + " " for i in range(self.reply_tokens)]
+        words = " ".join(WORDS[i % len(WORDS)] for i in range(self.reply_chars))
+        # Ends in a period, trailing whitespace may be stripped on the way
+        return re.findall(r"\S+\s*", words[: self.reply_chars - 1] + ".")
+
+    async def _wait_first_token(self):
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+    async def _wait_token(self):
+        if self.tokens_per_second > 0:
+            await asyncio.sleep(1 / self.tokens_per_second)
+
+    async def completions(self, request: web.Request) -> web.StreamResponse:
+        self.active += 1
+        try:
+            return await self._complete(request)
+        finally:
+            self.active -= 1
+
+    async def _complete(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.requests += 1
+        model = body.get("model", MODELS[0])
+        prompt_tokens = sum(
+            len(str(m.get("content") or "").split()) for m in body.get("messages", [])
+        )
+        tokens = self._reply()
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+        }
+        completion_id = f"chatcmpl-bench-{self.requests}"
+        created = int(time.time())
+
+        await self._wait_first_token()
+        if not body.get("stream"):
+            if self.tokens_per_second > 0:
+                await asyncio.sleep(len(tokens) / self.tokens_per_second)
+            return web.json_response(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(tokens)},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        self.streamed += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def chunk(delta: dict, finish_reason=None, **extra):
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            await response.write(f"data: {json.dumps(data)}\n\n".encode())
+
+        await chunk({"role": "assistant", "content": ""})
+        for token in tokens:
+            await self._wait_token()
+            await chunk({"content": token})
+        await chunk({}, "stop", usage=usage)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="0 sends all tokens at once")
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    args = parser.parse_args()
+
+    stub = StubLLM(args.latency, args.jitter, args.tokens_per_second, args.reply_tokens)
+    print(f"Stub LLM on http://{args.host}:{args.port}/v1")
+    web.run_app(stub.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Per-message cost of building the agent: tools built per run vs the
+prebuilt registry.
+
+    python -m bench.tools [iterations]
+
+Both sides build the StarChatter Agent for one run, like run_attempt
+does (model and instructions included), one with the function_tool
+closures run_chat used to create on every message, one with CHAT_TOOLS.
+"""
+
+import sys
+import time
+
+from agents import function_tool
+
+from app.ai.agent import AIAgent, ChatRequest
+from app.ai.router import Route
+from app.ai.tools import CHAT_TOOLS
+from app.database.dto import ProviderInfo
+
+ROUTE = Route(ProviderInfo(1, "bench", "http://127.0.0.1:1/v1", "bench", ["bench-chat"]), "bench-chat")
+REQUEST = ChatRequest(1, 1, "Hello", "Bench User", 1)
+
+
+def build_closures(message=None, client=None, session=None):
+    """What run_chat used to do on every message"""
+
+    @function_tool
+    async def clear_your_memory():
+        return "History cleared."
+
+    @function_tool
+    async def mute_user(user_id: int, duration_seconds: int = 0):
+        """Mute the user for a specified duration (in seconds).
+
+        Args:
+            user_id (int): ID of the user to mute.
+            duration_seconds (int): Duration in seconds to mute the user.
+        """
+        return "Action completed."
+
+    @function_tool
+    async def unmute_user(group_id: int, user_id: int):
+        return "Action completed."
+
+    @function_tool
+    async def delete_message(message_ids: int | list[int] | None = None):
+        """Delete message with id if provided.
+
+        Args:
+            message_ids (int | list[int], optional): Message ID or list of message IDs to delete.
+        """
+        return "Action completed."
+
+    return [mute_user, unmute_user, delete_message, clear_your_memory]
+
+
+def agent_with_closures():
+    return AIAgent.star_chatter(ROUTE, [], REQUEST, functions=build_closures())
+
+
+def agent_with_registry():
+    return AIAgent.star_chatter(ROUTE, [], REQUEST, functions=CHAT_TOOLS)
+
+
+def measure(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    # First build imports litellm, keep it out of the numbers
+    agent_with_registry()
+    closures = measure(agent_with_closures, iterations)
+    registry = measure(agent_with_registry, iterations)
+    print(f"iterations: {iterations}")
+    print(f"agent with closures per message: {closures * 1e6:10.1f} us")
+    print(f"agent with registry per message: {registry * 1e6:10.1f} us")
+    print(f"saved per message:               {(closures - registry) * 1e6:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
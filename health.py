@@ -1,10 +0,0 @@
-from flask import Flask
-
-app = Flask(__name__)
-
-@app.route("/")
-def hello_world():
-    return "<p>Hello, World!</p>"
-
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=7860)
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Summarize slow requests from a TRACE_FILE written by app.tracing.
+
+Prints the slowest traces as span trees with the critical path marked,
+then where the critical-path time of all slow traces went, by span name.
+
+    python scripts/trace_summary.py traces.jsonl --min-ms 2000 --top 5
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+
+def load(path: str) -> dict[str, list[dict]]:
+    traces = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def end(span: dict) -> float:
+    return span["start"] + span["duration"]
+
+
+def critical_children(span: dict, children: dict[str, list[dict]]) -> list[dict]:
+    """Children the span waited on: the last one to end, the last one ending before it started, ..."""
+    path = []
+    limit = end(span)
+    for child in sorted(children.get(span["span_id"], []), key=end, reverse=True):
+        if end(child) <= limit + 1e-6:
+            path.append(child)
+            limit = child["start"]
+    return path[::-1]
+
+
+def critical_path(span: dict, children: dict[str, list[dict]], out: list[tuple[dict, float]]):
+    """Flatten into (span, self time on the critical path)"""
+    path = critical_children(span, children)
+    out.append((span, span["duration"] - sum(child["duration"] for child in path)))
+    for child in path:
+        critical_path(child, children, out)
+
+
+def print_tree(span: dict, children: dict[str, list[dict]], critical: set[str], depth: int = 0):
+    mark = "*" if span["span_id"] in critical else " "
+    attrs = span.get("attrs") or {}
+    details = " ".join(f"{k}={v}" for k, v in attrs.items() if k != "statement")
+    if "statement" in attrs:
+        details = attrs["statement"][:80]
+    error = f"  !! {span['error']}" if span.get("error") else ""
+    print(f"{mark} {span['duration'] * 1000:9.1f} ms  {'  ' * depth}{span['name']}  {details}{error}")
+    for child in sorted(children.get(span["span_id"], []), key=lambda s: s["start"]):
+        print_tree(child, children, critical, depth + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=os.environ.get("TRACE_FILE", "traces.jsonl"))
+    parser.add_argument("--min-ms", type=float, default=1000, help="slow request threshold")
+    parser.add_argument("--top", type=int, default=5, help="slow traces to print in full")
+    parser.add_argument("--name", default="", help="only roots whose name starts with this")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        sys.exit(f"No trace file at {args.path}, run the bot with TRACE_FILE set")
+
+    slow = []
+    for spans in load(args.path).values():
+        ids = {span["span_id"] for span in spans}
+        children = defaultdict(list)
+        roots = []
+        for span in spans:
+            if span["parent_id"] in ids:
+                children[span["parent_id"]].append(span)
+            elif span["parent_id"] is None:
+                roots.append(span)
+        for root in roots:
+            if root["name"].startswith(args.name) and root["duration"] * 1000 >= args.min_ms:
+                slow.append((root, children))
+
+    slow.sort(key=lambda item: item[0]["duration"], reverse=True)
+    print(f"{len(slow)} traces slower than {args.min_ms:g} ms\n")
+
+    totals = defaultdict(float)
+    counts = defaultdict(int)
+    for i, (root, children) in enumerate(slow):
+        path: list[tuple[dict, float]] = []
+        critical_path(root, children, path)
+        for span, self_time in path:
+            totals[span["name"]] += self_time
+            counts[span["name"]] += 1
+        if i < args.top:
+            print(f"trace {root['trace_id']}  ({root['duration'] * 1000:.0f} ms, * = critical path)")
+            print_tree(root, children, {span["span_id"] for span, _ in path})
+            print()
+
+    if slow:
+        total = sum(totals.values())
+        print("Critical-path time by span (self time)")
+        for name, seconds in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:20]:
+            print(
+                f"  {seconds * 1000:10.1f} ms  {seconds / total:6.1%}  "
+                f"avg {seconds / counts[name] * 1000:8.1f} ms  {name}"
+            )
+
+
+if __name__ == "__main__":
+    main()